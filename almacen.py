@@ -0,0 +1,208 @@
+"""
+almacen.py
+----------
+Almacén local persistente (SQLite) con el historial de Condensados ingresados.
+
+Cada Condensado se agrega una sola vez (se identifica por el hash de su
+contenido, como en `cache_condensado`). Al agregarlo sólo se insertan los
+renglones cuya clave (COLUMNAS_CLAVE) no estaba ya en el almacén; igual que
+en `consolidado.Consolidado`, los duplicados *dentro* de un mismo archivo se
+respetan. La clave de cada renglón se guarda como hash (`ingesta.llaves`) en
+una columna indexada, así la deduplicación es un join en SQLite y no exige
+cargar el historial en memoria.
+
+Con CONDENSADO_ALMACEN definida, el dashboard abre directamente con el
+historial guardado y cada archivo que se sube se agrega al almacén.
+
+Variables de entorno:
+    CONDENSADO_ALMACEN   ruta del archivo SQLite (def. sin almacén)
+
+Uso:
+    python almacen.py historial.sqlite agregar Condensado_2025-06.xlsx [...]
+    python almacen.py historial.sqlite info
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+import cache_condensado
+from ingesta import COLUMNAS_USADAS, COSTOS_FLOAT32, compactar, leer_bytes, llaves, preparar
+
+RUTA_ALMACEN = os.environ.get("CONDENSADO_ALMACEN") or None
+
+FILAS_POR_LOTE = 10_000
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    id           INTEGER PRIMARY KEY,
+    clave        TEXT UNIQUE NOT NULL,
+    nombre       TEXT,
+    ingresado    TEXT NOT NULL,
+    filas        INTEGER NOT NULL,
+    filas_nuevas INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS filas (
+    archivo INTEGER NOT NULL REFERENCES archivos(id),
+    llave   INTEGER NOT NULL,
+    {columnas}
+);
+CREATE INDEX IF NOT EXISTS filas_llave ON filas(llave);
+"""
+
+
+def _columna_sql(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+class Almacen:
+    """Historial de Condensados en un archivo SQLite.
+
+    Cada operación abre su propia conexión, así una instancia se puede
+    compartir entre los hilos del servidor de Streamlit.
+    """
+
+    def __init__(self, ruta, float32=COSTOS_FLOAT32):
+        self.ruta    = str(ruta)
+        self.float32 = float32
+        columnas = ",\n    ".join(_columna_sql(c) for c in COLUMNAS_USADAS)
+        with closing(self._conectar()) as con, con:
+            con.executescript(_ESQUEMA.format(columnas=columnas))
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    # ── Consulta ─────────────────────────────────────────────────────────────
+    def claves(self):
+        """Claves de los archivos ingresados, en orden de ingreso."""
+        with closing(self._conectar()) as con:
+            return [c for (c,) in con.execute("SELECT clave FROM archivos ORDER BY id")]
+
+    @property
+    def clave(self):
+        """Identifica el contenido actual (para `analisis.Dataset`)."""
+        return ("almacen", self.ruta, *self.claves())
+
+    def archivos(self):
+        """DataFrame con los archivos ingresados y cuántos renglones aportó cada uno."""
+        with closing(self._conectar()) as con:
+            return pd.read_sql_query(
+                "SELECT clave, nombre, ingresado, filas, filas_nuevas FROM archivos ORDER BY id", con,
+            )
+
+    def df(self):
+        """Todo el historial, preparado y compactado como `Consolidado.df`."""
+        columnas = ", ".join(_columna_sql(c) for c in COLUMNAS_USADAS)
+        with closing(self._conectar()) as con:
+            bloques = [
+                compactar(preparar(bloque), self.float32)
+                for bloque in pd.read_sql_query(
+                    f"SELECT {columnas} FROM filas ORDER BY rowid", con, chunksize=100_000,
+                )
+            ]
+        if not bloques:
+            return None
+        # Las categorías de cada bloque difieren: se concatena y se recompacta
+        return compactar(pd.concat(bloques, ignore_index=True), self.float32) if len(bloques) > 1 else bloques[0]
+
+    # ── Ingreso ──────────────────────────────────────────────────────────────
+    def agregar(self, clave, df, nombre=None):
+        """Agrega el Condensado `df` (ya preparado); devuelve cuántos renglones eran nuevos.
+
+        Un archivo con `clave` ya ingresada no se vuelve a procesar (devuelve 0).
+        """
+        llaves_df = llaves(df).view("int64")
+        with closing(self._conectar()) as con, con:
+            # Reserva la escritura antes de buscar lo existente: dos procesos que
+            # agregan a la vez no ven los mismos renglones como nuevos
+            con.execute("BEGIN IMMEDIATE")
+            if con.execute("SELECT 1 FROM archivos WHERE clave = ?", (clave,)).fetchone():
+                return 0
+            nuevas = ~np.isin(llaves_df, self._existentes(con, llaves_df))
+            cursor = con.execute(
+                "INSERT INTO archivos (clave, nombre, ingresado, filas, filas_nuevas) VALUES (?, ?, ?, ?, ?)",
+                (clave, nombre, time.strftime("%Y-%m-%dT%H:%M:%S"), len(df), int(nuevas.sum())),
+            )
+            self._insertar(con, cursor.lastrowid, df[nuevas], llaves_df[nuevas])
+        return int(nuevas.sum())
+
+    def actualizar(self, archivos, nombres=None, max_procesos=None):
+        """Agrega los archivos (rutas, bytes o subidos) que aún no están; devuelve renglones nuevos.
+
+        Los que no están en el almacén se leen con el caché de snapshots
+        (en paralelo si son varios).
+        """
+        contenidos = [leer_bytes(a) for a in archivos]
+        claves     = [cache_condensado.hash_contenido(d) for d in contenidos]
+        if nombres is None:
+            nombres = [getattr(a, "name", a if isinstance(a, str) else None) for a in archivos]
+
+        ingresadas = set(self.claves())
+        pendientes = {c: d for c, d in zip(claves, contenidos) if c not in ingresadas}
+        if not pendientes:
+            return 0
+        frames = cache_condensado.cargar_claves(list(pendientes), pendientes, max_procesos=max_procesos)
+        nombre_por_clave = dict(zip(claves, nombres))
+        return sum(self.agregar(clave, frames[clave], nombre_por_clave[clave]) for clave in pendientes)
+
+    @staticmethod
+    def _existentes(con, llaves_df):
+        # Las llaves del archivo van a una tabla temporal y se cruzan con el índice
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS candidatas (llave INTEGER PRIMARY KEY)")
+        con.execute("DELETE FROM candidatas")
+        con.executemany("INSERT OR IGNORE INTO candidatas VALUES (?)", ((int(v),) for v in np.unique(llaves_df)))
+        existentes = [v for (v,) in con.execute(
+            "SELECT c.llave FROM candidatas c WHERE EXISTS (SELECT 1 FROM filas f WHERE f.llave = c.llave)"
+        )]
+        con.execute("DELETE FROM candidatas")
+        return np.array(existentes, dtype="int64")
+
+    @staticmethod
+    def _insertar(con, archivo, df, llaves_df):
+        columnas = [c for c in COLUMNAS_USADAS if c in df.columns]
+        sql = (f"INSERT INTO filas (archivo, llave, {', '.join(_columna_sql(c) for c in columnas)}) "
+               f"VALUES (?, ?, {', '.join('?' * len(columnas))})")
+        for inicio in range(0, len(df), FILAS_POR_LOTE):
+            lote = df.iloc[inicio:inicio + FILAS_POR_LOTE]
+            valores = [_valores_sql(lote[c]) for c in columnas]
+            con.executemany(sql, (
+                (archivo, int(llave), *fila)
+                for llave, fila in zip(llaves_df[inicio:inicio + FILAS_POR_LOTE], zip(*valores))
+            ))
+
+
+def _valores_sql(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return [None if pd.isna(v) else v.isoformat(sep=" ") for v in serie]
+    if pd.api.types.is_float_dtype(serie):
+        return [None if np.isnan(v) else float(v) for v in serie.to_numpy(dtype="float64")]
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("almacen", help="archivo SQLite (se crea si no existe)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    agregar = sub.add_parser("agregar", help="agrega Condensados (.xlsx) al almacén")
+    agregar.add_argument("archivos", nargs="+")
+    agregar.add_argument("--procesos", type=int, help="procesos para leer los archivos nuevos")
+    sub.add_parser("info", help="lista los archivos ingresados")
+    args = parser.parse_args(argv)
+
+    almacen = Almacen(args.almacen)
+    if args.comando == "agregar":
+        t0 = time.perf_counter()
+        nuevas = almacen.actualizar(args.archivos, max_procesos=args.procesos)
+        print(f"{nuevas:,} renglones nuevos en {time.perf_counter() - t0:.1f} s → {args.almacen}")
+    else:
+        archivos = almacen.archivos()
+        print(archivos.to_string(index=False) if len(archivos) else "El almacén está vacío.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""
+analisis.py
+-----------
+Núcleo de análisis sin interfaz: carga, filtros, agregaciones y comparaciones
+sobre Condensados.
+
+Sólo depende de pandas/NumPy (ni Streamlit ni Plotly), así que lo pueden usar
+trabajos por lotes, benchmarks y pruebas sin pagar el arranque de la UI.
+dashboard.py es una capa delgada encima de este módulo.
+
+Ejemplo:
+    import analisis
+
+    datos  = analisis.cargar(["Condensado_2024.xlsx", "Condensado_2025.xlsx"])
+    filtro = datos.filtrar(exportadores=["EURICOM"])
+    filtro.comparar_años(2024, 2025)
+"""
+
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from almacen import Almacen
+from compartido import REGISTRO
+from consolidado import Consolidado
+from cubo import Cubo
+from escenarios import CAMBIOS_PCT, Escenarios, factores_historicos
+from indices import IndiceFiltros, IndiceTexto
+from ingesta import COLUMNAS_COSTOS, COLUMNAS_TIPO_CAMBIO
+from motor_sql import MOTOR, MotorSQLite
+from tabla import TablaPaginada
+from ventanas import RODANTES, diferenciales
+
+AGRUPACIONES = ["Producto", "Año", "Mes"]
+
+# Consolidados desde los que `adjuntar` combina de forma incremental, por proceso
+MAX_BASES = 4
+_BASES      = OrderedDict()
+_LOCK_BASES = threading.Lock()
+
+
+def cargar(archivos, directorio=None, max_procesos=None, productos=None):
+    """Lee y combina uno o varios Condensados (rutas, bytes o archivos subidos).
+
+    Con `productos` (una `productos.TablaProductos`), los nombres de producto
+    pasan a su forma canónica.
+    """
+    consolidado = Consolidado(directorio, max_procesos)
+    consolidado.actualizar(archivos)
+    return Dataset.desde_consolidado(consolidado, productos)
+
+
+def variante(productos):
+    """Versión de los nombres canónicos en uso ("" sin `productos`).
+
+    Va en la clave de cada Dataset y del snapshot compartido: tras una
+    corrección con `productos.py asignar` la clave cambia, así los
+    agregados y figuras memoizados con los nombres anteriores dejan de usarse.
+    """
+    return "" if productos is None else f"productos:{productos.version()}"
+
+
+def clave_dataset(clave, productos=None):
+    """Clave del Dataset de `clave` (archivos o almacén) con los nombres de `productos`."""
+    return _con_variante(clave, variante(productos))
+
+
+def _con_variante(clave, variante):
+    return (*clave, variante) if variante else tuple(clave)
+
+
+def adjuntar(archivos, directorio=None, max_procesos=None, productos=None, claves=None, registro=REGISTRO):
+    """Referencia (`compartido.Adjunto`) al dataset compartido de `archivos`.
+
+    Si otra sesión o proceso del equipo ya combinó los mismos archivos, se
+    abre su snapshot sin leer nada; si no, se combinan y se publican. El
+    Dataset sale de `Dataset.desde_adjunto` y vale mientras no se suelte el
+    adjunto. `claves` evita volver a calcular los hashes si ya se conocen.
+
+    La combinación parte del último Consolidado de este proceso cuyos
+    archivos son el principio de `archivos` (ver `_base`): al agregar un
+    archivo sólo se procesa ese archivo, como sin dataset compartido.
+    """
+    if claves is None:
+        claves = Consolidado(directorio, max_procesos).claves_de(archivos)
+    claves = tuple(claves)
+    # La versión antes de aplicar: si cambia en medio, la siguiente carga ve otra clave
+    version = variante(productos)
+    combinado = []
+
+    def combinar():
+        consolidado = _base(claves, version, directorio, max_procesos)
+        consolidado.actualizar(archivos)
+        combinado.append(consolidado)
+        return consolidado.df if productos is None else productos.aplicar(consolidado.df)
+
+    adjunto = registro.adjuntar(claves, combinar, variante=version)
+    if combinado:
+        # La base guarda el DataFrame publicado (memory map), no una copia propia
+        base = combinado[0]
+        base.df = adjunto.df
+        with _LOCK_BASES:
+            _BASES[(claves, version)] = base
+            _BASES.move_to_end((claves, version))
+            while len(_BASES) > MAX_BASES:
+                _BASES.popitem(last=False)
+    return adjunto
+
+
+def _base(claves, version, directorio, max_procesos):
+    """Copia del Consolidado guardado con más archivos al principio de `claves` (o uno nuevo).
+
+    Con `productos`, el DataFrame de la base ya tiene los nombres canónicos de
+    `version`; volver a aplicarlos sobre él no los cambia.
+    """
+    with _LOCK_BASES:
+        previos = [b for (c, v), b in _BASES.items() if v == version and claves[:len(c)] == c]
+    if not previos:
+        return Consolidado(directorio, max_procesos)
+    base = max(previos, key=lambda b: len(b.claves)).copia()
+    base.directorio, base.max_procesos = directorio, max_procesos
+    return base
+
+
+def cargar_almacen(ruta, motor=MOTOR, productos=None):
+    """Historial completo guardado en un `almacen.Almacen` (None si está vacío).
+
+    motor="sqlite" resuelve filtros y agregaciones en el archivo (ver `motor_sql`).
+    """
+    return Dataset.desde_almacen(Almacen(ruta), motor, productos)
+
+
+class Dataset:
+    """Un Condensado cargado, con sus estructuras derivadas construidas a demanda.
+
+    `clave` identifica el contenido (hashes de los archivos combinados y
+    `variante` de los nombres canónicos) y se usa para memoizar resultados
+    entre reruns o procesos.
+    """
+
+    def __init__(self, df, clave=None, max_memo=16, motor=None):
+        self.motor = motor
+        self._df   = df
+        if clave is None:
+            clave = ("df", int(pd.util.hash_pandas_object(df, index=False).sum()))
+        self.clave    = clave
+        self.max_memo = max_memo
+        self._memo    = OrderedDict()
+        self._lock    = threading.Lock()
+
+    @classmethod
+    def desde_consolidado(cls, consolidado, productos=None):
+        """Dataset del Consolidado; `productos` unifica los nombres (ver `productos.py`)."""
+        clave = clave_dataset(consolidado.claves, productos)
+        df = consolidado.df if productos is None else productos.aplicar(consolidado.df)
+        return cls(df, clave)
+
+    @classmethod
+    def desde_adjunto(cls, adjunto):
+        """Dataset de un snapshot compartido; uno por proceso, el mismo para todas las sesiones."""
+        return adjunto.compartir("dataset", lambda: cls(adjunto.df, _con_variante(adjunto.clave, adjunto.variante)))
+
+    @classmethod
+    def desde_almacen(cls, almacen, motor=MOTOR, productos=None):
+        """Dataset del historial; con motor="sqlite" las agregaciones se consultan en el almacén.
+
+        `productos` unifica los nombres en los dos motores (ver `productos.py`).
+        """
+        # La clave antes que las filas: si otro proceso agrega en medio, el
+        # siguiente rerun ve una clave distinta y recarga
+        archivos = almacen.clave
+        clave    = clave_dataset(archivos, productos)
+        if motor == "sqlite":
+            if not archivos[2:]:
+                return None
+            return cls(None, clave, motor=MotorSQLite(almacen.ruta, productos=productos))
+        df = almacen.df()
+        if df is not None and productos is not None:
+            df = productos.aplicar(df)
+        return None if df is None else cls(df, clave)
+
+    @property
+    def df(self):
+        """Las filas en memoria; con un motor externo se cargan al primer uso."""
+        if self._df is None:
+            self._df = self.motor.df()
+        return self._df
+
+    # ── Estructuras derivadas (una vez por dataset) ──────────────────────────
+    @cached_property
+    def cubo(self):
+        return self.motor.cubo() if self.motor is not None else Cubo.construir(self.df)
+
+    @cached_property
+    def indice_filtros(self):
+        return IndiceFiltros(self.df)
+
+    @cached_property
+    def indice_texto(self):
+        return IndiceTexto(self.df)
+
+    @cached_property
+    def tabla(self):
+        return TablaPaginada(self.df)
+
+    @cached_property
+    def escenarios(self):
+        return Escenarios(self.df)
+
+    # ── Valores disponibles ──────────────────────────────────────────────────
+    @property
+    def costos(self):
+        return [c for c in COLUMNAS_COSTOS if c in self._columnas()]
+
+    @property
+    def tipos_cambio(self):
+        return [c for c in COLUMNAS_TIPO_CAMBIO if c in self._columnas()]
+
+    def años(self):
+        if self.motor is not None:
+            return self.motor.distintos("Año")
+        return sorted(self.df["Año"].dropna().unique().astype(int))
+
+    def productos(self):
+        if self.motor is not None:
+            return self.motor.distintos("Producto/Presentación")
+        return sorted(self.df["Producto/Presentación"].dropna().unique())
+
+    def exportadores(self):
+        if self.motor is not None:
+            return self.motor.distintos("Exportador")
+        return sorted(self.df["Exportador"].dropna().unique())
+
+    def _columnas(self):
+        return self.motor.columnas if self.motor is not None else self.df.columns
+
+    def filtrar(self, productos=None, exportadores=None, años=None):
+        """Selección de filas; None en un filtro = sin filtrar por esa columna."""
+        return Filtro(self, productos, exportadores, años)
+
+    def memo(self, clave, construir):
+        """Resultado de `construir()` memoizado por `clave` (LRU de `max_memo`).
+
+        Un Filtro nuevo por rerun con la misma selección reutiliza así las
+        matrices ya calculadas. Seguro entre hilos (el precálculo en segundo
+        plano escribe aquí mientras corre el script).
+        """
+        with self._lock:
+            if clave in self._memo:
+                self._memo.move_to_end(clave)
+                return self._memo[clave]
+        valor = construir()
+        with self._lock:
+            self._memo[clave] = valor
+            while len(self._memo) > self.max_memo:
+                self._memo.popitem(last=False)
+        return valor
+
+
+class MatrizAños:
+    """Promedio de cada costo por año y variación % entre todos los pares de años.
+
+    `medias` es años × costos y `delta` el tensor años × años × costos, con
+    delta[i, j, k] = variación % del costo k del año i (base) al año j; se
+    calcula en una sola operación con broadcasting.
+    """
+
+    def __init__(self, medias):
+        self.medias = medias
+        self.años   = [int(a) for a in medias.index]
+        self.costos = list(medias.columns)
+        m = medias.to_numpy(dtype="float64")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.delta = np.round((m[None, :, :] - m[:, None, :]) / m[:, None, :] * 100, 2)
+        self._posicion = {a: i for i, a in enumerate(self.años)}
+
+    def tabla(self, costo):
+        """Variación % de `costo`: años base (filas) × años a comparar (columnas)."""
+        k = self.costos.index(costo)
+        return pd.DataFrame(self.delta[:, :, k], index=self.años, columns=self.años)
+
+    def par(self, año_a, año_b, columnas=None):
+        """Rebanada de un par de años, como `Filtro.comparar_años`."""
+        columnas = self.costos if columnas is None else list(columnas)
+        k = [self.costos.index(c) for c in columnas]
+        i, j = self._posicion.get(año_a), self._posicion.get(año_b)
+        vacio = np.full(len(columnas), np.nan)
+        return pd.DataFrame({
+            "media_a": self.medias.iloc[i].to_numpy()[k] if i is not None else vacio,
+            "media_b": self.medias.iloc[j].to_numpy()[k] if j is not None else vacio,
+            "delta":   self.delta[i, j, k] if i is not None and j is not None else vacio,
+        }, index=pd.Index(columnas))
+
+
+class Filtro:
+    """Resultado de aplicar los filtros de producto, exportador y año.
+
+    Las agregaciones salen del cubo (O(celdas)) o, con un motor externo, de
+    consultas en ese motor; sólo `filas`, `df`, `buscar` y los escenarios
+    tocan filas individuales.
+    """
+
+    def __init__(self, datos, productos=None, exportadores=None, años=None):
+        self.datos        = datos
+        self.productos    = _tupla(productos)
+        self.exportadores = _tupla(exportadores)
+        self.años         = _tupla(años)
+        self.cubo = datos.cubo.filtrar(self.productos, self.exportadores, self.años)
+
+    @property
+    def clave(self):
+        return (self.datos.clave, self.productos, self.exportadores, self.años)
+
+    @property
+    def vacio(self):
+        return self.cubo.vacio
+
+    @cached_property
+    def filas(self):
+        return self.datos.indice_filtros.filas(self.productos, self.exportadores, self.años)
+
+    def df(self, columnas=None):
+        df = self.datos.df if columnas is None else self.datos.df[columnas]
+        return df.take(self.filas)
+
+    # ── Resumen ──────────────────────────────────────────────────────────────
+    def resumen(self):
+        """Registros, productos y promedios de compra EUR / costo de importación."""
+        columnas = self.cubo.columnas
+        return {
+            "registros": self.cubo.registros(),
+            "productos": self.cubo.n_productos(),
+            "precio_eur": self.cubo.media_total(["Precio compra EUROS"]).iloc[0]
+                          if "Precio compra EUROS" in columnas else None,
+            "costo_importacion": self.cubo.media_total(["COSTO DE IMPORTACION X PIEZA ($/pieza)"]).iloc[0]
+                                 if "COSTO DE IMPORTACION X PIEZA ($/pieza)" in columnas else None,
+        }
+
+    # ── Agregaciones ─────────────────────────────────────────────────────────
+    def promedio_por(self, costo, agrupar_por):
+        """Promedio de `costo` por producto y año, por año, o por mes y año."""
+        if agrupar_por == "Producto":
+            return self.cubo.media(["Producto/Presentación", "Año"], [costo]).reset_index()
+        if agrupar_por == "Año":
+            return self.cubo.media("Año", [costo]).reset_index()
+        return self.cubo.media(["Mes", "Año"], [costo]).reset_index().sort_values("Mes")
+
+    def promedio_anual(self, columnas):
+        return self.cubo.media("Año", columnas).reset_index()
+
+    def promedio_periodo(self, columnas, por):
+        """Promedio por [`por`, Año] (por = "Mes" o "Año"), ordenado por `por`."""
+        return self.cubo.media([por, "Año"], columnas).reset_index().sort_values(por)
+
+    def estadisticas(self, columnas):
+        """Promedio, mínimo y máximo por año."""
+        return self.cubo.estadisticas("Año", columnas)
+
+    def serie_diaria(self, columnas, desde=None, hasta=None):
+        """Promedio diario de `columnas` entre `desde` y `hasta` (inclusive)."""
+        if self.datos.motor is not None:
+            return self.cubo.serie_diaria(list(columnas), desde, hasta)
+        datos = self.df(["Fecha"] + list(columnas))
+        if desde is not None:
+            datos = datos[datos["Fecha"] >= pd.Timestamp(desde)]
+        if hasta is not None:
+            datos = datos[datos["Fecha"] <= pd.Timestamp(hasta)]
+        grp = datos.groupby("Fecha")[list(columnas)].mean().reset_index()
+        grp["Año"] = grp["Fecha"].dt.year
+        return grp
+
+    def ventanas(self, ventana):
+        """Media y volatilidad móviles de `ventana` fechas de los tipos de cambio y sus diferenciales.
+
+        Ver `ventanas.py`: el estado se guarda por datos y selección de
+        filtros; al agregar meses se parte del estado de los datos anteriores
+        con la misma selección y sólo se calculan los nuevos.
+        """
+        serie = self.datos.memo(
+            ("serie_tc", self.clave[1:]),
+            lambda: diferenciales(self.serie_diaria(self.datos.tipos_cambio).drop(columns="Año")),
+        )
+        return RODANTES.obtener(self.datos.clave, self.clave[1:], ventana, serie)
+
+    def rango_fechas(self):
+        if self.datos.motor is not None:
+            return self.cubo.rango_fechas()
+        fechas = pd.DatetimeIndex(self.datos.df["Fecha"].to_numpy()[self.filas]).dropna()
+        return (fechas.min(), fechas.max()) if len(fechas) else (None, None)
+
+    # ── Comparaciones ────────────────────────────────────────────────────────
+    @property
+    def matriz_años(self):
+        """`MatrizAños` de todos los costos sobre los años del filtro."""
+        return self.datos.memo(
+            ("matriz_años", self.clave[1:]),
+            lambda: MatrizAños(self.cubo.media("Año", self.datos.costos)),
+        )
+
+    @property
+    def medias_producto(self):
+        """Promedio de cada costo por [Producto/Presentación, Año] (sólo pares con filas)."""
+        return self.datos.memo(
+            ("medias_producto", self.clave[1:]),
+            lambda: self.cubo.media(["Producto/Presentación", "Año"], self.datos.costos),
+        )
+
+    def matriz_productos(self, costo):
+        """Promedio de `costo`: productos × años."""
+        return self.medias_producto[costo].unstack("Año")
+
+    def comparar_años(self, año_a, año_b, columnas=None):
+        """Promedio de cada costo en ambos años y variación porcentual (Δ %).
+
+        Devuelve un DataFrame indexado por costo con columnas
+        `media_a`, `media_b` y `delta` (una rebanada de `matriz_años`).
+        """
+        return self.matriz_años.par(año_a, año_b, columnas)
+
+    def comparar_productos(self, año_a, año_b, costo):
+        """Promedio de `costo` por producto en cada año (dos Series)."""
+        serie = self.medias_producto[costo]
+        años  = serie.index.get_level_values("Año")
+        return tuple(serie[años == año].droplevel("Año") for año in (año_a, año_b))
+
+    # ── Escenarios de tipo de cambio ─────────────────────────────────────────
+    def escenarios(self, cambios_pct=CAMBIOS_PCT, por=None):
+        """Promedio de los costos ligados al euro para cada % de cambio del tipo de cambio.
+
+        Ver `escenarios.Escenarios.rejilla`; el resultado se memoiza, así que
+        elegir otro punto de la rejilla no la recalcula.
+        """
+        cambios = tuple(float(c) for c in cambios_pct)
+        return self.datos.memo(
+            ("escenarios", self.clave[1:], cambios, por),
+            lambda: self.datos.escenarios.rejilla(cambios, self.filas, por),
+        )
+
+    def monte_carlo(self, variable, horizonte=20, n=10_000, semilla=0):
+        """Promedios simulados con cambios de `variable` tomados de su historia en el archivo."""
+        def simular():
+            serie = self.serie_diaria([variable]).set_index("Fecha")[variable]
+            factores = factores_historicos(serie, horizonte, n, semilla)
+            return self.datos.escenarios.monte_carlo(factores, self.filas)
+
+        return self.datos.memo(("monte_carlo", self.clave[1:], variable, horizonte, n, semilla), simular)
+
+    # ── Búsqueda ─────────────────────────────────────────────────────────────
+    def buscar(self, texto):
+        """Filas del filtro que coinciden con `texto` (ver `indices.IndiceTexto`)."""
+        if not texto:
+            return self.filas
+        return self.datos.indice_texto.buscar(texto, self.filas)
+
+
+def _tupla(valores):
+    return None if valores is None else tuple(valores)
@@ -0,0 +1,223 @@
+"""
+benchmarks/generar_condensado.py
+--------------------------------
+Condensados sintéticos con el mismo esquema que los de transformar.py.
+
+Las cardinalidades y rangos imitan el Condensado real: ~85 productos con
+frecuencias muy desiguales (Zipf), pocos exportadores escritos de varias
+formas ("CURTI" / "Curti"), un embarque cada ~3 renglones, facturas
+repetidas ("LUEMA") y una parte de las fechas vacías. Los costos respetan
+las relaciones del archivo original:
+
+    TIPO DE CAMBIO                 = DÓLAR (DOF) × FACTORAJE (DOF)
+    Costo pieza mxn                = Precio compra EUROS × TIPO DE CAMBIO
+    IGI                            = (Costo pieza + Flete) × TASA_IGI
+    COSTO DE IMPORTACION X PIEZA   = DTA + IGI + Aduana y Flete Terrestre
+    Costo Compra Ana Dis           = Costo pieza + Flete + Importación + Gastos locales
+
+Todo se genera con NumPy por columnas, así que 10⁷ renglones tardan unos
+segundos; escribir el .xlsx es lo lento (y Excel admite 1,048,575 renglones).
+
+Uso:
+    python -m benchmarks.generar_condensado 100000 -o sintetico.xlsx
+    python -m benchmarks.generar_condensado 10000000 -o sintetico.parquet --semilla 7
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ingesta import COLUMNAS_COSTOS, COLUMNAS_TEXTO, COLUMNAS_TIPO_CAMBIO
+
+# Orden de columnas del Condensado original
+COLUMNAS = [
+    "Fecha", "Exportador", "Embarque", "Factura",
+    *COLUMNAS_TIPO_CAMBIO,
+    "Producto/Presentación",
+    *COLUMNAS_COSTOS,
+]
+
+# Renglones de datos que caben en una hoja de Excel (más el encabezado)
+MAX_FILAS_EXCEL = 1_048_575
+
+TAMAÑOS = [10 ** k for k in range(3, 8)]
+
+LINEAS = [
+    "TOMATE ENTERO PELADO", "TOMATE TRITURADO", "PASSATA", "FUSILLI", "PENNE",
+    "SPAGUETTI", "CODITO", "FARFALLE", "RIGATONI", "LINGUINE", "TAGLIATELLE",
+    "ACEITUNAS NEGRAS", "ACEITUNAS VERDES", "ACEITE DE OLIVA", "VINAGRE BALSAMICO",
+    "PESTO", "ALCACHOFAS", "PIMIENTO ROJO", "LENTEJAS", "GARBANZOS", "FRIJOL BLANCO",
+]
+PRESENTACIONES = ["250", "400", "500", "1000", "2500", "4200", "5000"]
+
+# IGI ad valorem sobre costo pieza + flete; en el Condensado real es 0.8 % casi siempre
+TASA_IGI = 0.008
+
+# (nombre, peso): variantes de escritura incluidas, como en los archivos reales
+EXPORTADORES = [
+    ("EURICOM", 0.75), ("CURTI", 0.15), ("Curti", 0.04),
+    ("curti", 0.02), ("EYRICUM", 0.02), ("DE NIGRIS", 0.02),
+]
+FACTURAS_FRECUENTES = ["LUEMA", "No, factura LUEMA", "FLETE Y SEG", "FACT LUEMA"]
+PREFIJOS_EMBARQUE   = ["IMCA", "BIO VERDE", "BIO VERDE MIXTO", "MIXTO", "DE NIGRIS"]
+
+
+def generar(filas, semilla=0, desde="2023-01-02", hasta="2025-12-31",
+            n_productos=85, fraccion_sin_fecha=0.05):
+    """DataFrame sintético de `filas` renglones, como lo devuelve `pd.read_excel`.
+
+    Las columnas de texto salen como `category` para que 10⁷ renglones
+    quepan en memoria; `ingesta.preparar` las convierte a str como al leer
+    el Excel.
+    """
+    rng = np.random.default_rng(semilla)
+
+    # ── Fechas y tipo de cambio (una caminata aleatoria por día hábil) ──────
+    dias = pd.bdate_range(desde, hasta)
+    dof  = 19.2 * np.exp(np.cumsum(rng.normal(0, 0.006, len(dias))))
+    fact = 1.07 * np.exp(np.cumsum(rng.normal(0, 0.003, len(dias))))
+    i_dia = np.sort(rng.integers(0, len(dias), filas))
+    fecha = dias.to_numpy()[i_dia]
+    fecha[rng.random(filas) < fraccion_sin_fecha] = np.datetime64("NaT")
+    dolar, factoraje = dof[i_dia], fact[i_dia]
+    tipo_cambio = dolar * factoraje
+
+    # ── Productos: frecuencia Zipf, precio base e IGI propios ───────────────
+    nombres = [f"{LINEAS[i % len(LINEAS)]} {PRESENTACIONES[(i * 3) % len(PRESENTACIONES)]}"
+               + (f" {i // len(LINEAS)}" if i >= len(LINEAS) else "")
+               for i in range(n_productos)]
+    peso = 1 / np.arange(1, n_productos + 1)
+    i_prod = rng.choice(n_productos, size=filas, p=peso / peso.sum())
+    precio_base = rng.lognormal(np.log(2.5), 0.9, n_productos).clip(0.4, 32)
+
+    # ── Costos ──────────────────────────────────────────────────────────────
+    # Inflación de ~4 % anual en euros sobre el precio base del producto
+    años_desde_inicio = i_dia / 261
+    eur    = precio_base[i_prod] * 1.04 ** años_desde_inicio * rng.normal(1, 0.04, filas).clip(0.8, 1.2)
+    pieza  = eur * tipo_cambio
+    flete  = pieza * rng.uniform(0.05, 0.4, filas)
+    dta    = pieza * rng.uniform(0.0, 0.002, filas)
+    igi    = (pieza + flete) * TASA_IGI
+    aduana = pieza * rng.uniform(0.005, 0.3, filas)
+    importacion = dta + igi + aduana
+    gastos = np.where(rng.random(filas) < 0.17, rng.uniform(0, 1.4, filas), np.nan)
+    ana_dis    = pieza + flete + importacion + np.nan_to_num(gastos)
+    pasta_mia  = ana_dis * rng.uniform(1.02, 1.05, filas)
+
+    exportador = _texto(
+        rng.choice(len(EXPORTADORES), size=filas, p=[p for _, p in EXPORTADORES]),
+        [n for n, _ in EXPORTADORES],
+    )
+    return pd.DataFrame({
+        "Fecha":      fecha,
+        "Exportador": exportador,
+        "Embarque":   _embarques(rng, filas),
+        "Factura":    _facturas(rng, filas),
+        "TIPO DE CAMBIO":  tipo_cambio,
+        "DÓLAR (DOF)":     dolar,
+        "FACTORAJE (DOF)": factoraje,
+        "Producto/Presentación": _texto(i_prod, nombres),
+        "Precio compra EUROS":    eur,
+        "Costo pieza mxn":        pieza,
+        "Flete Maritimo ($/pieza)": flete,
+        "DTA ($/pieza)":          dta,
+        "IGI ($/pieza)":          igi,
+        "Aduana y Flete Terrestre ($/pieza)": aduana,
+        "COSTO DE IMPORTACION X PIEZA ($/pieza)": importacion,
+        "Gastos Locales Naviera $/pieza": gastos,
+        "Costo Compra Ana Dis ($/pieza)": ana_dis,
+        "Precio Unitario Compra Pasta Mia": pasta_mia,
+    }, columns=COLUMNAS)
+
+
+def _embarques(rng, filas):
+    # Un embarque cada ~3 renglones consecutivos, ~5 % sin dato
+    n = max(1, filas // 3)
+    nombres = [f"{PREFIJOS_EMBARQUE[i % len(PREFIJOS_EMBARQUE)]} {i // len(PREFIJOS_EMBARQUE) + 1}"
+               for i in range(n)]
+    codigos = np.minimum(np.arange(filas) // 3, n - 1)
+    codigos[rng.random(filas) < 0.05] = -1
+    return _texto(codigos, nombres)
+
+
+def _facturas(rng, filas):
+    # La mitad son leyendas repetidas; el resto, folios "E####"; ~12 % sin dato
+    n_folios = max(1, filas // 12)
+    nombres  = FACTURAS_FRECUENTES + [f"E{3000 + i}" for i in range(n_folios)]
+    codigos  = np.where(
+        rng.random(filas) < 0.5,
+        rng.integers(0, len(FACTURAS_FRECUENTES), filas),
+        len(FACTURAS_FRECUENTES) + np.minimum(np.arange(filas) // 12, n_folios - 1),
+    )
+    codigos[rng.random(filas) < 0.12] = -1
+    return _texto(codigos, nombres)
+
+
+def _texto(codigos, nombres):
+    # Texto como lo deja pd.read_excel: objetos str y NaN en los vacíos
+    return pd.Categorical.from_codes(codigos, nombres).astype(object)
+
+
+def guardar(df, ruta):
+    """Escribe `df` como .xlsx, .parquet o .csv / .csv.gz según la extensión."""
+    ruta = Path(ruta)
+    nombre = ruta.name.lower()
+    if nombre.endswith(".parquet"):
+        df.to_parquet(ruta, index=False)
+    elif nombre.endswith((".csv", ".csv.gz")):
+        df.to_csv(ruta, index=False)
+    elif nombre.endswith(".xlsx"):
+        _guardar_excel(df, ruta)
+    else:
+        raise ValueError(f"Extensión no soportada: {ruta.name} (usa .xlsx, .parquet, .csv o .csv.gz)")
+    return ruta
+
+
+def _guardar_excel(df, ruta):
+    import openpyxl  # diferido: sólo se necesita al escribir un Excel
+
+    if len(df) > MAX_FILAS_EXCEL:
+        raise ValueError(
+            f"Excel admite {MAX_FILAS_EXCEL:,} renglones y hay {len(df):,}; usa .parquet o .csv."
+        )
+    # write_only escribe fila por fila sin guardar el libro en memoria
+    wb = openpyxl.Workbook(write_only=True)
+    hoja = wb.create_sheet()
+    hoja.append(list(df.columns))
+    columnas = [_valores_excel(df[c]) for c in df.columns]
+    for fila in zip(*columnas):
+        hoja.append(fila)
+    wb.save(ruta)
+
+
+def _valores_excel(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return [None if pd.isna(v) else v.to_pydatetime() for v in serie]
+    if isinstance(serie.dtype, pd.CategoricalDtype) or serie.name in COLUMNAS_TEXTO:
+        return serie.astype(object).where(serie.notna(), None).tolist()
+    return [None if np.isnan(v) else v for v in serie.to_numpy(dtype="float64")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("filas", type=int)
+    parser.add_argument("-o", "--salida", required=True, help=".xlsx, .parquet, .csv o .csv.gz")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--desde", default="2023-01-02")
+    parser.add_argument("--hasta", default="2025-12-31")
+    parser.add_argument("--productos", type=int, default=85, help="productos distintos (def. 85)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    df = generar(args.filas, args.semilla, args.desde, args.hasta, args.productos)
+    t1 = time.perf_counter()
+    guardar(df, args.salida)
+    t2 = time.perf_counter()
+    print(f"{len(df):,} renglones generados en {t1 - t0:.1f} s, escritos en {t2 - t1:.1f} s → {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+benchmarks/medir_etapas.py
+--------------------------
+Tiempo y memoria pico de cada etapa del dashboard sobre Condensados sintéticos.
+
+Para cada tamaño se genera un Condensado (`generar_condensado.generar`) y se
+corren en orden las etapas de ETAPAS: carga (normalización, compactación,
+snapshot Parquet, dataset compartido Arrow y, con --excel, lectura del
+.xlsx), estructuras derivadas, filtro, agregaciones (cubo vs. groupby
+directo sobre las filas vs. SQLite, con verificación de que el motor SQLite
+da los mismos números con los nombres canónicos), figuras con su
+serialización, ventanas móviles (completas y al agregar un mes), búsqueda,
+tabla paginada, escenarios y exportación CSV. La memoria pico de cada etapa
+se mide con tracemalloc (asignaciones de Python y NumPy; no incluye buffers
+de Arrow).
+
+Cada tamaño corre en un proceso nuevo, así lo que retiene un tamaño no
+contamina al siguiente.
+
+Uso:
+    python -m benchmarks.medir_etapas --tamaños 1000 100000 1000000
+    python -m benchmarks.medir_etapas --jsonl resultados.jsonl --etiqueta main
+    python -m benchmarks.medir_etapas --jsonl nuevo.jsonl --base resultados.jsonl
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+from pathlib import Path
+
+from benchmarks.generar_condensado import MAX_FILAS_EXCEL
+from benchmarks.medir_ingesta import rss_pico_mb
+
+TAMAÑOS_DEF = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+
+# Una etapa más lenta que la base por encima de esto (y de MIN_SEGUNDOS) es regresión
+TOLERANCIA   = 0.25
+MIN_SEGUNDOS = 0.05
+
+
+# ── Etapas ───────────────────────────────────────────────────────────────────
+# Cada etapa recibe el contexto `c` (un dict) y deja en él lo que usan las
+# siguientes. Para comparar otro motor, basta con registrar sus etapas aquí.
+ETAPAS = OrderedDict()
+
+
+def etapa(nombre):
+    def registrar(funcion):
+        ETAPAS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+@etapa("excel")
+def _excel(c):
+    from benchmarks.generar_condensado import guardar
+    from ingesta import leer_excel_streaming
+
+    if not c["excel"] or len(c["crudo"]) > MAX_FILAS_EXCEL:
+        return False
+    ruta = guardar(c["crudo"], Path(c["tmp"]) / "condensado.xlsx")
+    leer_excel_streaming(ruta)
+
+
+@etapa("preparar")
+def _preparar(c):
+    from ingesta import preparar
+
+    c["preparado"] = preparar(c.pop("crudo"))
+
+
+@etapa("compactar")
+def _compactar(c):
+    from ingesta import compactar
+
+    c["df"] = compactar(c.pop("preparado"))
+
+
+@etapa("snapshot")
+def _snapshot(c):
+    # Lo que cuesta una carga con el snapshot ya en caché
+    import pandas as pd
+
+    from cache_condensado import guardar
+    from ingesta import compactar
+
+    ruta = Path(c["tmp"]) / "snapshot.parquet"
+    guardar(c["df"], ruta)
+    compactar(pd.read_parquet(ruta))
+
+
+@etapa("compartido_publicar")
+def _compartido_publicar(c):
+    from compartido import Registro
+
+    c["publicado"] = Registro(Path(c["tmp"]) / "compartido").adjuntar(("bench",), lambda: c["df"])
+
+
+@etapa("compartido_adjuntar")
+def _compartido_adjuntar(c):
+    # Otra sesión u otro proceso: abre el archivo con memory map, sin copiar columnas
+    from compartido import Registro
+
+    Registro(Path(c["tmp"]) / "compartido").adjuntar(("bench",)).soltar()
+    c.pop("publicado").soltar()
+
+
+@etapa("productos")
+def _productos(c):
+    # Nombres canónicos: se resuelven los nombres distintos y se reasignan códigos
+    from productos import TablaProductos
+
+    c["productos"] = TablaProductos(None)
+    c["canonico"]  = c["productos"].aplicar(c["df"])
+
+
+@etapa("dataset")
+def _dataset(c):
+    import analisis
+
+    c["datos"] = analisis.Dataset(c.pop("canonico"))
+
+
+@etapa("cubo")
+def _cubo(c):
+    c["datos"].cubo
+
+
+@etapa("filtro")
+def _filtro(c):
+    datos = c["datos"]
+    productos = datos.productos()
+    c["filtro"] = filtro = datos.filtrar(
+        productos[: max(1, len(productos) // 2)], datos.exportadores()[:3], datos.años()[-2:],
+    )
+    filtro.filas
+
+
+@etapa("agregacion_cubo")
+def _agregacion_cubo(c):
+    import analisis
+
+    filtro, costos = c["filtro"], c["datos"].costos
+    c["grupos"] = {por: filtro.promedio_por(costos[0], por) for por in analisis.AGRUPACIONES}
+    c["anual"]  = filtro.promedio_anual(costos)
+    filtro.matriz_años
+    filtro.estadisticas(c["datos"].tipos_cambio)
+
+
+@etapa("agregacion_pandas")
+def _agregacion_pandas(c):
+    # Referencia: el groupby directo sobre las filas filtradas que hacía el dashboard
+    filtro, costos = c["filtro"], c["datos"].costos
+    df = filtro.df()
+    df.groupby(["Producto/Presentación", "Año"], observed=True)[costos[0]].mean()
+    df.groupby("Año")[costos[0]].mean()
+    df.groupby(["Mes", "Año"], observed=True)[costos[0]].mean()
+    df.groupby("Año")[costos].mean()
+    df.groupby("Año")[c["datos"].tipos_cambio].agg(["mean", "min", "max"])
+
+
+@etapa("almacen_sqlite")
+def _almacen_sqlite(c):
+    from almacen import Almacen
+
+    almacen = Almacen(Path(c["tmp"]) / "almacen.sqlite")
+    almacen.agregar("sintetico", c["df"])
+    c["almacen"] = almacen
+
+
+@etapa("agregacion_sqlite")
+def _agregacion_sqlite(c):
+    # Las mismas consultas que agregacion_cubo, resueltas en SQLite (el almacén
+    # guarda los nombres originales; los canónicos se aplican en la consulta)
+    import analisis
+
+    c["datos_sql"] = datos = analisis.Dataset.desde_almacen(
+        c["almacen"], motor="sqlite", productos=c["productos"],
+    )
+    f = c["filtro"]
+    filtro, costos = datos.filtrar(f.productos, f.exportadores, f.años), datos.costos
+    for por in analisis.AGRUPACIONES:
+        filtro.promedio_por(costos[0], por)
+    filtro.promedio_anual(costos)
+    filtro.matriz_años
+    filtro.estadisticas(datos.tipos_cambio)
+
+
+@etapa("comparar_motores")
+def _comparar_motores(c):
+    from motor_sql import comparar
+
+    diferencias = comparar(c["datos"], c["datos_sql"].cubo)
+    if (diferencias > 1e-9).any():
+        raise AssertionError(f"Los motores difieren:\n{diferencias}")
+
+
+@etapa("figuras")
+def _figuras(c):
+    from graficos import figura_costos, figura_todos
+
+    costo = c["datos"].costos[0]
+    figuras = [figura_costos(grp, costo, por, "Barras + Línea") for por, grp in c["grupos"].items()]
+    figuras.append(figura_todos(c["anual"], c["datos"].costos))
+    # Lo que hace st.plotly_chart con cada figura
+    for fig in figuras:
+        fig.to_json()
+
+
+@etapa("tipo_cambio_dia")
+def _tipo_cambio_dia(c):
+    from graficos import figura_tipo_cambio
+
+    tcs = c["datos"].tipos_cambio
+    serie = c["filtro"].serie_diaria(tcs)
+    figura_tipo_cambio(serie, "Fecha", tcs, "Línea", max_puntos=1200).to_json()
+
+
+@etapa("ventanas")
+def _ventanas(c):
+    import pandas as pd
+
+    from ventanas import VENTANAS, CacheRodantes, diferenciales
+
+    for ventana in VENTANAS:
+        c["filtro"].ventanas(ventana)
+    # Estado sin el último mes, para medir aparte lo que cuesta agregarlo
+    serie = diferenciales(c["filtro"].serie_diaria(c["datos"].tipos_cambio).drop(columns="Año"))
+    ultimo_mes = serie["Fecha"] >= serie["Fecha"].max() - pd.DateOffset(months=1)
+    c["serie_tc"], c["rodantes"] = serie, CacheRodantes()
+    for ventana in VENTANAS:
+        c["rodantes"].obtener("sin_ultimo_mes", "bench", ventana, serie[~ultimo_mes])
+
+
+@etapa("ventanas_incremental")
+def _ventanas_incremental(c):
+    from ventanas import VENTANAS
+
+    for ventana in VENTANAS:
+        c["rodantes"].obtener("completa", "bench", ventana, c["serie_tc"])
+
+
+@etapa("busqueda")
+def _busqueda(c):
+    filtro = c["filtro"]
+    for texto in ["tomate", "luema", "bio verde 1", "zz-sin-resultados"]:
+        filtro.buscar(texto)
+
+
+@etapa("tabla")
+def _tabla(c):
+    from ingesta import COLUMNAS_COSTOS
+
+    tabla, filas = c["datos"].tabla, c["filtro"].filas
+    for columna in [None, COLUMNAS_COSTOS[0], "Producto/Presentación"]:
+        ordenadas = tabla.ordenar(filas, columna, ascendente=False)
+        tabla.pagina(ordenadas, 1, 100).style.format("{:,.4f}", subset=[COLUMNAS_COSTOS[0]]).to_html()
+
+
+@etapa("escenarios")
+def _escenarios(c):
+    c["filtro"].escenarios()
+    c["filtro"].escenarios(por="Producto/Presentación")
+
+
+@etapa("exportar_csv")
+def _exportar_csv(c):
+    _exportar(c, "CSV")
+
+
+@etapa("exportar_parquet")
+def _exportar_parquet(c):
+    _exportar(c, "Parquet")
+
+
+def _exportar(c, formato):
+    from exportar import FORMATOS, exportar
+
+    df = c["datos"].df
+    columnas = [col for col in df.columns if col not in ("Año", "Mes")]
+    exportar(df, Path(c["tmp"]) / f"exportacion{FORMATOS[formato][0]}", formato, c["filtro"].filas, columnas)
+
+
+# ── Medición ─────────────────────────────────────────────────────────────────
+def _medir(tamaño, semilla, excel, cola):
+    from benchmarks.generar_condensado import generar
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        contexto = {"crudo": generar(tamaño, semilla), "tmp": tmp, "excel": excel}
+        resultados.append({"etapa": "generar", "segundos": time.perf_counter() - t0, "pico_mb": None})
+
+        for nombre, funcion in ETAPAS.items():
+            gc.collect()
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            omitida = funcion(contexto) is False
+            segundos = time.perf_counter() - t0
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if not omitida:
+                resultados.append({"etapa": nombre, "segundos": segundos, "pico_mb": pico / 1024 ** 2})
+    cola.put({"resultados": resultados, "rss_pico_mb": rss_pico_mb()})
+
+
+def medir(tamaño, semilla=0, excel=False):
+    """Corre las etapas sobre `tamaño` renglones sintéticos en un proceso nuevo."""
+    ctx  = mp.get_context("spawn")
+    cola = ctx.Queue()
+    proc = ctx.Process(target=_medir, args=(tamaño, semilla, excel, cola))
+    proc.start()
+    resultado = cola.get()
+    proc.join()
+    return resultado
+
+
+def regresiones(registros, base, tolerancia=TOLERANCIA):
+    """(tamaño, etapa, segundos base, segundos) de las etapas más lentas que en `base`."""
+    referencia = {(r["tamaño"], r["etapa"]): r["segundos"] for r in base}
+    lentas = []
+    for r in registros:
+        antes = referencia.get((r["tamaño"], r["etapa"]))
+        if antes is not None and r["segundos"] > max(antes * (1 + tolerancia), MIN_SEGUNDOS):
+            lentas.append((r["tamaño"], r["etapa"], antes, r["segundos"]))
+    return lentas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("--tamaños", type=int, nargs="+", default=TAMAÑOS_DEF,
+                        help="renglones por Condensado (def. 10³ a 10⁶)")
+    parser.add_argument("--excel", action="store_true",
+                        help=f"incluye escribir y leer el .xlsx (hasta {MAX_FILAS_EXCEL:,} renglones; lento)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--etiqueta", default="", help="nombre de la corrida en el JSONL (p. ej. rama o motor)")
+    parser.add_argument("--jsonl", help="agrega los resultados a este archivo JSON-lines")
+    parser.add_argument("--base", help="JSONL de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args(argv)
+
+    registros = []
+    print(f"{'renglones':>11} {'etapa':<18} {'seg':>9} {'pico':>9}")
+    for tamaño in args.tamaños:
+        r = medir(tamaño, args.semilla, args.excel)
+        for fila in r["resultados"]:
+            pico = f"{fila['pico_mb']:>7.1f}MB" if fila["pico_mb"] is not None else f"{'—':>9}"
+            print(f"{tamaño:>11,} {fila['etapa']:<18} {fila['segundos']:>9.3f} {pico}")
+            registros.append({"etiqueta": args.etiqueta, "tamaño": tamaño, **fila})
+        print(f"{tamaño:>11,} {'(RSS pico)':<18} {'':>9} {r['rss_pico_mb']:>7.0f}MB")
+
+    if args.jsonl:
+        marca = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(args.jsonl, "a", encoding="utf-8") as f:
+            for registro in registros:
+                f.write(json.dumps({"fecha": marca, **registro}, ensure_ascii=False) + "\n")
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = [json.loads(linea) for linea in f if linea.strip()]
+        lentas = regresiones(registros, base, args.tolerancia)
+        for tamaño, nombre, antes, ahora in lentas:
+            print(f"REGRESIÓN {tamaño:,} {nombre}: {antes:.3f}s → {ahora:.3f}s ({ahora / antes - 1:+.0%})")
+        if lentas:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+benchmarks/medir_ingesta.py
+---------------------------
+Compara los lectores de Condensado: memoria pico (RSS) y filas por segundo.
+
+Cada lector corre en un proceso nuevo, así el pico de RSS de uno no
+contamina la medición del otro.
+
+Uso:
+    python -m benchmarks.medir_ingesta Condensado.xlsx [otro.xlsx ...]
+"""
+
+import argparse
+import multiprocessing as mp
+import resource
+import sys
+import time
+
+LECTORES = {
+    "read_excel": "leer_excel",
+    "streaming":  "leer_excel_streaming",
+}
+
+
+def rss_pico_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return pico / 1024 ** 2 if sys.platform == "darwin" else pico / 1024
+
+
+def _medir(nombre_funcion, ruta, cola):
+    import ingesta
+
+    funcion = getattr(ingesta, nombre_funcion)
+    base = rss_pico_mb()
+    t0 = time.perf_counter()
+    df = funcion(ruta)
+    segundos = time.perf_counter() - t0
+    cola.put({
+        "filas":       len(df),
+        "segundos":    segundos,
+        "rss_base_mb": base,
+        "rss_pico_mb": rss_pico_mb(),
+        "frame_mb":    df.memory_usage(deep=True).sum() / 1024 ** 2,
+    })
+
+
+def medir(lector, ruta):
+    ctx  = mp.get_context("spawn")
+    cola = ctx.Queue()
+    proc = ctx.Process(target=_medir, args=(LECTORES[lector], ruta, cola))
+    proc.start()
+    resultado = cola.get()
+    proc.join()
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("archivos", nargs="+")
+    parser.add_argument("--lector", choices=list(LECTORES), action="append",
+                        help="lector a medir (por defecto, todos)")
+    args = parser.parse_args(argv)
+
+    print(f"{'archivo':<32} {'lector':<11} {'filas':>9} {'seg':>8} "
+          f"{'filas/s':>10} {'RSS pico':>9} {'Δ RSS':>8} {'frame':>8}")
+    for ruta in args.archivos:
+        for lector in args.lector or LECTORES:
+            r = medir(lector, ruta)
+            print(f"{ruta[-32:]:<32} {lector:<11} {r['filas']:>9,} {r['segundos']:>8.2f} "
+                  f"{r['filas'] / r['segundos']:>10,.0f} {r['rss_pico_mb']:>7.0f}MB "
+                  f"{r['rss_pico_mb'] - r['rss_base_mb']:>6.0f}MB {r['frame_mb']:>6.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+cache_condensado.py
+-------------------
+Caché en disco de Condensados ya procesados, en formato columnar (Parquet).
+
+Cada archivo se identifica por el hash SHA-256 de su contenido: el primer
+`cargar` lo lee con `ingesta.leer_excel_streaming` (que ya aplica
+`ingesta.preparar`) y guarda el resultado; las cargas siguientes (otro
+usuario, reinicio de Streamlit) leen el Parquet directamente. El directorio tiene un límite de tamaño y se
+desalojan primero los archivos usados hace más tiempo (LRU por mtime).
+
+Variables de entorno:
+    CONDENSADO_CACHE_DIR   directorio del caché (def. ~/.cache/analisis-costos)
+    CONDENSADO_CACHE_MB    tamaño máximo en MB (def. 512)
+"""
+
+import hashlib
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from ingesta import leer_bytes, leer_excel_streaming
+
+CACHE_DIR = Path(os.environ.get(
+    "CONDENSADO_CACHE_DIR",
+    Path.home() / ".cache" / "analisis-costos",
+))
+LIMITE_BYTES = int(float(os.environ.get("CONDENSADO_CACHE_MB", 512)) * 1024 ** 2)
+
+# Se incrementa cuando cambia el lector o `ingesta.preparar`, para invalidar los snapshots viejos.
+VERSION_SNAPSHOT = 2
+
+
+def hash_contenido(datos):
+    h = hashlib.sha256(f"v{VERSION_SNAPSHOT}:".encode())
+    h.update(datos)
+    return h.hexdigest()
+
+
+def ruta_snapshot(clave, directorio=None):
+    return Path(directorio or CACHE_DIR) / f"{clave}.parquet"
+
+
+def leer_snapshot(clave, directorio=None):
+    """Devuelve el snapshot de `clave`, o None si no está en el caché."""
+    ruta = ruta_snapshot(clave, directorio)
+    if not ruta.exists():
+        return None
+    try:
+        df = pd.read_parquet(ruta)
+        os.utime(ruta)  # marca de uso para el LRU
+        return df
+    except (OSError, ValueError):
+        # Snapshot corrupto o truncado: se regenera
+        ruta.unlink(missing_ok=True)
+        return None
+
+
+def cargar(archivo, directorio=None, limite_bytes=None):
+    """Devuelve el DataFrame del Condensado, usando el snapshot si ya existe."""
+    datos = leer_bytes(archivo)
+    clave = hash_contenido(datos)
+    df = leer_snapshot(clave, directorio)
+    if df is None:
+        df = _parsear(datos, clave, directorio, limite_bytes)
+    return df
+
+
+def cargar_varios(archivos, directorio=None, limite_bytes=None, max_procesos=None):
+    """Carga varios Condensados; los que no están en caché se leen en paralelo.
+
+    Devuelve una lista de (clave, DataFrame) en el mismo orden que `archivos`.
+    """
+    archivos = [leer_bytes(a) for a in archivos]
+    claves   = [hash_contenido(d) for d in archivos]
+    frames   = cargar_claves(claves, dict(zip(claves, archivos)),
+                             directorio, limite_bytes, max_procesos)
+    return [(clave, frames[clave]) for clave in claves]
+
+
+def cargar_claves(claves, archivos, directorio=None, limite_bytes=None, max_procesos=None):
+    """Devuelve {clave: DataFrame} leyendo del caché o, si falta, del archivo.
+
+    `archivos` mapea cada clave a su contenido (o a cualquier cosa que acepte
+    `ingesta.leer_bytes`); sólo se lee para las claves sin snapshot. Cada
+    archivo no cacheado se procesa en un proceso aparte (lectura por
+    streaming + snapshot); con uno solo no se crea el pool.
+    """
+    frames     = {}
+    pendientes = {}
+    for clave in dict.fromkeys(claves):
+        df = leer_snapshot(clave, directorio)
+        if df is not None:
+            frames[clave] = df
+        elif archivos.get(clave) is None:
+            raise FileNotFoundError(f"El Condensado {clave[:12]}… ya no está en caché; vuelve a subirlo.")
+        else:
+            pendientes[clave] = leer_bytes(archivos[clave])
+
+    if len(pendientes) == 1:
+        (clave, datos), = pendientes.items()
+        frames[clave] = _parsear(datos, clave, directorio, limite_bytes)
+    elif pendientes:
+        procesos = min(len(pendientes), max_procesos or os.cpu_count() or 1)
+        # spawn: el servidor de Streamlit tiene hilos y fork no es seguro ahí
+        with ProcessPoolExecutor(procesos, mp_context=mp.get_context("spawn")) as pool:
+            resultados = pool.map(
+                _parsear,
+                pendientes.values(),
+                pendientes.keys(),
+                [directorio] * len(pendientes),
+                [limite_bytes] * len(pendientes),
+            )
+            frames.update(zip(pendientes.keys(), resultados))
+    return frames
+
+
+def _parsear(datos, clave, directorio=None, limite_bytes=None):
+    ruta = ruta_snapshot(clave, directorio)
+    df = leer_excel_streaming(datos)
+    guardar(df, ruta)
+    desalojar(ruta.parent, limite_bytes)
+    return df
+
+
+def guardar(df, ruta):
+    """Escribe el snapshot de forma atómica (archivo temporal + rename)."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, ruta)
+    except OSError:
+        # Sin permisos o disco lleno: el caché es opcional
+        tmp.unlink(missing_ok=True)
+
+
+def desalojar(directorio=None, limite_bytes=None):
+    """Borra los snapshots menos usados hasta quedar bajo el límite."""
+    directorio   = Path(directorio or CACHE_DIR)
+    limite_bytes = LIMITE_BYTES if limite_bytes is None else limite_bytes
+    if not directorio.exists():
+        return
+
+    archivos = []
+    for ruta in directorio.glob("*.parquet"):
+        try:
+            st = ruta.stat()
+        except FileNotFoundError:
+            continue
+        archivos.append((st.st_mtime, st.st_size, ruta))
+
+    total = sum(tam for _, tam, _ in archivos)
+    for _, tam, ruta in sorted(archivos):
+        if total <= limite_bytes:
+            break
+        ruta.unlink(missing_ok=True)
+        total -= tam
@@ -0,0 +1,245 @@
+"""
+compartido.py
+-------------
+Datasets de sólo lectura compartidos entre sesiones y procesos del mismo equipo.
+
+Un Condensado combinado se escribe una sola vez como archivo Arrow IPC sin
+compresión (`<directorio>/<hash>.arrow`) y cada proceso lo abre con memory
+map: las columnas numéricas y de fecha del DataFrame apuntan directo a las
+páginas del archivo, que el sistema operativo comparte entre procesos, y
+dentro de un proceso todas las sesiones reciben el mismo DataFrame (y el
+mismo `analisis.Dataset`), sin copias ni pickle. Los faltantes se guardan
+como NaN / NaT y no como nulos de Arrow, así la conversión a pandas no copia;
+las categorías de texto, que son pocas, sí se copian.
+
+Conteo de referencias:
+- en un proceso, cada `Adjunto` (uno por sesión) cuenta una; se suelta con
+  `soltar()` o cuando el objeto se recolecta (la sesión terminó);
+- entre procesos, cada proceso con el snapshot abierto deja un archivo
+  `<hash>.<pid>.ref`.
+Al soltar la última referencia del proceso se borra su `.ref` y, si no queda
+el `.ref` de ningún otro proceso vivo, también el `.arrow`.
+
+Variables de entorno:
+    CONDENSADO_COMPARTIDO       "0" desactiva los snapshots compartidos en el dashboard
+    CONDENSADO_COMPARTIDO_DIR   directorio (def. <CONDENSADO_CACHE_DIR>/compartido)
+"""
+
+import hashlib
+import os
+import threading
+import weakref
+from pathlib import Path
+
+import pandas as pd
+
+from cache_condensado import CACHE_DIR
+
+ACTIVO     = os.environ.get("CONDENSADO_COMPARTIDO", "1") != "0"
+DIRECTORIO = Path(os.environ.get("CONDENSADO_COMPARTIDO_DIR", CACHE_DIR / "compartido"))
+
+
+# ── Archivo Arrow ────────────────────────────────────────────────────────────
+def escribir(df, ruta):
+    """Escribe `df` como Arrow IPC sin compresión, de forma atómica (temporal + rename)."""
+    import pyarrow as pa
+
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    metadatos = tabla.schema.metadata
+    for i, nombre in enumerate(tabla.column_names):
+        serie = df[nombre]
+        # NaN y NaT como valores, no como nulos: la lectura queda sin copia
+        if pd.api.types.is_float_dtype(serie.dtype):
+            arreglo = pa.array(serie.to_numpy(), from_pandas=False)
+        elif pd.api.types.is_datetime64_dtype(serie.dtype):
+            arreglo = pa.array(serie.to_numpy(dtype="datetime64[ns]").view("int64")).cast(pa.timestamp("ns"))
+        else:
+            continue
+        tabla = tabla.set_column(i, pa.field(nombre, arreglo.type), arreglo)
+    tabla = tabla.replace_schema_metadata(metadatos)
+
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with pa.OSFile(str(tmp), "wb") as destino, pa.ipc.new_file(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        os.replace(tmp, ruta)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def abrir(ruta):
+    """(memory map, DataFrame de sólo lectura) del archivo `ruta`.
+
+    Los buffers de Arrow mantienen vivo el mapeo mientras el DataFrame exista.
+    """
+    import pyarrow as pa
+
+    mapa  = pa.memory_map(str(ruta), "r")
+    tabla = pa.ipc.open_file(mapa).read_all()
+    return mapa, tabla.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def _vivo(pid):
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # En Windows os.kill termina el proceso: se asume vivo
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ── Registro por proceso ─────────────────────────────────────────────────────
+class _Instantanea:
+    def __init__(self, h, clave, variante, ruta, mapa, df):
+        self.h, self.clave, self.variante, self.ruta = h, clave, variante, ruta
+        self.mapa, self.df = mapa, df
+        self.refs      = 0
+        self.derivados = {}
+        self.lock      = threading.Lock()
+
+
+class Adjunto:
+    """Referencia de una sesión (o de un proceso) a un dataset compartido."""
+
+    def __init__(self, registro, instantanea):
+        self.clave    = instantanea.clave
+        self.variante = instantanea.variante
+        self._instantanea = instantanea
+        # Sin referencias a self: se suelta también cuando la sesión se recolecta
+        self._finalizar = weakref.finalize(self, registro._soltar, instantanea.h)
+
+    @property
+    def df(self):
+        return self._instantanea.df
+
+    @property
+    def ruta(self):
+        """Archivo Arrow, o None si no se pudo escribir (el DataFrame queda sólo en este proceso)."""
+        return self._instantanea.ruta
+
+    def compartir(self, nombre, construir):
+        """Objeto derivado (p. ej. el Dataset) construido una sola vez por proceso."""
+        instantanea = self._instantanea
+        with instantanea.lock:
+            if nombre not in instantanea.derivados:
+                instantanea.derivados[nombre] = construir()
+            return instantanea.derivados[nombre]
+
+    def soltar(self):
+        self._finalizar()
+
+
+class Registro:
+    """Snapshots abiertos en este proceso, con su conteo de referencias."""
+
+    def __init__(self, directorio=DIRECTORIO):
+        self.directorio = Path(directorio)
+        self._abiertas  = {}
+        self._creando   = {}
+        self._lock      = threading.Lock()
+
+    def adjuntar(self, clave, construir=None, variante=""):
+        """`Adjunto` del dataset `clave` (tupla de str).
+
+        Si el snapshot no existe en el equipo se escribe con el DataFrame de
+        `construir()`; sin `construir`, lanza FileNotFoundError. `variante`
+        distingue datasets con la misma clave y distinto tratamiento (p. ej.
+        con nombres de producto canónicos).
+        """
+        h = hashlib.sha256("\0".join([variante, *clave]).encode()).hexdigest()[:32]
+        # Una sola sesión construye cada snapshot; las demás esperan y lo abren.
+        # El mismo lock serializa `_soltar`, así no se adjunta uno que se está cerrando.
+        with self._creando_de(h):
+            with self._lock:
+                instantanea = self._abiertas.get(h)
+                if instantanea is not None:
+                    instantanea.refs += 1
+            if instantanea is None:
+                instantanea = self._abrir(h, tuple(clave), variante, construir)
+                with self._lock:
+                    instantanea.refs += 1
+                    self._abiertas[h] = instantanea
+        return Adjunto(self, instantanea)
+
+    def _creando_de(self, h):
+        # Reentrante: el finalizador de un Adjunto puede correr (gc) dentro de adjuntar
+        with self._lock:
+            return self._creando.setdefault(h, threading.RLock())
+
+    def _abrir(self, h, clave, variante, construir):
+        ruta = self.directorio / f"{h}.arrow"
+        marca = self.directorio / f"{h}.{os.getpid()}.ref"
+        df = None
+        try:
+            # La marca va antes de abrir, para que otro proceso no lo desaloje
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            marca.touch()
+            for _ in range(2):
+                if ruta.exists():
+                    try:
+                        mapa, df = abrir(ruta)
+                        return _Instantanea(h, clave, variante, ruta, mapa, df)
+                    except FileNotFoundError:
+                        # Otro proceso lo desalojó entre exists() y la apertura
+                        pass
+                if construir is None:
+                    raise FileNotFoundError(f"No hay dataset compartido para {clave}")
+                df = construir()
+                escribir(df, ruta)
+            mapa, df = abrir(ruta)
+            return _Instantanea(h, clave, variante, ruta, mapa, df)
+        except OSError:
+            if construir is None:
+                raise
+            # Sin disco o sin permisos: el dataset queda sólo en este proceso
+            marca.unlink(missing_ok=True)
+            return _Instantanea(h, clave, variante, None, None, construir() if df is None else df)
+
+    def _soltar(self, h):
+        with self._creando_de(h):
+            with self._lock:
+                instantanea = self._abiertas.get(h)
+                if instantanea is None:
+                    return
+                instantanea.refs -= 1
+                if instantanea.refs > 0:
+                    return
+                del self._abiertas[h]
+            # Aún con el lock del hash: un adjuntar concurrente espera y abre de nuevo
+            instantanea.derivados.clear()
+            instantanea.df = instantanea.mapa = None
+            if instantanea.ruta is not None:
+                self._desalojar(h, instantanea.ruta)
+
+    def _desalojar(self, h, ruta):
+        (self.directorio / f"{h}.{os.getpid()}.ref").unlink(missing_ok=True)
+        for marca in self.directorio.glob(f"{h}.*.ref"):
+            try:
+                pid = int(marca.suffixes[-2].lstrip("."))
+            except (IndexError, ValueError):
+                continue
+            if _vivo(pid):
+                return
+            marca.unlink(missing_ok=True)
+        try:
+            ruta.unlink(missing_ok=True)
+        except OSError:
+            # Windows no borra un archivo mapeado; queda para el siguiente desalojo
+            pass
+
+    def abiertos(self):
+        """DataFrame con los snapshots abiertos en este proceso y sus referencias."""
+        with self._lock:
+            filas = [(i.h, len(i.clave), i.refs, None if i.df is None else len(i.df), i.ruta is not None)
+                     for i in self._abiertas.values()]
+        return pd.DataFrame(filas, columns=["hash", "archivos", "referencias", "filas", "en_disco"])
+
+
+REGISTRO = Registro()
@@ -0,0 +1,106 @@
+"""
+consolidado.py
+--------------
+Combinación incremental de varios Condensados (uno por período o exportador).
+
+Los renglones se identifican por COLUMNAS_CLAVE. Al agregar un archivo sólo
+entran los renglones cuya clave no existía ya en los archivos anteriores; los
+duplicados *dentro* de un mismo archivo se respetan, porque el Condensado
+original puede traer dos partidas con la misma clave y costos distintos.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+import cache_condensado
+from ingesta import COSTOS_FLOAT32, compactar, concatenar_compactos, leer_bytes, llaves
+
+
+class Consolidado:
+    """DataFrame combinado de un conjunto de Condensados.
+
+    `actualizar` recibe la lista completa de archivos cada vez (como la
+    entrega `st.file_uploader`) y sólo procesa los que son nuevos respecto a
+    la llamada anterior. Si se quitó o reordenó algún archivo, la combinación
+    se rehace desde los snapshots del caché, sin volver a leer ningún Excel.
+
+    El DataFrame combinado se guarda en la representación compacta de
+    `ingesta.compactar` (categorías, Año Int16 y, opcionalmente, float32).
+    """
+
+    def __init__(self, directorio=None, max_procesos=None, float32=COSTOS_FLOAT32):
+        self.directorio   = directorio
+        self.max_procesos = max_procesos
+        self.float32      = float32
+        self.claves = []
+        self.df     = None
+        self._llaves = np.empty(0, dtype="uint64")
+        self._clave_por_id = {}
+
+    def claves_de(self, archivos):
+        """Claves de `archivos` sin repetir, en orden, sin procesar ninguno."""
+        return list(dict.fromkeys(self._clave(a) for a in archivos))
+
+    def actualizar(self, archivos):
+        claves   = []
+        por_leer = {}
+        for archivo in archivos:
+            clave = self._clave(archivo)
+            if clave not in claves:
+                claves.append(clave)
+                por_leer[clave] = archivo
+
+        if claves == self.claves:
+            return self.df
+        if claves[:len(self.claves)] != self.claves:
+            self._reiniciar()
+
+        nuevas = claves[len(self.claves):]
+        frames = cache_condensado.cargar_claves(
+            nuevas, por_leer, self.directorio, max_procesos=self.max_procesos,
+        )
+        for clave in nuevas:
+            self._agregar(clave, frames[clave])
+        return self.df
+
+    def copia(self):
+        """Otro Consolidado con el mismo estado; actualizar la copia no cambia éste.
+
+        `df` y las llaves no se copian: `_agregar` los reemplaza, no los modifica.
+        """
+        otro = copy.copy(self)
+        otro.claves = list(self.claves)
+        otro._clave_por_id = dict(self._clave_por_id)
+        return otro
+
+    def _clave(self, archivo):
+        # El hash del contenido se memoiza por file_id de Streamlit para no
+        # releer cada archivo subido en cada rerun.
+        file_id = getattr(archivo, "file_id", None)
+        if file_id in self._clave_por_id:
+            return self._clave_por_id[file_id]
+        clave = cache_condensado.hash_contenido(leer_bytes(archivo))
+        if file_id is not None:
+            self._clave_por_id[file_id] = clave
+        return clave
+
+    def _reiniciar(self):
+        self.claves  = []
+        self.df      = None
+        self._llaves = np.empty(0, dtype="uint64")
+
+    def _agregar(self, clave, df):
+        llaves_df = llaves(df)
+        if self.df is None:
+            self.df = compactar(df.reset_index(drop=True), self.float32)
+        else:
+            nuevas = ~pd.Index(llaves_df).isin(self._llaves)
+            if nuevas.any():
+                # Sólo se compacta el bloque nuevo; lo ya combinado no se reconvierte
+                nuevo   = compactar(df[nuevas].reset_index(drop=True), self.float32)
+                self.df = concatenar_compactos(self.df, nuevo)
+            llaves_df = llaves_df[nuevas]
+        self._llaves = np.concatenate([self._llaves, llaves_df])
+        self.claves.append(clave)
@@ -0,0 +1,101 @@
+"""
+cubo.py
+-------
+Cubo de costos pre-agregado para el dashboard.
+
+Se calcula una sola vez por dataset: suma, conteo, mínimo y máximo de cada
+columna de costo y de tipo de cambio al grano
+(Producto/Presentación, Exportador, Año, Mes). Las gráficas y tablas se
+obtienen "enrollando" esas celdas para los filtros actuales, así que un
+cambio de widget cuesta O(celdas) y no O(filas).
+
+Los promedios se reconstruyen como suma / conteo de valores no nulos, igual
+que `DataFrame.mean()`; los mínimos y máximos, como mínimo de mínimos y
+máximo de máximos.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ingesta import COLUMNAS_COSTOS, COLUMNAS_TIPO_CAMBIO
+
+DIMENSIONES  = ["Producto/Presentación", "Exportador", "Año", "Mes"]
+ESTADISTICAS = ["sum", "count", "min", "max"]
+
+# Conteo de filas por celda (incluye filas con todos los costos vacíos)
+FILAS = ("_filas", "count")
+
+
+class Cubo:
+    """Celdas agregadas con índice DIMENSIONES y columnas (columna, estadística)."""
+
+    def __init__(self, celdas):
+        self.celdas = celdas
+
+    @classmethod
+    def construir(cls, df):
+        columnas = [c for c in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO if c in df.columns]
+        g = df.groupby(DIMENSIONES, dropna=False, observed=True, sort=False)
+        celdas = g[columnas].agg(ESTADISTICAS)
+        celdas[FILAS] = g.size()
+        return cls(celdas)
+
+    @property
+    def columnas(self):
+        return [c for c in self.celdas.columns.get_level_values(0).unique() if c != FILAS[0]]
+
+    # ── Filtros ──────────────────────────────────────────────────────────────
+    def filtrar(self, productos=None, exportadores=None, años=None):
+        """Sub-cubo con las celdas que cumplen los filtros (None = sin filtro)."""
+        idx  = self.celdas.index
+        mask = np.ones(len(idx), dtype=bool)
+        if productos is not None:
+            mask &= idx.get_level_values("Producto/Presentación").isin(productos)
+        if exportadores is not None:
+            mask &= idx.get_level_values("Exportador").isin(exportadores)
+        if años is not None:
+            mask &= idx.get_level_values("Año").isin(años)
+        return Cubo(self.celdas[mask])
+
+    # ── Resúmenes ────────────────────────────────────────────────────────────
+    @property
+    def vacio(self):
+        return self.registros() == 0
+
+    def registros(self):
+        return int(self.celdas[FILAS].sum())
+
+    def n_productos(self):
+        return self.celdas.index.get_level_values("Producto/Presentación").dropna().nunique()
+
+    def media_total(self, columnas):
+        """Promedio de cada columna sobre todas las celdas (Series)."""
+        sumas   = self.celdas[[(c, "sum") for c in columnas]].sum().droplevel(1)
+        cuentas = self.celdas[[(c, "count") for c in columnas]].sum().droplevel(1)
+        return sumas / cuentas.where(cuentas > 0)
+
+    def media(self, por, columnas):
+        """Promedio por las dimensiones `por`, como `df.groupby(por)[columnas].mean()`."""
+        g = self._agrupar(por)
+        sumas   = g[[(c, "sum") for c in columnas]].sum().droplevel(1, axis=1)
+        cuentas = g[[(c, "count") for c in columnas]].sum().droplevel(1, axis=1)
+        return sumas / cuentas.where(cuentas > 0)
+
+    def estadisticas(self, por, columnas):
+        """Promedio, mínimo y máximo, como `groupby(por)[columnas].agg(["mean", "min", "max"])`."""
+        g = self._agrupar(por)
+        medias  = self.media(por, columnas)
+        minimos = g[[(c, "min") for c in columnas]].min().droplevel(1, axis=1)
+        maximos = g[[(c, "max") for c in columnas]].max().droplevel(1, axis=1)
+        partes = {}
+        for c in columnas:
+            partes[(c, "mean")] = medias[c]
+            partes[(c, "min")]  = minimos[c]
+            partes[(c, "max")]  = maximos[c]
+        return pd.DataFrame(partes)
+
+    def _agrupar(self, por):
+        por = [por] if isinstance(por, str) else list(dict.fromkeys(por))
+        # Como en groupby sobre filas, sólo cuentan grupos con al menos una fila
+        celdas = self.celdas[self.celdas[FILAS] > 0]
+        return celdas.groupby(level=por, sort=True, observed=True)
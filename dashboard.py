@@ -11,11 +11,27 @@ Uso:
     streamlit run dashboard.py
 """
 
+import tempfile
+import uuid
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
+
+import analisis
+import vistas
+from almacen import RUTA_ALMACEN, Almacen
+from compartido import ACTIVO as COMPARTIDO
+from consolidado import Consolidado
+from escenarios import CAMBIOS_PCT, IMPORTACION, VARIABLES
+from exportar import FORMATOS, exportar
+from ingesta import COLUMNAS_COSTOS, COLUMNAS_TIPO_CAMBIO
+from motor_sql import MOTOR
+from perfil import Cronometro, Historial, Perfilador, escribir_log
+from precalculo import PRECALCULO
+from productos import RUTA_PRODUCTOS, TablaProductos
+from tabla import TAMAÑOS_PAGINA, TablaPaginada
+from ventanas import METRICAS, VENTANAS
 
 # ── Configuración de página ───────────────────────────────────────────────────
 st.set_page_config(
@@ -25,6 +41,26 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# ── Instrumentación del rerun ─────────────────────────────────────────────────
+# Cada bloque del script se mide con `crono.etapa`; el panel de rendimiento
+# del sidebar se llena al final. "Perfilar el siguiente rerun" corre el
+# rerun completo bajo cProfile.
+crono = Cronometro()
+perfilador = None
+if st.session_state.pop("perfilar_rerun", False):
+    perfilador = Perfilador()
+    perfilador.iniciar()
+
+
+def cerrar_rerun(registros=0):
+    """Detiene el perfilador y registra los tiempos; va antes de cada st.stop()."""
+    if perfilador is not None:
+        st.session_state["perfil_rerun"] = perfilador.detener()
+    historial = st.session_state.setdefault("historial_tiempos", Historial())
+    historial.agregar(crono)
+    escribir_log(crono.registro(registros=registros, motor=MOTOR))
+    return historial
+
 # ── Estilos CSS ───────────────────────────────────────────────────────────────
 st.markdown("""
 <style>
@@ -102,43 +138,108 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ── Paleta de colores para gráficos ──────────────────────────────────────────
-COLORES = [
-    "#3b82f6", "#f59e0b", "#10b981", "#ef4444",
-    "#8b5cf6", "#06b6d4", "#f97316", "#ec4899",
-]
+# ── Carga de datos ────────────────────────────────────────────────────────────
+def cargar_datos(archivos):
+    if RUTA_ALMACEN:
+        return cargar_historial(archivos)
+    # Un Consolidado por sesión: agregar un archivo sólo procesa ese archivo.
+    # El Dataset (cubo, índices) se rehace sólo cuando cambian los archivos.
+    if "consolidado" not in st.session_state:
+        st.session_state["consolidado"] = Consolidado()
+    consolidado = st.session_state["consolidado"]
+    if COMPARTIDO:
+        return cargar_compartido(archivos, consolidado)
+    consolidado.actualizar(archivos)
+
+    datos = st.session_state.get("datos")
+    if datos is None or datos.clave != analisis.clave_dataset(consolidado.claves, tabla_productos()):
+        datos = st.session_state["datos"] = analisis.Dataset.desde_consolidado(consolidado, tabla_productos())
+    return datos
+
+
+def cargar_compartido(archivos, consolidado):
+    # Un snapshot por equipo para todas las sesiones con los mismos archivos:
+    # la sesión sólo guarda su referencia y su Consolidado sólo calcula claves
+    claves  = tuple(consolidado.claves_de(archivos))
+    adjunto = st.session_state.get("adjunto")
+    if adjunto is None or adjunto.clave != claves or adjunto.variante != analisis.variante(tabla_productos()):
+        if adjunto is not None:
+            adjunto.soltar()
+        adjunto = st.session_state["adjunto"] = analisis.adjuntar(
+            archivos, productos=tabla_productos(), claves=claves,
+        )
+    return analisis.Dataset.desde_adjunto(adjunto)
+
+
+def cargar_historial(archivos):
+    # Con almacén, lo subido se agrega al historial (sólo renglones nuevos) y
+    # el Dataset sale del historial completo; sin archivos se abre igual.
+    if "almacen" not in st.session_state:
+        st.session_state["almacen"] = Almacen(RUTA_ALMACEN)
+        st.session_state["ingresados"] = set()
+    almacen    = st.session_state["almacen"]
+    ingresados = st.session_state["ingresados"]
+    nuevos = [a for a in archivos or [] if a.file_id not in ingresados]
+    if nuevos:
+        with st.spinner("Agregando al historial..."):
+            almacen.actualizar(nuevos)
+        ingresados.update(a.file_id for a in nuevos)
+
+    datos = st.session_state.get("datos")
+    if datos is None or datos.clave != analisis.clave_dataset(almacen.clave, tabla_productos()):
+        datos = st.session_state["datos"] = analisis.Dataset.desde_almacen(almacen, productos=tabla_productos())
+    return datos
+
+
+def tabla_productos():
+    # Nombres de producto canónicos: sólo se resuelven los nombres que la
+    # tabla aún no conoce y las filas se reasignan por código de categoría
+    if RUTA_PRODUCTOS is None:
+        return None
+    if "productos" not in st.session_state:
+        st.session_state["productos"] = TablaProductos(RUTA_PRODUCTOS)
+    return st.session_state["productos"]
+
+
+def mostrar_figura(fig):
+    # Serializar la figura y enviarla al navegador suele ser la parte cara
+    with crono.etapa("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
 
-# ── Columnas de costos disponibles ────────────────────────────────────────────
-COLUMNAS_COSTOS = [
-    "Precio compra EUROS",
-    "Costo pieza mxn",
-    "Flete Maritimo ($/pieza)",
-    "DTA ($/pieza)",
-    "IGI ($/pieza)",
-    "Aduana y Flete Terrestre ($/pieza)",
-    "COSTO DE IMPORTACION X PIEZA ($/pieza)",
-    "Gastos Locales Naviera $/pieza",
-    "Costo Compra Ana Dis ($/pieza)",
-    "Precio Unitario Compra Pasta Mia",
-]
 
-COLUMNAS_TIPO_CAMBIO = [
-    "TIPO DE CAMBIO",
-    "DÓLAR (DOF)",
-    "FACTORAJE (DOF)",
-]
+def mostrar_tabla(df, **kwargs):
+    # Incluye el formato del Styler, que se aplica al serializar
+    with crono.etapa("st.dataframe"):
+        st.dataframe(df, **kwargs)
 
-# ── Carga de datos ────────────────────────────────────────────────────────────
-@st.cache_data
-def cargar_datos(archivo):
-    df = pd.read_excel(archivo)
-    df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
-    df["Año"]   = df["Fecha"].dt.year
-    df["Mes"]   = df["Fecha"].dt.to_period("M").astype(str)
-    for col in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    return df
+
+def recordar(widget, etiqueta, *args, key, **kwargs):
+    """`widget(etiqueta, ..., key=key)` cuyo valor sobrevive a que su vista no se dibuje.
+
+    Streamlit descarta el estado de los widgets que no se dibujan en un rerun,
+    y sólo se dibuja la vista elegida. Por eso el valor se guarda también en
+    `st.session_state["selecciones"]`, que ningún widget controla. Al volver
+    a la vista, el widget se siembra desde ahí, si el valor sigue siendo
+    válido para sus opciones y límites. `tareas_precalculo` lee las mismas
+    selecciones.
+    """
+    selecciones = st.session_state.setdefault("selecciones", {})
+    if key not in st.session_state and key in selecciones and _admite(selecciones[key], *args, **kwargs):
+        st.session_state[key] = selecciones[key]
+        # Sembrado por session_state, el widget no debe recibir además un valor inicial
+        for inicial in ("value", "index", "default"):
+            kwargs.pop(inicial, None)
+    selecciones[key] = widget(etiqueta, *args, key=key, **kwargs)
+    return selecciones[key]
+
+
+def _admite(valor, options=None, *_, min_value=None, max_value=None, **__):
+    valores = list(valor) if isinstance(valor, (list, tuple)) else [valor]
+    if options is not None and any(v not in list(options) for v in valores):
+        return False
+    if min_value is not None and any(v < min_value for v in valores):
+        return False
+    return max_value is None or all(v <= max_value for v in valores)
 
 
 def delta_color(val):
@@ -156,15 +257,22 @@ with st.sidebar:
     st.markdown("## 📦 Importaciones")
     st.markdown("---")
 
-    archivo = st.file_uploader(
-        "CARGAR CONDENSADO (.xlsx)",
+    archivos = st.file_uploader(
+        "CARGAR CONDENSADOS (.xlsx)",
         type=["xlsx"],
-        help="Sube el archivo generado por transformar.py",
+        accept_multiple_files=True,
+        help="Sube uno o varios archivos generados por transformar.py",
     )
 
-    if archivo:
-        df = cargar_datos(archivo)
-        años_disponibles = sorted(df["Año"].dropna().unique().astype(int))
+    datos = None
+    if archivos or RUTA_ALMACEN:
+        with crono.etapa("cargar_datos"):
+            datos = cargar_datos(archivos)
+    if RUTA_ALMACEN:
+        st.caption(f"Historial: {RUTA_ALMACEN}")
+
+    if datos is not None:
+        años_disponibles = datos.años()
 
         st.markdown("### PERÍODO")
         años_sel = st.multiselect(
@@ -182,14 +290,14 @@ with st.sidebar:
             año_a = año_b = None
 
         st.markdown("### FILTROS")
-        productos_disp = sorted(df["Producto/Presentación"].dropna().unique())
+        productos_disp = datos.productos()
         productos_sel  = st.multiselect(
             "PRODUCTOS",
             options=productos_disp,
             default=productos_disp,
         )
 
-        exportadores_disp = sorted(df["Exportador"].dropna().unique())
+        exportadores_disp = datos.exportadores()
         exportadores_sel  = st.multiselect(
             "EXPORTADOR",
             options=exportadores_disp,
@@ -203,6 +311,10 @@ with st.sidebar:
             index=0,
         )
 
+    st.markdown("### RENDIMIENTO")
+    mostrar_rendimiento = st.toggle("Panel de rendimiento", value=False)
+    panel_rendimiento = st.container()
+
 
 # ════════════════════════════════════════════════════════════════════════════
 #  MAIN
@@ -210,23 +322,24 @@ with st.sidebar:
 st.markdown('<p class="main-title">Análisis de Costos de Importación</p>', unsafe_allow_html=True)
 st.markdown('<p class="sub-title">Comparativa anual · Comportamiento por producto · Tipo de cambio</p>', unsafe_allow_html=True)
 
-if not archivo:
+if datos is None:
     st.markdown("---")
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        st.info("👈 **Carga tu archivo Condensado** desde el panel izquierdo para comenzar.")
+        st.info("👈 **Carga tus archivos Condensado** desde el panel izquierdo para comenzar.")
+    cerrar_rerun()
     st.stop()
 
 # ── Aplicar filtros ───────────────────────────────────────────────────────────
-df_filtrado = df[
-    df["Producto/Presentación"].isin(productos_sel) &
-    df["Exportador"].isin(exportadores_sel)
-]
-if años_sel:
-    df_filtrado = df_filtrado[df_filtrado["Año"].isin(años_sel)]
+# Las agregaciones salen del cubo pre-agregado (O(celdas) por rerun) y las
+# filas, del índice de filtros memoizado por selección.
+with crono.etapa("filtro"):
+    filtro = datos.filtrar(productos_sel, exportadores_sel, años_sel if años_sel else None)
+    vacio  = filtro.vacio
 
-if df_filtrado.empty:
+if vacio:
     st.warning("No hay datos con los filtros seleccionados.")
+    cerrar_rerun()
     st.stop()
 
 # ════════════════════════════════════════════════════════════════════════════
@@ -235,11 +348,13 @@ if df_filtrado.empty:
 st.markdown('<p class="section-header">Resumen del período seleccionado</p>', unsafe_allow_html=True)
 
 cols_metricas = st.columns(4)
+with crono.etapa("resumen"):
+    resumen_filtro = filtro.resumen()
 metricas = [
-    ("Registros totales",       len(df_filtrado),                                          None),
-    ("Productos únicos",        df_filtrado["Producto/Presentación"].nunique(),             None),
-    ("Precio compra EUR (prom)", df_filtrado["Precio compra EUROS"].mean()                 if "Precio compra EUROS" in df_filtrado else None, "€"),
-    ("Costo importación (prom)", df_filtrado["COSTO DE IMPORTACION X PIEZA ($/pieza)"].mean() if "COSTO DE IMPORTACION X PIEZA ($/pieza)" in df_filtrado else None, "$"),
+    ("Registros totales",        resumen_filtro["registros"],         None),
+    ("Productos únicos",         resumen_filtro["productos"],         None),
+    ("Precio compra EUR (prom)", resumen_filtro["precio_eur"],        "€"),
+    ("Costo importación (prom)", resumen_filtro["costo_importacion"], "$"),
 ]
 
 for col, (label, val, sym) in zip(cols_metricas, metricas):
@@ -253,324 +368,389 @@ for col, (label, val, sym) in zip(cols_metricas, metricas):
         """, unsafe_allow_html=True)
 
 # ════════════════════════════════════════════════════════════════════════════
-#  TABS PRINCIPALES
+#  VISTAS PRINCIPALES
 # ════════════════════════════════════════════════════════════════════════════
-tab1, tab2, tab3, tab4 = st.tabs([
-    "📊 Comparativa de Costos",
-    "🔁 Comparación entre Años",
-    "💱 Tipo de Cambio",
-    "📋 Datos Detallados",
-])
+# Sólo se ejecuta la vista elegida. Cada vista es un fragmento: sus propios
+# widgets la vuelven a correr sin repetir el resto del script, mientras que
+# los filtros del sidebar y el selector de vista hacen un rerun completo.
+# Las figuras salen de `vistas.py`, compartidas con el precálculo. Los
+# widgets de las vistas pasan por `recordar`, así sus valores se conservan
+# al cambiar de vista.
 
 
 # ────────────────────────────────────────────────────────────────────────────
-# TAB 1 — Comparativa de costos por producto/año
+# Vista 1 — Comparativa de costos por producto/año
 # ────────────────────────────────────────────────────────────────────────────
-with tab1:
+@st.fragment
+def vista_costos(filtro, tipo_grafico):
+    datos = filtro.datos
     st.markdown('<p class="section-header">Costos por producto y año</p>', unsafe_allow_html=True)
 
     col_izq, col_der = st.columns([1, 3])
     with col_izq:
-        costo_sel = st.selectbox(
-            "Selecciona el costo a analizar",
-            options=[c for c in COLUMNAS_COSTOS if c in df_filtrado.columns],
+        costo_sel = recordar(
+            st.selectbox, "Selecciona el costo a analizar",
+            options=datos.costos,
+            key="costo_sel",
         )
-        agrupar_por = st.radio("Agrupar por", ["Producto", "Año", "Mes"], index=0)
+        agrupar_por = recordar(st.radio, "Agrupar por", ["Producto", "Año", "Mes"], index=0, key="agrupar_por")
 
     with col_der:
-        if agrupar_por == "Producto":
-            grp = df_filtrado.groupby(["Producto/Presentación", "Año"])[costo_sel].mean().reset_index()
-            fig = go.Figure()
-            for i, año in enumerate(sorted(grp["Año"].unique())):
-                datos_año = grp[grp["Año"] == año]
-                color = COLORES[i % len(COLORES)]
-                if tipo_grafico == "Barras":
-                    fig.add_trace(go.Bar(
-                        name=str(año),
-                        x=datos_año["Producto/Presentación"],
-                        y=datos_año[costo_sel],
-                        marker_color=color,
-                        text=datos_año[costo_sel].round(4),
-                        textposition="outside",
-                    ))
-                elif tipo_grafico == "Línea":
-                    fig.add_trace(go.Scatter(
-                        name=str(año),
-                        x=datos_año["Producto/Presentación"],
-                        y=datos_año[costo_sel],
-                        mode="lines+markers",
-                        line=dict(color=color, width=2.5),
-                        marker=dict(size=8),
-                    ))
-                else:  # Barras + Línea
-                    fig.add_trace(go.Bar(
-                        name=f"{año} (barra)",
-                        x=datos_año["Producto/Presentación"],
-                        y=datos_año[costo_sel],
-                        marker_color=color,
-                        opacity=0.7,
-                    ))
-                    fig.add_trace(go.Scatter(
-                        name=f"{año} (línea)",
-                        x=datos_año["Producto/Presentación"],
-                        y=datos_año[costo_sel],
-                        mode="lines+markers",
-                        line=dict(color=color, width=2, dash="dot"),
-                    ))
-
-        elif agrupar_por == "Año":
-            grp = df_filtrado.groupby("Año")[costo_sel].mean().reset_index()
-            fig = go.Figure()
-            if tipo_grafico in ["Barras", "Barras + Línea"]:
-                fig.add_trace(go.Bar(
-                    x=grp["Año"].astype(str),
-                    y=grp[costo_sel],
-                    marker_color=COLORES[:len(grp)],
-                    text=grp[costo_sel].round(4),
-                    textposition="outside",
-                ))
-            if tipo_grafico in ["Línea", "Barras + Línea"]:
-                fig.add_trace(go.Scatter(
-                    x=grp["Año"].astype(str),
-                    y=grp[costo_sel],
-                    mode="lines+markers",
-                    line=dict(color=COLORES[1], width=3),
-                    marker=dict(size=10),
-                ))
-
-        else:  # Mes
-            grp = df_filtrado.groupby(["Mes", "Año"])[costo_sel].mean().reset_index().sort_values("Mes")
-            fig = go.Figure()
-            for i, año in enumerate(sorted(grp["Año"].unique())):
-                datos_año = grp[grp["Año"] == año]
-                color = COLORES[i % len(COLORES)]
-                if tipo_grafico == "Barras":
-                    fig.add_trace(go.Bar(name=str(año), x=datos_año["Mes"], y=datos_año[costo_sel], marker_color=color))
-                else:
-                    fig.add_trace(go.Scatter(
-                        name=str(año), x=datos_año["Mes"], y=datos_año[costo_sel],
-                        mode="lines+markers", line=dict(color=color, width=2.5), marker=dict(size=7),
-                    ))
-
-        fig.update_layout(
-            title=dict(text=f"<b>{costo_sel}</b> — promedio por {agrupar_por.lower()}", font=dict(size=15, color="#1e293b")),
-            barmode="group",
-            plot_bgcolor="white",
-            paper_bgcolor="white",
-            font=dict(family="DM Sans", size=12, color="#374151"),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            xaxis=dict(showgrid=False, linecolor="#e2e8f0"),
-            yaxis=dict(gridcolor="#f1f5f9", linecolor="#e2e8f0", tickformat=",.4f"),
-            height=450,
-            margin=dict(t=60, b=40, l=40, r=20),
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        mostrar_figura(vistas.costos(filtro, costo_sel, agrupar_por, tipo_grafico))
 
     # Todos los costos en una sola vista
     st.markdown('<p class="section-header">Todos los costos — vista general</p>', unsafe_allow_html=True)
-    costos_disponibles = [c for c in COLUMNAS_COSTOS if c in df_filtrado.columns]
-    grp_todos = df_filtrado.groupby("Año")[costos_disponibles].mean().reset_index()
-
-    fig_todos = go.Figure()
-    for i, costo in enumerate(costos_disponibles):
-        fig_todos.add_trace(go.Bar(
-            name=costo,
-            x=grp_todos["Año"].astype(str),
-            y=grp_todos[costo],
-            marker_color=COLORES[i % len(COLORES)],
-        ))
-    fig_todos.update_layout(
-        barmode="group",
-        title=dict(text="<b>Todos los costos</b> agrupados por año", font=dict(size=15, color="#1e293b")),
-        plot_bgcolor="white", paper_bgcolor="white",
-        font=dict(family="DM Sans", size=11, color="#374151"),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        xaxis=dict(showgrid=False), yaxis=dict(gridcolor="#f1f5f9", tickformat=",.4f"),
-        height=480, margin=dict(t=80, b=40, l=40, r=20),
-    )
-    st.plotly_chart(fig_todos, use_container_width=True)
+    mostrar_figura(vistas.todos(filtro))
 
 
 # ────────────────────────────────────────────────────────────────────────────
-# TAB 2 — Comparación directa entre dos años
+# Vista 2 — Comparación directa entre dos años
 # ────────────────────────────────────────────────────────────────────────────
-with tab2:
+@st.fragment
+def vista_años(filtro, comparar, año_a, año_b):
+    datos = filtro.datos
+    # Todos los pares de años a la vez; la comparación directa de abajo es
+    # una rebanada de la misma matriz
+    if len(filtro.matriz_años.años) >= 2:
+        st.markdown('<p class="section-header">Variación entre todos los pares de años</p>', unsafe_allow_html=True)
+        costo_matriz = recordar(st.selectbox, "Costo", datos.costos, key="costo_matriz")
+        mostrar_figura(vistas.matriz_años(filtro, costo_matriz))
+
     st.markdown('<p class="section-header">Comparación directa entre dos años</p>', unsafe_allow_html=True)
 
     if not comparar or año_a is None:
         st.info("Activa la comparación de dos años en el panel izquierdo.")
-    else:
-        df_a = df_filtrado[df_filtrado["Año"] == año_a]
-        df_b = df_filtrado[df_filtrado["Año"] == año_b]
-
-        costos_disp = [c for c in COLUMNAS_COSTOS if c in df_filtrado.columns]
+        return
+
+    costos_disp = datos.costos
+    comparacion = filtro.comparar_años(año_a, año_b, costos_disp)
+
+    # Tabla resumen
+    resumen = pd.DataFrame({
+        "Costo":           costos_disp,
+        f"Prom {año_a}":   comparacion["media_a"].values,
+        f"Prom {año_b}":   comparacion["media_b"].values,
+        "Δ %":             comparacion["delta"].values,
+    })
+
+    mostrar_tabla(
+        resumen.style
+            .format({f"Prom {año_a}": "{:,.4f}", f"Prom {año_b}": "{:,.4f}", "Δ %": "{:+.2f}%"})
+            .applymap(lambda v: "color: #ef4444" if isinstance(v, float) and v > 0
+                      else ("color: #10b981" if isinstance(v, float) and v < 0 else ""), subset=["Δ %"]),
+        use_container_width=True, hide_index=True,
+    )
 
-        media_a = df_a[costos_disp].mean()
-        media_b = df_b[costos_disp].mean()
-        delta   = ((media_b - media_a) / media_a * 100).round(2)
+    st.markdown('<p class="section-header">Gráfico comparativo por costo</p>', unsafe_allow_html=True)
+    mostrar_figura(vistas.comparacion(filtro, año_a, año_b))
 
-        # Tabla resumen
-        resumen = pd.DataFrame({
-            "Costo":           costos_disp,
-            f"Prom {año_a}":   media_a.values,
-            f"Prom {año_b}":   media_b.values,
-            "Δ %":             delta.values,
-        })
+    # Por producto
+    st.markdown('<p class="section-header">Variación por producto</p>', unsafe_allow_html=True)
+    costo_prod = recordar(st.selectbox, "Costo a comparar por producto", costos_disp, key="costo_prod")
 
-        st.dataframe(
-            resumen.style
-                .format({f"Prom {año_a}": "{:,.4f}", f"Prom {año_b}": "{:,.4f}", "Δ %": "{:+.2f}%"})
-                .applymap(lambda v: "color: #ef4444" if isinstance(v, float) and v > 0
-                          else ("color: #10b981" if isinstance(v, float) and v < 0 else ""), subset=["Δ %"]),
-            use_container_width=True, hide_index=True,
-        )
+    fig_prod = vistas.productos(filtro, año_a, año_b, costo_prod)
+    if fig_prod is not None:
+        mostrar_figura(fig_prod)
+    else:
+        st.info("No hay productos comunes entre los dos años seleccionados.")
 
-        st.markdown('<p class="section-header">Gráfico comparativo por costo</p>', unsafe_allow_html=True)
-
-        fig_comp = make_subplots(rows=1, cols=2, subplot_titles=(
-            f"Valores promedio ({año_a} vs {año_b})",
-            f"Variación porcentual ({año_a} → {año_b})"
-        ))
-
-        fig_comp.add_trace(go.Bar(name=str(año_a), x=costos_disp, y=media_a.values,
-                                  marker_color=COLORES[0], text=media_a.round(4), textposition="outside"), row=1, col=1)
-        fig_comp.add_trace(go.Bar(name=str(año_b), x=costos_disp, y=media_b.values,
-                                  marker_color=COLORES[1], text=media_b.round(4), textposition="outside"), row=1, col=1)
-
-        colores_delta = ["#ef4444" if v > 0 else "#10b981" for v in delta.values]
-        fig_comp.add_trace(go.Bar(
-            name="Δ %", x=costos_disp, y=delta.values,
-            marker_color=colores_delta,
-            text=[f"{v:+.2f}%" for v in delta.values],
-            textposition="outside",
-        ), row=1, col=2)
-
-        fig_comp.update_layout(
-            barmode="group", height=500,
-            plot_bgcolor="white", paper_bgcolor="white",
-            font=dict(family="DM Sans", size=11, color="#374151"),
-            showlegend=True,
-            margin=dict(t=60, b=100, l=40, r=20),
-        )
-        fig_comp.update_xaxes(tickangle=-35)
-        fig_comp.update_yaxes(gridcolor="#f1f5f9")
-        st.plotly_chart(fig_comp, use_container_width=True)
-
-        # Por producto
-        st.markdown('<p class="section-header">Variación por producto</p>', unsafe_allow_html=True)
-        costo_prod = st.selectbox("Costo a comparar por producto", costos_disp, key="costo_prod")
-
-        grp_prod_a = df_a.groupby("Producto/Presentación")[costo_prod].mean()
-        grp_prod_b = df_b.groupby("Producto/Presentación")[costo_prod].mean()
-        productos_comunes = grp_prod_a.index.intersection(grp_prod_b.index)
-
-        if len(productos_comunes) > 0:
-            fig_prod = go.Figure()
-            fig_prod.add_trace(go.Bar(name=str(año_a), x=list(productos_comunes),
-                                      y=grp_prod_a[productos_comunes].values, marker_color=COLORES[0]))
-            fig_prod.add_trace(go.Bar(name=str(año_b), x=list(productos_comunes),
-                                      y=grp_prod_b[productos_comunes].values, marker_color=COLORES[1]))
-            fig_prod.update_layout(
-                barmode="group", height=400,
-                plot_bgcolor="white", paper_bgcolor="white",
-                font=dict(family="DM Sans", size=12, color="#374151"),
-                yaxis=dict(gridcolor="#f1f5f9", tickformat=",.4f"),
-                xaxis=dict(showgrid=False),
-                margin=dict(t=40, b=40, l=40, r=20),
-            )
-            st.plotly_chart(fig_prod, use_container_width=True)
-        else:
-            st.info("No hay productos comunes entre los dos años seleccionados.")
+    st.markdown('<p class="section-header">Productos × años</p>', unsafe_allow_html=True)
+    mostrar_figura(vistas.matriz_productos(filtro, costo_prod))
 
 
 # ────────────────────────────────────────────────────────────────────────────
-# TAB 3 — Tipo de Cambio
+# Vista 3 — Tipo de Cambio
 # ────────────────────────────────────────────────────────────────────────────
-with tab3:
+@st.fragment
+def vista_tipo_cambio(filtro):
+    datos = filtro.datos
     st.markdown('<p class="section-header">Evolución del tipo de cambio</p>', unsafe_allow_html=True)
 
-    tc_disponibles = [c for c in COLUMNAS_TIPO_CAMBIO if c in df_filtrado.columns]
-    tc_sel = st.multiselect("Variables a graficar", tc_disponibles, default=tc_disponibles)
+    tc_disponibles = datos.tipos_cambio
+    tc_sel = recordar(st.multiselect, "Variables a graficar", tc_disponibles, default=tc_disponibles, key="tc_sel")
 
     if tc_sel:
         col_a, col_b = st.columns([3, 1])
         with col_b:
-            agrupar_tc = st.radio("Agrupar por", ["Mes", "Año"], key="tc_agrup")
-            tipo_tc    = st.radio("Tipo", ["Línea", "Barras"], key="tc_tipo")
+            agrupar_tc = recordar(st.radio, "Agrupar por", ["Mes", "Año", "Día"], key="tc_agrup")
+            tipo_tc    = recordar(st.radio, "Tipo", ["Línea", "Barras"], key="tc_tipo")
+            if agrupar_tc == "Día":
+                ancho_px = recordar(
+                    st.select_slider, "Resolución (px)", [600, 900, 1200, 1800, 2400], value=1200, key="tc_ancho",
+                    help="Puntos por serie tras el muestreo LTTB (≈ ancho de la gráfica).",
+                )
 
         with col_a:
-            grp_col = "Mes" if agrupar_tc == "Mes" else "Año"
-            grp_tc  = df_filtrado.groupby([grp_col, "Año"])[tc_sel].mean().reset_index().sort_values(grp_col)
-
-            fig_tc = make_subplots(
-                rows=len(tc_sel), cols=1,
-                shared_xaxes=True,
-                subplot_titles=tc_sel,
-                vertical_spacing=0.08,
-            )
-
-            for idx, variable in enumerate(tc_sel, start=1):
-                for i, año in enumerate(sorted(grp_tc["Año"].unique())):
-                    datos = grp_tc[grp_tc["Año"] == año]
-                    color = COLORES[i % len(COLORES)]
-                    if tipo_tc == "Línea":
-                        fig_tc.add_trace(go.Scatter(
-                            name=f"{variable} {año}",
-                            x=datos[grp_col].astype(str),
-                            y=datos[variable],
-                            mode="lines+markers",
-                            line=dict(color=color, width=2.5),
-                            marker=dict(size=6),
-                            showlegend=(idx == 1),
-                        ), row=idx, col=1)
-                    else:
-                        fig_tc.add_trace(go.Bar(
-                            name=f"{variable} {año}",
-                            x=datos[grp_col].astype(str),
-                            y=datos[variable],
-                            marker_color=color,
-                            showlegend=(idx == 1),
-                        ), row=idx, col=1)
-
-            fig_tc.update_layout(
-                height=300 * len(tc_sel),
-                plot_bgcolor="white", paper_bgcolor="white",
-                font=dict(family="DM Sans", size=11, color="#374151"),
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                margin=dict(t=60, b=40, l=40, r=20),
-            )
-            fig_tc.update_yaxes(gridcolor="#f1f5f9", tickformat=",.4f")
-            fig_tc.update_xaxes(showgrid=False, tickangle=-30)
-            st.plotly_chart(fig_tc, use_container_width=True)
+            if agrupar_tc == "Día":
+                # Al acotar el rango, el mismo presupuesto de puntos cubre menos
+                # días: con rangos cortos la serie se ve a resolución completa.
+                desde, hasta = filtro.rango_fechas()
+                rango = (desde.date(), hasta.date()) if desde is not None else (None, None)
+                if rango[0] is not None and rango[0] < rango[1]:
+                    rango = recordar(st.slider, "Rango de fechas", min_value=rango[0], max_value=rango[1],
+                                     value=rango, key="tc_rango")
+                fig_tc = vistas.tipo_cambio_dia(filtro, tc_sel, tipo_tc, rango, ancho_px)
+            else:
+                grp_col = "Mes" if agrupar_tc == "Mes" else "Año"
+                fig_tc  = vistas.tipo_cambio(filtro, tc_sel, grp_col, tipo_tc)
+            mostrar_figura(fig_tc)
 
         # Tabla resumen tipo de cambio por año
         st.markdown('<p class="section-header">Estadísticas por año</p>', unsafe_allow_html=True)
-        stats_tc = df_filtrado.groupby("Año")[tc_sel].agg(["mean", "min", "max"]).round(4)
+        stats_tc = filtro.estadisticas(tc_sel).round(4)
         stats_tc.columns = [f"{col[0]} ({col[1]})" for col in stats_tc.columns]
-        st.dataframe(stats_tc, use_container_width=True)
+        mostrar_tabla(stats_tc, use_container_width=True)
+
+        # Ventanas móviles: el estado de cada ventana se conserva y, al
+        # agregar meses, sólo se calculan las fechas nuevas
+        st.markdown('<p class="section-header">Promedios móviles, volatilidad y diferenciales</p>',
+                    unsafe_allow_html=True)
+        ventana = recordar(st.select_slider, "Ventana (fechas con registro)", VENTANAS, value=20, key="tc_ventana")
+        rodante = filtro.ventanas(ventana)
+        if rodante.empty:
+            st.info("No hay fechas con tipo de cambio en la selección.")
+        else:
+            mostrar_figura(vistas.ventanas(filtro, tc_sel, ventana))
+            ultimos = rodante.ffill().iloc[-1].unstack("métrica")[METRICAS]
+            mostrar_tabla(
+                ultimos.style.format("{:,.4f}", na_rep="—"),
+                use_container_width=True,
+            )
+
+    # Escenarios: la rejilla completa se calcula una vez por filtro y el
+    # slider sólo elige un punto de ella
+    if datos.escenarios.columnas:
+        st.markdown('<p class="section-header">Escenarios de tipo de cambio</p>', unsafe_allow_html=True)
+        col_esc_a, col_esc_b = st.columns([3, 1])
+        with col_esc_b:
+            variable_esc = recordar(st.radio, "Variable", [v for v in VARIABLES if v in tc_disponibles] or VARIABLES,
+                                    key="esc_variable")
+            cambio_sel = recordar(st.slider, "Cambio %", min_value=int(CAMBIOS_PCT[0]), max_value=int(CAMBIOS_PCT[-1]),
+                                  value=0, step=1, key="esc_cambio")
+        with col_esc_a:
+            mostrar_figura(vistas.escenarios(filtro, cambio_sel, variable_esc))
+
+        rejilla = filtro.escenarios()
+        base, movido = rejilla.loc[0.0], rejilla.loc[float(cambio_sel)]
+        mostrar_tabla(
+            pd.DataFrame({
+                "Costo":                base.index,
+                "Actual":               base.values,
+                f"{cambio_sel:+d}%":    movido.values,
+                "Δ %":                  ((movido / base - 1) * 100).values,
+            }).style.format({"Actual": "{:,.4f}", f"{cambio_sel:+d}%": "{:,.4f}", "Δ %": "{:+.2f}%"}),
+            use_container_width=True, hide_index=True,
+        )
+
+        if variable_esc in tc_disponibles:
+            with st.expander("Simulación Monte Carlo con la historia del archivo"):
+                col_mc1, col_mc2, col_mc3 = st.columns(3)
+                with col_mc1:
+                    horizonte = recordar(st.number_input, "Horizonte (fechas con registro)", min_value=1, value=20,
+                                         step=1, key="mc_horizonte")
+                with col_mc2:
+                    n_sim = recordar(st.select_slider, "Simulaciones", [1_000, 10_000, 100_000], value=10_000,
+                                     key="mc_n")
+                with col_mc3:
+                    columna_mc = recordar(st.selectbox, "Costo", datos.escenarios.columnas, key="mc_columna",
+                                          index=datos.escenarios.columnas.index(IMPORTACION)
+                                          if IMPORTACION in datos.escenarios.columnas else 0)
+                try:
+                    fig_mc = vistas.monte_carlo(filtro, variable_esc, int(horizonte), n_sim, columna_mc)
+                except ValueError as error:
+                    st.info(str(error))
+                else:
+                    mostrar_figura(fig_mc)
 
 
 # ────────────────────────────────────────────────────────────────────────────
-# TAB 4 — Datos detallados
+# Vista 4 — Datos detallados
 # ────────────────────────────────────────────────────────────────────────────
-with tab4:
+@st.fragment
+def vista_datos(filtro):
+    datos = filtro.datos
     st.markdown('<p class="section-header">Tabla de datos completa</p>', unsafe_allow_html=True)
 
-    buscar = st.text_input("🔍 Buscar en tabla", placeholder="Producto, exportador, factura...")
-    df_tabla = df_filtrado.copy()
-    if buscar:
-        mask = df_tabla.apply(lambda col: col.astype(str).str.contains(buscar, case=False, na=False)).any(axis=1)
-        df_tabla = df_tabla[mask]
+    buscar = recordar(st.text_input, "🔍 Buscar en tabla", placeholder="Producto, exportador, factura...", key="buscar")
+    filas_tabla = filtro.buscar(buscar)
+
+    # Sólo se ordena, recorta y formatea la página visible
+    tabla = datos.tabla
+    columnas_tabla = [c for c in datos.df.columns if c not in ("Año", "Mes")]
+    total = len(filas_tabla)
+
+    col_orden, col_sentido, col_tamaño, col_pagina = st.columns([3, 1, 1, 1])
+    with col_orden:
+        orden_col = recordar(st.selectbox, "Ordenar por", ["(orden original)"] + columnas_tabla, key="tabla_orden")
+    with col_sentido:
+        sentido = recordar(st.radio, "Sentido", ["↑ Asc", "↓ Desc"], key="tabla_sentido", horizontal=True)
+    with col_tamaño:
+        tamaño = recordar(st.selectbox, "Filas por página", TAMAÑOS_PAGINA, index=1, key="tabla_tamaño")
+    n_paginas = TablaPaginada.n_paginas(total, tamaño)
+    with col_pagina:
+        pagina = recordar(st.number_input, "Página", min_value=1, max_value=n_paginas, value=1, step=1, key="tabla_pagina")
+    pagina = min(int(pagina), n_paginas)
+
+    filas_ordenadas = tabla.ordenar(
+        filas_tabla,
+        None if orden_col == "(orden original)" else orden_col,
+        ascendente=(sentido == "↑ Asc"),
+    )
+    df_pagina = tabla.pagina(filas_ordenadas, pagina, tamaño)[columnas_tabla]
 
-    st.dataframe(
-        df_tabla.drop(columns=["Año", "Mes"], errors="ignore").style.format(
-            {c: "{:,.4f}" for c in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO if c in df_tabla.columns}
+    mostrar_tabla(
+        df_pagina.style.format(
+            {c: "{:,.4f}" for c in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO if c in df_pagina.columns}
         ),
         use_container_width=True, height=500,
     )
-    st.caption(f"{len(df_tabla):,} registros mostrados")
+    inicio = (pagina - 1) * tamaño
+    st.caption(
+        f"{total:,} registros · mostrando {min(inicio + 1, total):,}–{inicio + len(df_pagina):,}"
+        f" · página {pagina} de {n_paginas}"
+    )
 
-    col_dl1, col_dl2 = st.columns([1, 5])
+    # La exportación se genera sólo al pedirla, por bloques, a un archivo
+    # temporal; las filas salen en el orden de la tabla
+    col_dl1, col_dl2, col_dl3 = st.columns([1, 1, 4])
     with col_dl1:
-        csv = df_tabla.drop(columns=["Año", "Mes"], errors="ignore").to_csv(index=False).encode("utf-8")
-        st.download_button("⬇️ Exportar CSV", csv, "exportacion_filtrada.csv", "text/csv")
+        formato_exp = recordar(st.selectbox, "Formato", list(FORMATOS), key="exp_formato")
+    with col_dl2:
+        formato_tabla = recordar(st.checkbox, "4 decimales", value=True, key="exp_decimales",
+                                 help="Costos y tipos de cambio como en la tabla; fecha sin hora")
+        completo = recordar(st.checkbox, "Sin filtros", value=False, key="exp_completo",
+                            help="Exporta todo el dataset cargado, sin filtros ni búsqueda")
+    clave_exp = (datos.clave if completo else (filtro.clave, buscar, orden_col, sentido),
+                 formato_exp, formato_tabla)
+    filas_exp, total_exp = (None, len(datos.df)) if completo else (filas_ordenadas, total)
+    exportacion = st.session_state.get("exportacion")
+    if exportacion is not None and exportacion[0] != clave_exp:
+        Path(exportacion[1]).unlink(missing_ok=True)
+        exportacion = st.session_state["exportacion"] = None
+
+    with col_dl3:
+        extension, mime = FORMATOS[formato_exp]
+        if exportacion is None:
+            if st.button(f"⬇️ Preparar {formato_exp} ({total_exp:,} registros)", key="exp_preparar"):
+                with crono.etapa("exportar"), st.spinner("Generando exportación..."):
+                    ruta = carpeta_exportacion() / f"exportacion{extension}"
+                    with open(ruta, "wb") as tmp:
+                        exportar(datos.df, tmp, formato_exp, filas_exp, columnas_tabla, formato_tabla)
+                exportacion = st.session_state["exportacion"] = (clave_exp, str(ruta))
+        if exportacion is not None:
+            # download_button lee el archivo completo a memoria: el límite lo
+            # pone Streamlit, no la exportación por bloques
+            with open(exportacion[1], "rb") as archivo:
+                st.download_button(f"⬇️ Descargar {formato_exp}", archivo,
+                                   f"exportacion_filtrada{extension}", mime, key="exp_descargar")
+
+
+def carpeta_exportacion():
+    # Temporal por sesión: TemporaryDirectory se borra, con lo exportado, cuando
+    # la sesión se recolecta o cuando termina el proceso
+    if "exportacion_dir" not in st.session_state:
+        st.session_state["exportacion_dir"] = tempfile.TemporaryDirectory(prefix="condensado_exportacion_")
+    return Path(st.session_state["exportacion_dir"].name)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Precálculo de las vistas no mostradas
+# ────────────────────────────────────────────────────────────────────────────
+def tareas_precalculo(filtro, tipo_grafico, comparar, año_a, año_b):
+    """Tareas que llenan los cachés de cada vista con los valores actuales de sus widgets.
+
+    Los valores salen de las selecciones guardadas por `recordar` (también
+    las de vistas que no se dibujaron) y se leen aquí, en el hilo del
+    script: las tareas no tocan `st.session_state`. Con un motor externo se
+    omite lo que exige cargar todas las filas en memoria (escenarios,
+    búsqueda y tabla).
+    """
+    datos  = filtro.datos
+    estado = st.session_state.get("selecciones", {})
+    costos_disp = datos.costos
+    en_memoria  = datos.motor is None
+
+    costo_sel   = estado.get("costo_sel", costos_disp[0])
+    agrupar_por = estado.get("agrupar_por", "Producto")
+    costos = [
+        lambda: vistas.costos(filtro, costo_sel, agrupar_por, tipo_grafico),
+        lambda: vistas.todos(filtro),
+    ]
+
+    costo_matriz = estado.get("costo_matriz", costos_disp[0])
+    costo_prod   = estado.get("costo_prod", costos_disp[0])
+    años = [lambda: len(filtro.matriz_años.años) >= 2 and vistas.matriz_años(filtro, costo_matriz)]
+    if comparar and año_a is not None:
+        años += [
+            lambda: vistas.comparacion(filtro, año_a, año_b),
+            lambda: vistas.productos(filtro, año_a, año_b, costo_prod),
+            lambda: vistas.matriz_productos(filtro, costo_prod),
+        ]
+
+    tc_sel  = [c for c in estado.get("tc_sel", datos.tipos_cambio) if c in datos.tipos_cambio]
+    tc_agrup = estado.get("tc_agrup", "Mes")
+    tipo_tc  = estado.get("tc_tipo", "Línea")
+    tipo_cambio = []
+    if tc_sel and tc_agrup != "Día":
+        tipo_cambio += [
+            lambda: vistas.tipo_cambio(filtro, tc_sel, tc_agrup, tipo_tc),
+            lambda: filtro.estadisticas(tc_sel),
+        ]
+    if tc_sel:
+        ventana = estado.get("tc_ventana", 20)
+        tipo_cambio.append(lambda: vistas.ventanas(filtro, tc_sel, ventana))
+    if en_memoria:
+        cambio_sel   = estado.get("esc_cambio", 0)
+        variable_esc = estado.get("esc_variable", VARIABLES[0])
+        tipo_cambio.append(lambda: datos.escenarios.columnas and vistas.escenarios(filtro, cambio_sel, variable_esc))
+
+    buscar = estado.get("buscar", "")
+    datos_tabla = [lambda: datos.tabla, lambda: filtro.buscar(buscar)] if en_memoria else []
+
+    return {"costos": costos, "años": años, "tipo_cambio": tipo_cambio, "datos": datos_tabla}
+
+
+VISTAS = {
+    "📊 Comparativa de Costos": ("costos",      lambda: vista_costos(filtro, tipo_grafico)),
+    "🔁 Comparación entre Años": ("años",        lambda: vista_años(filtro, comparar, año_a, año_b)),
+    "💱 Tipo de Cambio":         ("tipo_cambio", lambda: vista_tipo_cambio(filtro)),
+    "📋 Datos Detallados":       ("datos",       lambda: vista_datos(filtro)),
+}
+
+vista = st.radio("Vista", list(VISTAS), horizontal=True, key="vista", label_visibility="collapsed")
+nombre_vista, mostrar_vista = VISTAS[vista]
+with crono.etapa(f"vista_{nombre_vista}"), st.spinner("Calculando..."):
+    mostrar_vista()
+
+# Mientras el usuario mira esta vista, las demás se calculan en un hilo aparte
+tareas = tareas_precalculo(filtro, tipo_grafico, comparar, año_a, año_b)
+PRECALCULO.programar(
+    st.session_state.setdefault("sesion", uuid.uuid4().hex),
+    [tarea for nombre, lista in tareas.items() if nombre != nombre_vista for tarea in lista],
+)
+
+
+# ════════════════════════════════════════════════════════════════════════════
+#  RENDIMIENTO DEL RERUN
+# ════════════════════════════════════════════════════════════════════════════
+historial = cerrar_rerun(resumen_filtro["registros"])
+
+if mostrar_rendimiento:
+    with panel_rendimiento:
+        st.caption("La vista incluye sus gráficas y tablas; plotly_chart y st.dataframe se acumulan por rerun. "
+                   "Los reruns de una sola vista (sus propios widgets) no se registran aquí.")
+        st.markdown("**Este rerun (s)**")
+        st.dataframe(crono.tabla().style.format("{:.3f}"), use_container_width=True)
+        st.markdown(f"**Últimos {len(historial)} reruns (s)**")
+        st.dataframe(
+            historial.percentiles().style.format("{:.3f}", subset=["p50", "p90", "p99"]),
+            use_container_width=True,
+        )
+        if st.button("Perfilar el siguiente rerun", help="Corre el siguiente rerun completo bajo cProfile"):
+            st.session_state["perfilar_rerun"] = True
+            st.rerun()
+        if "perfil_rerun" in st.session_state:
+            texto, perfil_prof = st.session_state["perfil_rerun"]
+            with st.expander("cProfile del último rerun perfilado"):
+                st.code(texto)
+            st.download_button("⬇️ rerun.prof", perfil_prof, "rerun.prof", "application/octet-stream")
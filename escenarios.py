@@ -0,0 +1,141 @@
+"""
+escenarios.py
+-------------
+Escenarios de tipo de cambio ("what-if") sobre los costos ligados al euro.
+
+En el Condensado el costo en pesos es `Precio compra EUROS × TIPO DE CAMBIO`
+y `TIPO DE CAMBIO = FACTORAJE (DOF) × DÓLAR (DOF)`: mover el tipo de cambio
+un p % (o el dólar DOF un p % con el factoraje EUR/USD fijo) multiplica el
+costo en pesos por f = 1 + p / 100. El cambio se propaga así:
+
+    Costo pieza mxn                          × f
+    IGI ($/pieza)                            + tasa × Δcosto pieza
+    COSTO DE IMPORTACION X PIEZA ($/pieza)   + ΔIGI  (= DTA + IGI + aduana)
+    Costo Compra Ana Dis ($/pieza)           + Δcosto pieza + ΔIGI
+    Precio Unitario Compra Pasta Mia         mismo margen sobre Costo Compra Ana Dis
+
+El IGI es ad valorem sobre el valor en aduana, IGI ≈ tasa × (costo pieza +
+flete marítimo), con tasa = IGI / (costo pieza + flete) de cada fila; de esa
+base sólo la parte del costo pieza se mueve con el tipo de cambio. Flete,
+DTA, aduana y gastos locales están en pesos y no cambian.
+
+Así cada columna es afín en f fila por fila: valor(f) = valor + pendiente·(f − 1).
+Las pendientes se calculan una vez por dataset; los valores por fila de k
+escenarios son un broadcast (k × filas) y el promedio de un grupo en k
+escenarios sólo necesita las sumas de valor y pendiente del grupo, así que
+una rejilla o miles de simulaciones Monte Carlo cuestan O(filas) una vez
+más O(k × grupos).
+"""
+
+import numpy as np
+import pandas as pd
+
+VARIABLES = ["TIPO DE CAMBIO", "DÓLAR (DOF)"]
+
+PIEZA       = "Costo pieza mxn"
+IGI         = "IGI ($/pieza)"
+FLETE       = "Flete Maritimo ($/pieza)"
+IMPORTACION = "COSTO DE IMPORTACION X PIEZA ($/pieza)"
+ANA_DIS     = "Costo Compra Ana Dis ($/pieza)"
+PASTA_MIA   = "Precio Unitario Compra Pasta Mia"
+COLUMNAS_AFECTADAS = [PIEZA, IGI, IMPORTACION, ANA_DIS, PASTA_MIA]
+
+# Rejilla por defecto: de −20 % a +20 % en pasos de 1 %
+CAMBIOS_PCT = tuple(float(c) for c in range(-20, 21))
+
+
+class Escenarios:
+    """Valor y pendiente por fila de cada columna afectada por el tipo de cambio."""
+
+    def __init__(self, df):
+        self.df       = df
+        self.columnas = [c for c in COLUMNAS_AFECTADAS if c in df.columns]
+        valor = {c: df[c].to_numpy(dtype="float64", na_value=np.nan) for c in self.columnas}
+
+        cero  = np.zeros(len(df))
+        pieza = np.nan_to_num(valor.get(PIEZA, cero))
+        igi   = np.nan_to_num(valor.get(IGI, cero))
+        flete = np.nan_to_num(df[FLETE].to_numpy(dtype="float64", na_value=np.nan)) if FLETE in df.columns else cero
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # tasa × costo pieza, con tasa = IGI / (costo pieza + flete)
+            base = pieza + flete
+            d_igi = np.where(base > 0, igi * pieza / base, 0.0)
+        pendiente = {PIEZA: pieza, IGI: d_igi, IMPORTACION: d_igi, ANA_DIS: pieza + d_igi}
+        if PASTA_MIA in valor:
+            ana = valor.get(ANA_DIS, np.full(len(df), np.nan))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                margen = np.where(ana > 0, valor[PASTA_MIA] / ana, 0.0)
+            pendiente[PASTA_MIA] = np.nan_to_num(margen) * (pieza + d_igi)
+
+        self.valor     = valor
+        # Las filas sin valor no cuentan en el promedio, igual que DataFrame.mean()
+        self.pendiente = {c: np.where(np.isnan(valor[c]), 0.0, pendiente[c]) for c in self.columnas}
+
+    def por_fila(self, columna, factores, filas=None):
+        """Valores de `columna` para cada factor f: arreglo (escenarios × filas)."""
+        valor, pendiente = self.valor[columna], self.pendiente[columna]
+        if filas is not None:
+            valor, pendiente = valor[filas], pendiente[filas]
+        f = np.asarray(factores, dtype="float64")
+        return valor[None, :] + pendiente[None, :] * (f[:, None] - 1)
+
+    def rejilla(self, cambios_pct=CAMBIOS_PCT, filas=None, por=None):
+        """Promedio de cada columna afectada con el tipo de cambio movido cada % de `cambios_pct`.
+
+        Índice "Cambio %" (y `por`, si se da); una columna por costo afectado.
+        """
+        cambios = np.asarray(cambios_pct, dtype="float64")
+        medias, grupos = self._medias(1 + cambios / 100, filas, por)
+        if por is None:
+            indice = pd.Index(cambios, name="Cambio %")
+        else:
+            indice = pd.MultiIndex.from_product([cambios, grupos], names=["Cambio %", por])
+        return pd.DataFrame({c: m.ravel() for c, m in medias.items()}, index=indice)
+
+    def monte_carlo(self, factores, filas=None):
+        """Promedio de cada columna afectada para cada factor simulado (una fila por simulación)."""
+        factores = np.asarray(factores, dtype="float64")
+        medias, _ = self._medias(factores, filas)
+        resultado = pd.DataFrame({c: m.ravel() for c, m in medias.items()})
+        resultado.insert(0, "Cambio %", (factores - 1) * 100)
+        return resultado
+
+    def _medias(self, factores, filas=None, por=None):
+        """{columna: promedios (escenarios × grupos)} a partir de las sumas por grupo."""
+        partes = {}
+        for c in self.columnas:
+            valor = self.valor[c] if filas is None else self.valor[c][filas]
+            partes[(c, "valor")]     = np.nan_to_num(valor)
+            partes[(c, "pendiente")] = self.pendiente[c] if filas is None else self.pendiente[c][filas]
+            partes[(c, "n")]         = ~np.isnan(valor)
+        frame = pd.DataFrame(partes)
+        if por is None:
+            sumas = frame.sum().to_frame().T
+        else:
+            claves = self.df[por] if filas is None else self.df[por].take(filas)
+            sumas  = frame.groupby(claves.to_numpy(), sort=True).sum()
+
+        f = factores[:, None] - 1
+        medias = {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for c in self.columnas:
+                n = sumas[(c, "n")].to_numpy(dtype="float64")
+                total = sumas[(c, "valor")].to_numpy()[None, :] + sumas[(c, "pendiente")].to_numpy()[None, :] * f
+                medias[c] = np.where(n > 0, total / n, np.nan)
+        return medias, sumas.index
+
+
+def factores_historicos(serie, horizonte=20, n=10_000, semilla=0):
+    """Factores f simulados a partir de la historia de `serie` (tipo de cambio por fecha).
+
+    Cada simulación toma al azar una fecha t del archivo y usa el cambio
+    observado a `horizonte` fechas con registro: serie[t + horizonte] / serie[t].
+    """
+    valores = serie.dropna().sort_index().to_numpy(dtype="float64")
+    if len(valores) <= horizonte:
+        raise ValueError(
+            f"Se necesitan más de {horizonte} fechas con tipo de cambio para simular "
+            f"(hay {len(valores)})."
+        )
+    cambios = valores[horizonte:] / valores[:-horizonte]
+    return np.random.default_rng(semilla).choice(cambios, size=n)
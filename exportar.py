@@ -0,0 +1,162 @@
+"""
+exportar.py
+-----------
+Exportación por bloques de las filas de la tabla detallada.
+
+Las filas se escriben en bloques de `FILAS_POR_BLOQUE` (`df.take` de un
+tramo de posiciones), así que la memoria no depende del total de filas
+exportadas: a lo más un bloque en pandas más el búfer del escritor. Aplica
+también al exportar el dataset completo sin filtrar.
+
+Formatos: CSV, CSV comprimido con gzip, Parquet (un row group por bloque) y
+XLSX (openpyxl en modo write-only; una hoja nueva cada MAX_FILAS_HOJA).
+
+Con `formato_tabla=True` los costos y tipos de cambio salen como en la tabla
+del dashboard (4 decimales; en XLSX, formato de celda `#,##0.0000`) y la
+fecha sin hora.
+"""
+
+import csv
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+
+from ingesta import COLUMNAS_COSTOS, COLUMNAS_TIPO_CAMBIO
+
+FILAS_POR_BLOQUE = 50_000
+MAX_FILAS_HOJA   = 1_048_575
+DECIMALES        = 4
+
+# nombre → (extensión, tipo MIME)
+FORMATOS = {
+    "CSV":        (".csv",     "text/csv"),
+    "CSV (gzip)": (".csv.gz",  "application/gzip"),
+    "Parquet":    (".parquet", "application/vnd.apache.parquet"),
+    "Excel":      (".xlsx",    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+FORMATO_NUMERO_XLSX = "#,##0.0000"
+FORMATO_FECHA_XLSX  = "yyyy-mm-dd"
+
+
+def bloques(df, filas=None, columnas=None, formato_tabla=True, filas_por_bloque=FILAS_POR_BLOQUE):
+    """DataFrames consecutivos con las filas `filas` (posiciones) de `df`."""
+    if filas is None:
+        filas = np.arange(len(df))
+    columnas = list(df.columns) if columnas is None else list(columnas)
+    numericas = [c for c in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO if c in columnas]
+    for inicio in range(0, len(filas), filas_por_bloque):
+        bloque = df[columnas].take(filas[inicio:inicio + filas_por_bloque])
+        if formato_tabla:
+            bloque[numericas] = bloque[numericas].astype("float64").round(DECIMALES)
+            if "Fecha" in columnas:
+                bloque["Fecha"] = bloque["Fecha"].dt.normalize()
+        yield bloque
+
+
+def exportar(df, destino, formato="CSV", filas=None, columnas=None, formato_tabla=True,
+             filas_por_bloque=FILAS_POR_BLOQUE):
+    """Escribe las filas `filas` de `df` en `destino` (ruta o archivo binario abierto)."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato} (usa {', '.join(FORMATOS)})")
+    partes = bloques(df, filas, columnas, formato_tabla, filas_por_bloque)
+    columnas = list(df.columns) if columnas is None else list(columnas)
+    if formato == "CSV":
+        _csv(partes, columnas, destino, comprimir=False)
+    elif formato == "CSV (gzip)":
+        _csv(partes, columnas, destino, comprimir=True)
+    elif formato == "Parquet":
+        _parquet(partes, df[columnas].iloc[:0], destino)
+    else:
+        _xlsx(partes, columnas, destino, formato_tabla)
+
+
+def _abrir(destino, modo="wb"):
+    # Los archivos ya abiertos no se cierran al terminar: son del que llama
+    if hasattr(destino, "write"):
+        return destino, False
+    return open(destino, modo), True
+
+
+def _csv(partes, columnas, destino, comprimir):
+    binario, propio = _abrir(destino)
+    try:
+        salida = gzip.GzipFile(fileobj=binario, mode="wb") if comprimir else binario
+        texto  = io.TextIOWrapper(salida, encoding="utf-8", newline="")
+        csv.writer(texto).writerow(columnas)
+        for bloque in partes:
+            bloque.to_csv(texto, header=False, index=False, date_format="%Y-%m-%d")
+        texto.flush()
+        texto.detach()
+        if comprimir:
+            salida.close()
+    finally:
+        if propio:
+            binario.close()
+
+
+def _parquet(partes, vacio, destino):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    binario, propio = _abrir(destino)
+    writer = None
+    try:
+        # El esquema sale del primer bloque (ya con los tipos de formato_tabla)
+        for bloque in partes:
+            if writer is None:
+                esquema = pa.Schema.from_pandas(bloque, preserve_index=False)
+                writer  = pq.ParquetWriter(binario, esquema)
+            writer.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+        if writer is None:
+            pq.write_table(pa.Table.from_pandas(vacio, preserve_index=False), binario)
+    finally:
+        if writer is not None:
+            writer.close()
+        if propio:
+            binario.close()
+
+
+def _xlsx(partes, columnas, destino, formato_tabla):
+    import openpyxl  # diferido: sólo se necesita al exportar a Excel
+    from openpyxl.cell import WriteOnlyCell
+
+    numericas = {c for c in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO if c in columnas}
+    wb = openpyxl.Workbook(write_only=True)
+    hoja, en_hoja = None, MAX_FILAS_HOJA
+
+    def celda(valor, columna):
+        if not formato_tabla or (columna not in numericas and columna != "Fecha"):
+            return valor
+        c = WriteOnlyCell(hoja, value=valor)
+        c.number_format = FORMATO_FECHA_XLSX if columna == "Fecha" else FORMATO_NUMERO_XLSX
+        return c
+
+    for bloque in partes:
+        valores = [_valores_xlsx(bloque[c]) for c in columnas]
+        for fila in zip(*valores):
+            if en_hoja >= MAX_FILAS_HOJA:
+                hoja = wb.create_sheet(f"Datos {len(wb.worksheets) + 1}" if wb.worksheets else "Datos")
+                hoja.append(columnas)
+                en_hoja = 0
+            hoja.append([celda(v, c) for v, c in zip(fila, columnas)])
+            en_hoja += 1
+    if hoja is None:
+        wb.create_sheet("Datos").append(columnas)
+
+    binario, propio = _abrir(destino)
+    try:
+        wb.save(binario)
+    finally:
+        if propio:
+            binario.close()
+
+
+def _valores_xlsx(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return [None if pd.isna(v) else v.to_pydatetime() for v in serie]
+    if pd.api.types.is_float_dtype(serie):
+        return [None if np.isnan(v) else float(v) for v in serie.to_numpy(dtype="float64")]
+    return serie.astype(object).where(serie.notna(), None).tolist()
@@ -0,0 +1,475 @@
+"""
+graficos.py
+-----------
+Construcción de las figuras Plotly del dashboard y caché LRU de figuras.
+
+Cada función recibe los datos ya agrupados (del cubo) y separa las series
+por año una sola vez con `groupby`, en lugar de refiltrar el DataFrame por
+cada año (y, en tipo de cambio, por cada año de cada variable).
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# ── Paleta de colores para gráficos ──────────────────────────────────────────
+COLORES = [
+    "#3b82f6", "#f59e0b", "#10b981", "#ef4444",
+    "#8b5cf6", "#06b6d4", "#f97316", "#ec4899",
+]
+
+
+# Con más puntos que esto en una figura de líneas se usa Scattergl (WebGL)
+UMBRAL_WEBGL = 1_000
+
+
+# ── Caché de figuras ─────────────────────────────────────────────────────────
+class CacheFiguras:
+    """LRU de figuras terminadas, compartido entre sesiones del mismo proceso.
+
+    La clave debe identificar los datos (p. ej. las claves de los archivos
+    cargados) y todos los parámetros de la vista; así volver a una vista ya
+    vista no reagrupa ni reconstruye trazas. Se guardan objetos `go.Figure`
+    porque `st.plotly_chart` los serializa directo, mientras que a un spec
+    JSON/dict lo vuelve a validar completo.
+    """
+
+    def __init__(self, max_figuras=64):
+        self.max_figuras = max_figuras
+        self._figuras = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def obtener(self, clave, construir):
+        with self._lock:
+            if clave in self._figuras:
+                self._figuras.move_to_end(clave)
+                return self._figuras[clave]
+        figura = construir()
+        with self._lock:
+            self._figuras[clave] = figura
+            while len(self._figuras) > self.max_figuras:
+                self._figuras.popitem(last=False)
+        return figura
+
+
+FIGURAS = CacheFiguras()
+
+
+# ── Tab 1 — Costos por producto / año / mes ──────────────────────────────────
+def figura_costos(grp, costo_sel, agrupar_por, tipo_grafico):
+    """`grp`: promedio de `costo_sel` por [x, Año] (x según `agrupar_por`), con índice plano."""
+    fig = go.Figure()
+    if agrupar_por == "Producto":
+        for i, (año, datos_año) in enumerate(grp.groupby("Año", sort=True)):
+            color = COLORES[i % len(COLORES)]
+            if tipo_grafico == "Barras":
+                fig.add_trace(go.Bar(
+                    name=str(año),
+                    x=datos_año["Producto/Presentación"],
+                    y=datos_año[costo_sel],
+                    marker_color=color,
+                    text=datos_año[costo_sel].round(4),
+                    textposition="outside",
+                ))
+            elif tipo_grafico == "Línea":
+                fig.add_trace(go.Scatter(
+                    name=str(año),
+                    x=datos_año["Producto/Presentación"],
+                    y=datos_año[costo_sel],
+                    mode="lines+markers",
+                    line=dict(color=color, width=2.5),
+                    marker=dict(size=8),
+                ))
+            else:  # Barras + Línea
+                fig.add_trace(go.Bar(
+                    name=f"{año} (barra)",
+                    x=datos_año["Producto/Presentación"],
+                    y=datos_año[costo_sel],
+                    marker_color=color,
+                    opacity=0.7,
+                ))
+                fig.add_trace(go.Scatter(
+                    name=f"{año} (línea)",
+                    x=datos_año["Producto/Presentación"],
+                    y=datos_año[costo_sel],
+                    mode="lines+markers",
+                    line=dict(color=color, width=2, dash="dot"),
+                ))
+
+    elif agrupar_por == "Año":
+        if tipo_grafico in ["Barras", "Barras + Línea"]:
+            fig.add_trace(go.Bar(
+                x=grp["Año"].astype(str),
+                y=grp[costo_sel],
+                marker_color=COLORES[:len(grp)],
+                text=grp[costo_sel].round(4),
+                textposition="outside",
+            ))
+        if tipo_grafico in ["Línea", "Barras + Línea"]:
+            fig.add_trace(go.Scatter(
+                x=grp["Año"].astype(str),
+                y=grp[costo_sel],
+                mode="lines+markers",
+                line=dict(color=COLORES[1], width=3),
+                marker=dict(size=10),
+            ))
+
+    else:  # Mes
+        for i, (año, datos_año) in enumerate(grp.groupby("Año", sort=True)):
+            color = COLORES[i % len(COLORES)]
+            if tipo_grafico == "Barras":
+                fig.add_trace(go.Bar(name=str(año), x=datos_año["Mes"], y=datos_año[costo_sel], marker_color=color))
+            else:
+                fig.add_trace(go.Scatter(
+                    name=str(año), x=datos_año["Mes"], y=datos_año[costo_sel],
+                    mode="lines+markers", line=dict(color=color, width=2.5), marker=dict(size=7),
+                ))
+
+    fig.update_layout(
+        title=dict(text=f"<b>{costo_sel}</b> — promedio por {agrupar_por.lower()}", font=dict(size=15, color="#1e293b")),
+        barmode="group",
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        font=dict(family="DM Sans", size=12, color="#374151"),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        xaxis=dict(showgrid=False, linecolor="#e2e8f0"),
+        yaxis=dict(gridcolor="#f1f5f9", linecolor="#e2e8f0", tickformat=",.4f"),
+        height=450,
+        margin=dict(t=60, b=40, l=40, r=20),
+    )
+    return fig
+
+
+def figura_todos(grp_todos, costos):
+    """`grp_todos`: promedio de cada costo por Año, con índice plano."""
+    fig = go.Figure()
+    for i, costo in enumerate(costos):
+        fig.add_trace(go.Bar(
+            name=costo,
+            x=grp_todos["Año"].astype(str),
+            y=grp_todos[costo],
+            marker_color=COLORES[i % len(COLORES)],
+        ))
+    fig.update_layout(
+        barmode="group",
+        title=dict(text="<b>Todos los costos</b> agrupados por año", font=dict(size=15, color="#1e293b")),
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=11, color="#374151"),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        xaxis=dict(showgrid=False), yaxis=dict(gridcolor="#f1f5f9", tickformat=",.4f"),
+        height=480, margin=dict(t=80, b=40, l=40, r=20),
+    )
+    return fig
+
+
+# ── Tab 2 — Comparación entre dos años ───────────────────────────────────────
+def figura_comparacion(costos, media_a, media_b, delta, año_a, año_b):
+    fig = make_subplots(rows=1, cols=2, subplot_titles=(
+        f"Valores promedio ({año_a} vs {año_b})",
+        f"Variación porcentual ({año_a} → {año_b})"
+    ))
+
+    fig.add_trace(go.Bar(name=str(año_a), x=costos, y=media_a.values,
+                         marker_color=COLORES[0], text=media_a.round(4), textposition="outside"), row=1, col=1)
+    fig.add_trace(go.Bar(name=str(año_b), x=costos, y=media_b.values,
+                         marker_color=COLORES[1], text=media_b.round(4), textposition="outside"), row=1, col=1)
+
+    colores_delta = ["#ef4444" if v > 0 else "#10b981" for v in delta.values]
+    fig.add_trace(go.Bar(
+        name="Δ %", x=costos, y=delta.values,
+        marker_color=colores_delta,
+        text=[f"{v:+.2f}%" for v in delta.values],
+        textposition="outside",
+    ), row=1, col=2)
+
+    fig.update_layout(
+        barmode="group", height=500,
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=11, color="#374151"),
+        showlegend=True,
+        margin=dict(t=60, b=100, l=40, r=20),
+    )
+    fig.update_xaxes(tickangle=-35)
+    fig.update_yaxes(gridcolor="#f1f5f9")
+    return fig
+
+
+def figura_productos(grp_prod_a, grp_prod_b, año_a, año_b):
+    """Barras por producto común a ambos años; None si no hay productos comunes."""
+    productos_comunes = grp_prod_a.index.intersection(grp_prod_b.index)
+    if len(productos_comunes) == 0:
+        return None
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(name=str(año_a), x=list(productos_comunes),
+                         y=grp_prod_a[productos_comunes].values, marker_color=COLORES[0]))
+    fig.add_trace(go.Bar(name=str(año_b), x=list(productos_comunes),
+                         y=grp_prod_b[productos_comunes].values, marker_color=COLORES[1]))
+    fig.update_layout(
+        barmode="group", height=400,
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=12, color="#374151"),
+        yaxis=dict(gridcolor="#f1f5f9", tickformat=",.4f"),
+        xaxis=dict(showgrid=False),
+        margin=dict(t=40, b=40, l=40, r=20),
+    )
+    return fig
+
+
+def figura_matriz_deltas(tabla, costo):
+    """`tabla`: variación % de `costo`, años base (filas) × años a comparar (columnas)."""
+    texto = [["" if pd.isna(v) else f"{v:+.2f}%" for v in fila] for fila in tabla.to_numpy()]
+    fig = go.Figure(go.Heatmap(
+        z=tabla.to_numpy(),
+        x=[str(a) for a in tabla.columns],
+        y=[str(a) for a in tabla.index],
+        text=texto,
+        texttemplate="%{text}",
+        hovertemplate="%{y} → %{x}: %{text}<extra></extra>",
+        colorscale=[[0, "#10b981"], [0.5, "#f8fafc"], [1, "#ef4444"]],
+        zmid=0,
+        colorbar=dict(title="Δ %"),
+    ))
+    fig.update_layout(
+        title=dict(text=f"<b>{costo}</b> — variación % entre años", font=dict(size=15, color="#1e293b")),
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=12, color="#374151"),
+        xaxis=dict(title="Año a comparar", type="category", side="top"),
+        yaxis=dict(title="Año base", type="category", autorange="reversed"),
+        height=max(300, 70 * len(tabla) + 120),
+        margin=dict(t=100, b=40, l=40, r=20),
+    )
+    return fig
+
+
+def figura_matriz_productos(tabla, costo):
+    """`tabla`: promedio de `costo`, productos (filas) × años (columnas)."""
+    fig = go.Figure(go.Heatmap(
+        z=tabla.to_numpy(dtype="float64"),
+        x=[str(a) for a in tabla.columns],
+        y=[str(p) for p in tabla.index],
+        hovertemplate="%{y} · %{x}: %{z:,.4f}<extra></extra>",
+        colorscale="Blues",
+        colorbar=dict(tickformat=",.4f"),
+    ))
+    fig.update_layout(
+        title=dict(text=f"<b>{costo}</b> — promedio por producto y año", font=dict(size=15, color="#1e293b")),
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=11, color="#374151"),
+        xaxis=dict(type="category", side="top"),
+        yaxis=dict(type="category", autorange="reversed"),
+        height=max(400, 18 * len(tabla) + 120),
+        margin=dict(t=100, b=20, l=40, r=20),
+    )
+    return fig
+
+
+# ── Escenarios de tipo de cambio ─────────────────────────────────────────────
+def figura_escenarios(rejilla, cambio_sel, variable):
+    """`rejilla`: promedio de cada costo afectado (columnas) por "Cambio %" (índice)."""
+    columnas = list(rejilla.columns)
+    fig = make_subplots(rows=len(columnas), cols=1, shared_xaxes=True,
+                        subplot_titles=columnas, vertical_spacing=0.06)
+    x = rejilla.index.to_numpy()
+    for idx, col in enumerate(columnas, start=1):
+        fig.add_trace(go.Scatter(
+            name=col, x=x, y=rejilla[col],
+            mode="lines", line=dict(color=COLORES[(idx - 1) % len(COLORES)], width=2.5),
+            showlegend=False,
+        ), row=idx, col=1)
+        if cambio_sel in rejilla.index:
+            fig.add_trace(go.Scatter(
+                x=[cambio_sel], y=[rejilla.loc[cambio_sel, col]],
+                mode="markers", marker=dict(color="#0f172a", size=9), showlegend=False,
+                hovertemplate="%{x:+.0f}%: %{y:,.4f}<extra></extra>",
+            ), row=idx, col=1)
+    fig.add_vline(x=0, line=dict(color="#94a3b8", dash="dot"))
+    fig.update_layout(
+        height=220 * len(columnas),
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=11, color="#374151"),
+        margin=dict(t=40, b=40, l=40, r=20),
+    )
+    fig.update_yaxes(gridcolor="#f1f5f9", tickformat=",.4f")
+    fig.update_xaxes(showgrid=False, ticksuffix="%")
+    fig.update_xaxes(title=f"Cambio en {variable}", row=len(columnas), col=1)
+    return fig
+
+
+def figura_monte_carlo(simulaciones, columna):
+    """Histograma de `columna` en las simulaciones, con percentiles 5, 50 y 95."""
+    fig = go.Figure(go.Histogram(x=simulaciones[columna], nbinsx=60, marker_color=COLORES[0], opacity=0.85))
+    for q, nombre in [(0.05, "P5"), (0.5, "P50"), (0.95, "P95")]:
+        valor = simulaciones[columna].quantile(q)
+        fig.add_vline(x=valor, line=dict(color="#ef4444" if q != 0.5 else "#0f172a", dash="dash"),
+                      annotation_text=f"{nombre} {valor:,.4f}", annotation_position="top")
+    fig.update_layout(
+        title=dict(text=f"<b>{columna}</b> — distribución simulada", font=dict(size=15, color="#1e293b")),
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=11, color="#374151"),
+        xaxis=dict(tickformat=",.4f", showgrid=False), yaxis=dict(title="Simulaciones", gridcolor="#f1f5f9"),
+        height=400, margin=dict(t=80, b=40, l=40, r=20), bargap=0.02,
+    )
+    return fig
+
+
+# ── Reducción de puntos ──────────────────────────────────────────────────────
+def lttb(x, y, n_salida):
+    """Índices de los puntos que conserva Largest-Triangle-Three-Buckets.
+
+    Mantiene el primero y el último, y de cada cubeta intermedia el punto
+    que forma el triángulo más grande con el elegido antes y el promedio de
+    la cubeta siguiente; así sobreviven picos y valles. `x` debe ser
+    numérica y creciente; con `n_salida` >= len(x) se devuelven todos.
+    """
+    n = len(x)
+    if n_salida >= n or n_salida < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    bordes = np.linspace(1, n - 1, n_salida - 1).astype(np.int64)
+    elegidos = np.empty(n_salida, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_salida - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        sig_fin = bordes[i + 2] if i + 2 < len(bordes) else n
+        # Promedio de la cubeta siguiente (el último punto para la última)
+        cx, cy = x[fin:sig_fin].mean(), y[fin:sig_fin].mean()
+        areas = np.abs(
+            (x[a] - cx) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (cy - y[a])
+        )
+        a = inicio + int(np.argmax(areas))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def reducir(x, y, max_puntos):
+    """(x, y) reducidos con LTTB a `max_puntos`, sin vacíos en y."""
+    validos = ~pd.isna(np.asarray(y, dtype="float64"))
+    x = np.asarray(x)[validos]
+    y = np.asarray(y, dtype="float64")[validos]
+    if max_puntos is None or len(x) <= max_puntos:
+        return x, y
+    x_num = x.astype("datetime64[ns]").astype("int64") if np.issubdtype(x.dtype, np.datetime64) else np.arange(len(x))
+    idx = lttb(x_num, y, max_puntos)
+    return x[idx], y[idx]
+
+
+# ── Tab 3 — Tipo de cambio ───────────────────────────────────────────────────
+def figura_tipo_cambio(grp_tc, grp_col, tc_sel, tipo_tc, max_puntos=None):
+    """`grp_tc`: promedio de `tc_sel` por [grp_col, Año], ordenado por `grp_col`.
+
+    Con `grp_col == "Fecha"` (serie diaria) el eje x es temporal, cada
+    subgráfica se reduce con LTTB a unos `max_puntos` (≈ ancho en píxeles) y,
+    si aun así la figura pasa de UMBRAL_WEBGL puntos, las líneas se dibujan
+    con Scattergl.
+    """
+    fig = make_subplots(
+        rows=len(tc_sel), cols=1,
+        shared_xaxes=True,
+        subplot_titles=tc_sel,
+        vertical_spacing=0.08,
+    )
+
+    # Un solo split por año; se reutiliza para todas las variables
+    por_año = [
+        (año, datos, datos[grp_col] if grp_col == "Fecha" else datos[grp_col].astype(str))
+        for año, datos in grp_tc.groupby("Año", sort=True)
+    ]
+    # Las trazas de un año comparten el ancho de la subgráfica: el presupuesto
+    # de puntos se reparte en proporción a los días de cada año
+    total = sum(len(datos) for _, datos, _ in por_año)
+    series = {}
+    for variable in tc_sel:
+        for i, (_, datos, x) in enumerate(por_año):
+            if max_puntos:
+                series[(variable, i)] = reducir(x, datos[variable], max(3, max_puntos * len(datos) // total))
+            else:
+                series[(variable, i)] = (x, datos[variable])
+    Linea = go.Scattergl if sum(len(x) for x, _ in series.values()) > UMBRAL_WEBGL else go.Scatter
+
+    for idx, variable in enumerate(tc_sel, start=1):
+        for i, (año, datos, _) in enumerate(por_año):
+            color = COLORES[i % len(COLORES)]
+            x, y  = series[(variable, i)]
+            if tipo_tc == "Línea":
+                fig.add_trace(Linea(
+                    name=f"{variable} {año}",
+                    x=x,
+                    y=y,
+                    mode="lines+markers",
+                    line=dict(color=color, width=2.5),
+                    marker=dict(size=6),
+                    showlegend=(idx == 1),
+                ), row=idx, col=1)
+            else:
+                fig.add_trace(go.Bar(
+                    name=f"{variable} {año}",
+                    x=x,
+                    y=y,
+                    marker_color=color,
+                    showlegend=(idx == 1),
+                ), row=idx, col=1)
+
+    fig.update_layout(
+        height=300 * len(tc_sel),
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=11, color="#374151"),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        margin=dict(t=60, b=40, l=40, r=20),
+    )
+    fig.update_yaxes(gridcolor="#f1f5f9", tickformat=",.4f")
+    fig.update_xaxes(showgrid=False, tickangle=-30)
+    return fig
+
+
+def figura_ventanas(rodante, tc_sel, difs, ventana, max_puntos=None):
+    """`rodante`: salida de `ventanas.CacheRodantes.obtener` (columnas (métrica, columna)).
+
+    Una subgráfica por variable de `tc_sel` (valor diario y media móvil),
+    otra con la volatilidad de todas y otra con los diferenciales `difs` y
+    su media móvil. Cada línea se reduce con LTTB a `max_puntos`.
+    """
+    filas  = list(tc_sel) + ["Volatilidad"] + (["Diferenciales"] if difs else [])
+    fig = make_subplots(rows=len(filas), cols=1, shared_xaxes=True,
+                        subplot_titles=[*tc_sel, f"Volatilidad ({ventana} fechas)", *(["Diferenciales"] if difs else [])],
+                        vertical_spacing=0.06)
+    x = rodante.index.to_numpy()
+    Linea = go.Scattergl if len(x) > UMBRAL_WEBGL else go.Scatter
+
+    def linea(y, nombre, color, fila, ancho=2.5, punteada=False, leyenda=True):
+        xs, ys = reducir(x, y, max_puntos)
+        fig.add_trace(Linea(
+            name=nombre, x=xs, y=ys, mode="lines",
+            line=dict(color=color, width=ancho, dash="dot" if punteada else None),
+            showlegend=leyenda,
+        ), row=fila, col=1)
+
+    for i, variable in enumerate(tc_sel):
+        color = COLORES[i % len(COLORES)]
+        linea(rodante["valor"][variable], variable, "#cbd5e1", i + 1, ancho=1, leyenda=False)
+        linea(rodante["media"][variable], f"{variable} — media {ventana}", color, i + 1)
+        linea(rodante["volatilidad"][variable], f"{variable} — volatilidad %", color, len(tc_sel) + 1,
+              ancho=1.5, leyenda=False)
+    for i, dif in enumerate(difs):
+        color = COLORES[(len(tc_sel) + i) % len(COLORES)]
+        linea(rodante["valor"][dif], dif, color, len(filas), ancho=1, punteada=True)
+        linea(rodante["media"][dif], f"{dif} — media {ventana}", color, len(filas))
+
+    fig.update_layout(
+        height=260 * len(filas),
+        plot_bgcolor="white", paper_bgcolor="white",
+        font=dict(family="DM Sans", size=11, color="#374151"),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        margin=dict(t=60, b=40, l=40, r=20),
+    )
+    fig.update_yaxes(gridcolor="#f1f5f9", tickformat=",.4f")
+    fig.update_xaxes(showgrid=False)
+    return fig
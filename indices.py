@@ -0,0 +1,278 @@
+"""
+indices.py
+----------
+Índices construidos una vez por dataset para responder los filtros del
+sidebar y el buscador de la tabla sin recorrer todas las filas en cada rerun.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ingesta import COLUMNAS_COSTOS, COLUMNAS_TEXTO, COLUMNAS_TIPO_CAMBIO
+
+COLUMNAS_FILTRO = ["Producto/Presentación", "Exportador", "Año"]
+COLUMNAS_BUSQUEDA = COLUMNAS_TEXTO + ["Fecha"] + COLUMNAS_TIPO_CAMBIO + COLUMNAS_COSTOS
+
+# Un token es una racha alfanumérica; ".", ",", "/" y "-" entre dos rachas no
+# la cortan, así "2.5", "1,234.5678", "2024-03-15" y "E3750" son un token.
+_TOKEN = re.compile(r"[0-9a-z]+(?:[.,/-][0-9a-z]+)*")
+
+
+class _ListasFilas:
+    """Lista ordenada de ids de fila por cada valor distinto de una columna.
+
+    Las filas de todos los valores se guardan en un único arreglo `orden`
+    (estilo CSR): las del valor i son orden[inicio[i]:inicio[i + 1]].
+    """
+
+    def __init__(self, serie):
+        codigos, valores = pd.factorize(serie)
+        tipo = np.int32 if len(serie) < 2 ** 31 else np.int64
+        self.n        = len(serie)
+        self.posicion = {v: i for i, v in enumerate(valores)}
+        self.orden    = np.argsort(codigos, kind="stable").astype(tipo)
+        conteos = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+        # Los vacíos (código -1) quedan al principio de `orden` y se saltan
+        self.inicio = int((codigos < 0).sum()) + np.concatenate([[0], np.cumsum(conteos)])
+
+    def mascara(self, seleccion):
+        """Máscara booleana de las filas cuyo valor está en `seleccion`."""
+        mascara = np.zeros(self.n, dtype=bool)
+        for valor in seleccion:
+            i = self.posicion.get(valor)
+            if i is not None:
+                mascara[self.orden[self.inicio[i]:self.inicio[i + 1]]] = True
+        return mascara
+
+    def mascara_codigos(self, codigos):
+        """Máscara de las filas cuyo valor tiene uno de los `codigos` (-1 = vacío)."""
+        marcados = np.zeros(len(self.posicion) + 1, dtype=bool)
+        marcados[np.asarray(codigos) + 1] = True
+        mascara = np.zeros(self.n, dtype=bool)
+        # Un bloque contiguo de `orden` por valor: los vacíos y luego cada valor
+        mascara[self.orden] = np.repeat(marcados, np.diff(self.inicio, prepend=0))
+        return mascara
+
+
+class IndiceFiltros:
+    """Índice de Producto/Presentación, Exportador y Año → filas.
+
+    `filas` devuelve las posiciones (ordenadas) de las filas que cumplen la
+    selección del sidebar. Cada máscara por columna y cada resultado final se
+    memoizan por la tupla seleccionada, así que al cambiar un solo filtro
+    sólo se recalcula esa columna y una intersección. Seguro entre hilos (el
+    precálculo en segundo plano filtra mientras corre el script).
+    """
+
+    def __init__(self, df, max_memo=16):
+        self.n        = len(df)
+        self.listas   = {col: _ListasFilas(df[col]) for col in COLUMNAS_FILTRO if col in df.columns}
+        self.max_memo = max_memo
+        self._mascaras  = OrderedDict()
+        self._resultados = OrderedDict()
+        self._lock       = threading.Lock()
+
+    def filas(self, productos=None, exportadores=None, años=None):
+        """Posiciones de fila para la selección; None en un filtro = sin filtro."""
+        seleccion = (
+            ("Producto/Presentación", _tupla(productos)),
+            ("Exportador",            _tupla(exportadores)),
+            ("Año",                   _tupla(años)),
+        )
+        with self._lock:
+            if seleccion in self._resultados:
+                self._resultados.move_to_end(seleccion)
+                return self._resultados[seleccion]
+
+        mascara = None
+        for col, valores in seleccion:
+            if valores is None or col not in self.listas:
+                continue
+            m = self._mascara(col, valores)
+            mascara = m if mascara is None else mascara & m
+        filas = np.arange(self.n) if mascara is None else np.flatnonzero(mascara)
+
+        with self._lock:
+            _guardar(self._resultados, seleccion, filas, self.max_memo)
+        return filas
+
+    def _mascara(self, col, valores):
+        clave = (col, valores)
+        with self._lock:
+            if clave in self._mascaras:
+                self._mascaras.move_to_end(clave)
+                return self._mascaras[clave]
+        mascara = self.listas[col].mascara(valores)
+        with self._lock:
+            # Tres columnas × unas cuantas selecciones recientes de cada una
+            _guardar(self._mascaras, clave, mascara, 3 * self.max_memo)
+        return mascara
+
+
+def _tupla(valores):
+    return None if valores is None else tuple(valores)
+
+
+def _guardar(memo, clave, valor, maximo):
+    memo[clave] = valor
+    while len(memo) > maximo:
+        memo.popitem(last=False)
+
+
+# ── Búsqueda de texto ────────────────────────────────────────────────────────
+def plegar(texto):
+    """Minúsculas y sin acentos: "CHAMPIÑONES" → "champinones"."""
+    texto = str(texto)
+    if texto.isascii():
+        return texto.casefold()
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def tokens(texto):
+    return _TOKEN.findall(plegar(texto))
+
+
+class IndiceTexto:
+    """Índice invertido token → valores distintos → filas, para el buscador.
+
+    Se tokeniza cada valor distinto de cada columna de COLUMNAS_BUSQUEDA una
+    sola vez: los números tal como se muestran (con y sin separador de
+    miles) y con todos sus decimales, las fechas como AAAA-MM-DD y los
+    vacíos como "nan" / "NaT", igual que los veía el `str.contains` de la
+    tabla. Una consulta encuentra las filas en las que *cada* token de la
+    consulta aparece dentro de algún token de la fila ("3459" encuentra la
+    factura E3459), sin distinguir mayúsculas ni acentos.
+
+    El fragmento se busca con `np.strings.find` en el vocabulario de texto y
+    fechas y, en cada columna numérica, en un texto por valor distinto con
+    sus tres formas (casi todos los valores son distintos: así no se crea un
+    str de Python por token). Un fragmento con letras sólo se busca en los
+    textos con letras, que son pocos.
+    """
+
+    def __init__(self, df, max_memo=32):
+        self.n        = len(df)
+        self.listas   = []
+        self._numeros = []
+        partes = [(np.array([], dtype=object), np.array([], dtype=np.int64), np.array([], dtype=np.int64),
+                   np.array([], dtype=bool))]
+        for col in COLUMNAS_BUSQUEDA:
+            if col not in df.columns:
+                continue
+            k = len(self.listas)
+            listas = _ListasFilas(df[col])
+            self.listas.append(listas)
+            if listas.inicio[0]:
+                # Los vacíos se veían como "nan" / "NaT"
+                vacio = "nat" if pd.api.types.is_datetime64_any_dtype(df[col]) else "nan"
+                partes.append((np.array([vacio], dtype=object), np.array([k]), np.array([-1]), np.array([True])))
+            if pd.api.types.is_float_dtype(df[col]):
+                valores = np.fromiter(listas.posicion, df[col].dtype, len(listas.posicion))
+                textos  = _textos_numericos(valores)
+                letras  = (np.strings.find(textos, "e") >= 0) | (np.strings.find(textos, "n") >= 0)
+                self._numeros.append((k, textos, np.flatnonzero(letras)))
+            else:
+                textos, codigos, letras = _tokenizar(df[col], listas)
+                partes.append((textos, np.full(len(codigos), k), codigos, letras))
+
+        textos, columnas, codigos, letras = (np.concatenate(p) for p in zip(*partes))
+        token, vocabulario = pd.factorize(textos)
+        con_letras = np.zeros(len(vocabulario), dtype=bool)
+        con_letras[token] = letras
+        # Apariciones en CSR, sin repetir (token, columna, código): las del
+        # token j son _columnas/_codigos[_inicio[j]:_inicio[j + 1]]
+        orden = np.lexsort((codigos, columnas, token))
+        token, columnas, codigos = token[orden], columnas[orden], codigos[orden]
+        nuevo = np.ones(len(token), dtype=bool)
+        nuevo[1:] = (np.diff(token) != 0) | (np.diff(columnas) != 0) | (np.diff(codigos) != 0)
+        token = token[nuevo]
+        self._columnas = columnas[nuevo].astype(np.int16)
+        self._codigos  = codigos[nuevo].astype(np.int32)
+        self._inicio   = np.searchsorted(token, np.arange(len(vocabulario) + 1))
+
+        self.vocabulario = np.asarray(vocabulario, dtype=np.dtypes.StringDType())
+        self._con_letras = np.flatnonzero(con_letras)
+        self.max_memo  = max_memo
+        self._mascaras = OrderedDict()
+        self._lock     = threading.Lock()
+
+    def buscar(self, consulta, filas=None):
+        """Posiciones (ordenadas) que coinciden con `consulta`, dentro de `filas`."""
+        filas = np.arange(self.n) if filas is None else np.asarray(filas)
+        mascara = None
+        for token in dict.fromkeys(tokens(consulta)):
+            m = self._mascara(token)
+            mascara = m if mascara is None else mascara & m
+        return filas if mascara is None else filas[mascara[filas]]
+
+    def _mascara(self, fragmento):
+        with self._lock:
+            if fragmento in self._mascaras:
+                self._mascaras.move_to_end(fragmento)
+                return self._mascaras[fragmento]
+
+        numerico = _numerico(fragmento)
+        mascara = np.zeros(self.n, dtype=bool)
+        for k, textos, con_letras in self._numeros:
+            if numerico:
+                codigos = np.flatnonzero(np.strings.find(textos, fragmento) >= 0)
+            else:
+                codigos = con_letras[np.strings.find(textos[con_letras], fragmento) >= 0]
+            if len(codigos):
+                mascara |= self.listas[k].mascara_codigos(codigos)
+
+        if numerico:
+            coinciden = np.flatnonzero(np.strings.find(self.vocabulario, fragmento) >= 0)
+        else:
+            coinciden = self._con_letras[np.strings.find(self.vocabulario[self._con_letras], fragmento) >= 0]
+        desde, largos = self._inicio[coinciden], np.diff(self._inicio)[coinciden]
+        # Los tramos desde[j]:desde[j] + largos[j] de todos los tokens, sin ciclo
+        pares = np.repeat(desde - np.cumsum(largos) + largos, largos) + np.arange(largos.sum())
+        columnas, codigos = self._columnas[pares], self._codigos[pares]
+        for k in np.unique(columnas):
+            mascara |= self.listas[k].mascara_codigos(codigos[columnas == k])
+
+        with self._lock:
+            _guardar(self._mascaras, fragmento, mascara, self.max_memo)
+        return mascara
+
+
+# Quita los separadores que caben dentro de un token numérico ("1,234.5678", "2024-03-15")
+_SEPARADORES = str.maketrans("", "", ".,/-")
+
+
+def _numerico(token):
+    return token.translate(_SEPARADORES).isdigit()
+
+
+def _textos_numericos(valores):
+    """"<con miles> <como en la tabla> <str(v)>" de cada valor, sin signo.
+
+    Separadas por espacio, que no aparece dentro de un token de la consulta.
+    """
+    valores = np.abs(valores)
+    texto = np.strings.mod(np.array("%.4f", dtype=np.dtypes.StringDType()), valores)
+    texto = texto + " " + valores.astype(np.dtypes.StringDType())
+    miles = np.flatnonzero(valores >= 1000)
+    if len(miles):
+        # Sólo estos llevan separador de miles, que printf no sabe poner
+        comas = np.array([f"{v:,.4f}" for v in valores[miles].tolist()], dtype=texto.dtype)
+        texto[miles] = comas + " " + texto[miles]
+    return texto
+
+
+def _tokenizar(serie, listas):
+    """(tokens, código del valor, token con letras) de los valores distintos de `serie`."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        textos = pd.DatetimeIndex(list(listas.posicion)).strftime("%Y-%m-%d").to_numpy(dtype=object)
+        return textos, np.arange(len(textos)), np.zeros(len(textos), dtype=bool)
+    pares = [(t, i) for v, i in listas.posicion.items() for t in set(tokens(v))]
+    textos = np.array([t for t, _ in pares], dtype=object)
+    return (textos, np.array([i for _, i in pares], dtype=np.int64),
+            np.array([not _numerico(t) for t in textos], dtype=bool))
@@ -0,0 +1,228 @@
+"""
+ingesta.py
+----------
+Lectura y normalización de archivos Condensado (generados por transformar.py).
+
+Todas las rutas de carga del dashboard pasan por `preparar`, de modo que el
+DataFrame resultante es idéntico sin importar de dónde venga (Excel o caché).
+"""
+
+import io
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# ── Columnas del Condensado ──────────────────────────────────────────────────
+COLUMNAS_COSTOS = [
+    "Precio compra EUROS",
+    "Costo pieza mxn",
+    "Flete Maritimo ($/pieza)",
+    "DTA ($/pieza)",
+    "IGI ($/pieza)",
+    "Aduana y Flete Terrestre ($/pieza)",
+    "COSTO DE IMPORTACION X PIEZA ($/pieza)",
+    "Gastos Locales Naviera $/pieza",
+    "Costo Compra Ana Dis ($/pieza)",
+    "Precio Unitario Compra Pasta Mia",
+]
+
+COLUMNAS_TIPO_CAMBIO = [
+    "TIPO DE CAMBIO",
+    "DÓLAR (DOF)",
+    "FACTORAJE (DOF)",
+]
+
+# Columnas de texto: en el Excel pueden mezclar números y cadenas (p. ej.
+# Embarque = 16 / "IMCA 23"), así que se guardan siempre como str.
+COLUMNAS_TEXTO = [
+    "Exportador",
+    "Embarque",
+    "Factura",
+    "Producto/Presentación",
+]
+
+
+# Identifican un renglón de importación al combinar varios Condensados.
+COLUMNAS_CLAVE = [
+    "Fecha",
+    "Exportador",
+    "Embarque",
+    "Factura",
+    "Producto/Presentación",
+]
+
+# Columnas que usa el dashboard; el lector por streaming descarta el resto.
+COLUMNAS_USADAS = ["Fecha"] + COLUMNAS_TEXTO + COLUMNAS_TIPO_CAMBIO + COLUMNAS_COSTOS
+
+# Costos en float32 (mitad de memoria) para columnas cuya vista a 4 decimales
+# no cambia; se activa con CONDENSADO_FLOAT32=1.
+COSTOS_FLOAT32 = os.environ.get("CONDENSADO_FLOAT32", "0") == "1"
+
+# Filas por bloque del lector por streaming: acota la memoria de los valores
+# Python intermedios sin perder la conversión vectorizada de pandas.
+FILAS_POR_BLOQUE = 10_000
+
+
+def leer_bytes(archivo):
+    """Devuelve el contenido binario de un archivo subido, ruta o buffer."""
+    if isinstance(archivo, (bytes, bytearray)):
+        return bytes(archivo)
+    if hasattr(archivo, "getvalue"):
+        return archivo.getvalue()
+    if hasattr(archivo, "read"):
+        return archivo.read()
+    with open(archivo, "rb") as f:
+        return f.read()
+
+
+def preparar(df):
+    """Deriva Fecha/Año/Mes y convierte costos y tipos de cambio a numérico."""
+    df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
+    df["Año"]   = df["Fecha"].dt.year
+    df["Mes"]   = df["Fecha"].dt.to_period("M").astype(str)
+    for col in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in COLUMNAS_TEXTO:
+        if col in df.columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def llaves(df):
+    """Hash uint64 por fila de COLUMNAS_CLAVE (NaN/NaT cuentan como iguales)."""
+    cols = [c for c in COLUMNAS_CLAVE if c in df.columns]
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+
+def leer_excel(archivo):
+    """Lee un Condensado .xlsx completo con pandas/openpyxl."""
+    if isinstance(archivo, (bytes, bytearray)):
+        archivo = io.BytesIO(archivo)
+    return preparar(pd.read_excel(archivo))
+
+
+def leer_excel_streaming(archivo, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Lee un Condensado fila por fila (openpyxl en modo read-only).
+
+    A diferencia de `leer_excel`, nunca construye el modelo completo del
+    libro: las filas se acumulan en bloques de `filas_por_bloque`, cada bloque
+    se convierte a un DataFrame tipado (`preparar`) y sólo se conservan las
+    columnas de COLUMNAS_USADAS. Las filas completamente vacías se omiten.
+    """
+    import openpyxl  # diferido: sólo se necesita al leer un Excel
+
+    if isinstance(archivo, (bytes, bytearray)):
+        archivo = io.BytesIO(archivo)
+
+    wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = wb.active.iter_rows(values_only=True)
+        encabezado = next(filas, None) or ()
+        indices = [
+            (i, nombre) for i, nombre in enumerate(encabezado)
+            if nombre in COLUMNAS_USADAS
+        ]
+        if not any(nombre == "Fecha" for _, nombre in indices):
+            raise ValueError("El archivo no tiene la columna 'Fecha'.")
+
+        bloques = []
+        bloque  = []
+        for fila in filas:
+            if all(v is None for v in fila):
+                continue
+            bloque.append(fila)
+            if len(bloque) >= filas_por_bloque:
+                bloques.append(_bloque_a_frame(bloque, indices))
+                bloque = []
+        if bloque or not bloques:
+            bloques.append(_bloque_a_frame(bloque, indices))
+    finally:
+        wb.close()
+
+    return pd.concat(bloques, ignore_index=True) if len(bloques) > 1 else bloques[0]
+
+
+def _bloque_a_frame(filas, indices):
+    datos = {}
+    for i, nombre in indices:
+        datos[nombre] = [f[i] if i < len(f) else None for f in filas]
+    df = preparar(pd.DataFrame(datos, columns=[n for _, n in indices]))
+    # Un bloque sin decimales ni vacíos saldría int64; se fija float64 para
+    # que todos los bloques concatenen con el mismo tipo.
+    for col in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO:
+        if col in df.columns:
+            df[col] = df[col].astype("float64")
+    return df
+
+
+# ── Representación compacta ──────────────────────────────────────────────────
+def compactar(df, float32=COSTOS_FLOAT32):
+    """Versión compacta en memoria del DataFrame ya preparado.
+
+    - Columnas de texto → category (isin/groupby sobre códigos enteros).
+    - Año → Int16 (admite vacíos); Mes → category ordenada ("2024-03").
+    - Con `float32`, los costos y tipos de cambio que pasan
+      `diferencias_float32` (misma vista a 4 decimales) bajan a float32.
+    """
+    df = df.copy()
+    for col in COLUMNAS_TEXTO:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if "Año" in df.columns:
+        df["Año"] = df["Año"].astype("Int16")
+    if "Mes" in df.columns:
+        meses = pd.Series(df["Mes"], copy=False).astype(str)
+        df["Mes"] = pd.Categorical(meses, categories=sorted(meses.unique()), ordered=True)
+    if float32:
+        diferencias = diferencias_float32(df)
+        for col in diferencias.index[diferencias["valores_distintos"] == 0]:
+            df[col] = df[col].astype("float32")
+    return df
+
+
+def concatenar_compactos(a, b):
+    """`a` y luego `b`, los dos ya compactos, sin volver a compactar `a`.
+
+    Las categorías se unen (ordenadas, como las deja `compactar`) y sólo se
+    recodifican los enteros; los textos de `a` no se vuelven a convertir. Una
+    columna que es float32 en un lado y float64 en el otro queda en float64.
+    """
+    columnas = {}
+    for col in a.columns:
+        x, y = a[col], b[col]
+        if isinstance(x.dtype, pd.CategoricalDtype) and isinstance(y.dtype, pd.CategoricalDtype):
+            if x.cat.ordered:
+                # Mes: union_categoricals no ordena categorías de un Categorical ordenado
+                categorias = x.cat.categories.union(y.cat.categories).sort_values()
+                x, y = x.cat.set_categories(categorias), y.cat.set_categories(categorias)
+                columnas[col] = union_categoricals([x, y])
+            else:
+                columnas[col] = union_categoricals([x, y], sort_categories=True)
+        else:
+            columnas[col] = pd.concat([x, y], ignore_index=True)
+    return pd.DataFrame(columnas)
+
+
+def diferencias_float32(df, decimales=4):
+    """Compara cada columna numérica en float64 vs float32 a `decimales` decimales.
+
+    Devuelve, por columna, el error absoluto máximo y cuántos valores se
+    verían distintos en la tabla del dashboard (formato ``{:,.4f}``).
+    """
+    filas = {}
+    for col in COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO:
+        if col not in df.columns:
+            continue
+        original = df[col].to_numpy(dtype="float64", na_value=np.nan)
+        reducido = original.astype("float32").astype("float64")
+        with np.errstate(invalid="ignore"):
+            error = np.abs(original - reducido)
+        distintos = np.round(original, decimales) != np.round(reducido, decimales)
+        filas[col] = {
+            "error_max":         float(np.nanmax(error)) if np.isfinite(error).any() else 0.0,
+            "valores_distintos": int((distintos & ~np.isnan(original)).sum()),
+        }
+    return pd.DataFrame.from_dict(filas, orient="index")
@@ -0,0 +1,290 @@
+"""
+motor_sql.py
+------------
+Motor de consultas sobre el almacén SQLite (`almacen.py`), sin cargar las
+filas en memoria.
+
+`CuboSQL` tiene la misma interfaz que `cubo.Cubo` (filtrar, media,
+estadisticas, media_total, registros, n_productos): los filtros del sidebar
+van al WHERE y cada groupby del dashboard es un GROUP BY en SQLite, así que
+a pandas sólo llegan los resultados agregados. Año y Mes se derivan de la
+Fecha guardada, igual que en `ingesta.preparar`.
+
+Los promedios se arman como SUM / COUNT de valores no nulos, igual que en el
+cubo en memoria; los dos motores dan los mismos números salvo el orden de la
+suma en punto flotante (diferencias relativas del orden de 1e-15, invisibles
+con 4 decimales). `comparar` lo verifica sobre un dataset.
+
+Con una `productos.TablaProductos`, Producto/Presentación se consulta como
+un CASE que pasa cada variante a su nombre canónico (sólo los nombres que
+cambian), así filtros y GROUP BY ven los mismos productos que el motor en
+memoria.
+
+Las vistas que necesitan filas individuales (tabla, búsqueda, escenarios,
+exportación) siguen cargando el DataFrame, pero sólo cuando se usan.
+
+Variables de entorno:
+    CONDENSADO_MOTOR   "memoria" (def.) o "sqlite" (requiere CONDENSADO_ALMACEN)
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from almacen import Almacen
+from ingesta import COLUMNAS_COSTOS, COLUMNAS_TIPO_CAMBIO
+
+MOTOR = os.environ.get("CONDENSADO_MOTOR", "memoria")
+MOTORES = ["memoria", "sqlite"]
+
+COLUMNAS = COLUMNAS_COSTOS + COLUMNAS_TIPO_CAMBIO
+
+# Expresión SQL de cada dimensión del cubo
+DIMENSIONES_SQL = {
+    "Producto/Presentación": '"Producto/Presentación"',
+    "Exportador":            '"Exportador"',
+    "Año":                   "CAST(strftime('%Y', \"Fecha\") AS INTEGER)",
+    "Mes":                   "strftime('%Y-%m', \"Fecha\")",
+}
+
+
+def _col(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _texto(valor):
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+class MotorSQLite:
+    """Consultas agregadas sobre la tabla `filas` de un almacén.
+
+    Los resultados se memoizan por consulta (LRU de `max_memo`): el motor
+    corresponde a un contenido fijo del almacén (ver `analisis.Dataset`).
+    `productos` (una `productos.TablaProductos`) unifica los nombres de producto.
+    """
+
+    def __init__(self, ruta, max_memo=128, productos=None):
+        self.ruta      = str(ruta)
+        self.max_memo  = max_memo
+        self.productos = productos
+        self._memo     = OrderedDict()
+        self._lock     = threading.Lock()
+
+    def consultar(self, sql, parametros=()):
+        clave = (sql, tuple(parametros))
+        with self._lock:
+            if clave in self._memo:
+                self._memo.move_to_end(clave)
+                return self._memo[clave]
+        with closing(sqlite3.connect(self.ruta, timeout=30)) as con:
+            resultado = pd.read_sql_query(sql, con, params=list(parametros))
+        with self._lock:
+            self._memo[clave] = resultado
+            while len(self._memo) > self.max_memo:
+                self._memo.popitem(last=False)
+        return resultado
+
+    @property
+    def columnas(self):
+        return list(COLUMNAS)
+
+    @cached_property
+    def dimensiones(self):
+        """Expresión SQL de cada dimensión, con los nombres canónicos si hay `productos`."""
+        dimensiones = dict(DIMENSIONES_SQL)
+        if self.productos is None:
+            return dimensiones
+        expr = dimensiones["Producto/Presentación"]
+        r = self.consultar(
+            f"SELECT {expr} AS nombre, COUNT(*) AS n FROM filas WHERE {expr} IS NOT NULL GROUP BY {expr}"
+        )
+        conteos = dict(zip(r["nombre"], r["n"].tolist()))
+        cambios = [(n, c) for n, c in self.productos.mapear(list(conteos), conteos).items() if n != c]
+        if cambios:
+            casos = " ".join(f"WHEN {_texto(n)} THEN {_texto(c)}" for n, c in cambios)
+            dimensiones["Producto/Presentación"] = f"(CASE {expr} {casos} ELSE {expr} END)"
+        return dimensiones
+
+    def distintos(self, dimension):
+        """Valores distintos no nulos de una dimensión, ordenados."""
+        expr = self.dimensiones[dimension]
+        r = self.consultar(f"SELECT DISTINCT {expr} AS v FROM filas WHERE {expr} IS NOT NULL ORDER BY v")
+        return [int(v) for v in r["v"]] if dimension == "Año" else list(r["v"])
+
+    def cubo(self):
+        return CuboSQL(self)
+
+    def df(self):
+        """Todas las filas en memoria (para las vistas que las necesitan)."""
+        df = Almacen(self.ruta).df()
+        return df if df is None or self.productos is None else self.productos.aplicar(df)
+
+
+class CuboSQL:
+    """Mismo contrato que `cubo.Cubo`, con cada consulta resuelta en SQLite."""
+
+    def __init__(self, motor, productos=None, exportadores=None, años=None):
+        self.motor   = motor
+        self.filtros = {"Producto/Presentación": productos, "Exportador": exportadores, "Año": años}
+
+    @property
+    def columnas(self):
+        return self.motor.columnas
+
+    # ── Filtros ──────────────────────────────────────────────────────────────
+    def filtrar(self, productos=None, exportadores=None, años=None):
+        return CuboSQL(self.motor, _tupla(productos), _tupla(exportadores), _tupla(años))
+
+    def _where(self, no_nulos=()):
+        condiciones, parametros = [], []
+        for dimension, valores in self.filtros.items():
+            if valores is None:
+                continue
+            if not valores:
+                condiciones.append("0")
+                continue
+            condiciones.append(f"{self.motor.dimensiones[dimension]} IN ({', '.join('?' * len(valores))})")
+            parametros += [int(v) if dimension == "Año" else v for v in valores]
+        condiciones += [f"{self.motor.dimensiones[d]} IS NOT NULL" for d in no_nulos]
+        return (" WHERE " + " AND ".join(condiciones) if condiciones else ""), parametros
+
+    # ── Resúmenes ────────────────────────────────────────────────────────────
+    @property
+    def vacio(self):
+        return self.registros() == 0
+
+    def registros(self):
+        where, p = self._where()
+        return int(self.motor.consultar(f"SELECT COUNT(*) AS n FROM filas{where}", p)["n"].iloc[0])
+
+    def n_productos(self):
+        where, p = self._where()
+        sql = f'SELECT COUNT(DISTINCT {self.motor.dimensiones["Producto/Presentación"]}) AS n FROM filas{where}'
+        return int(self.motor.consultar(sql, p)["n"].iloc[0])
+
+    def media_total(self, columnas):
+        """Promedio de cada columna sobre todas las filas filtradas (Series)."""
+        sumas, cuentas = self._sumas([], columnas)
+        return (sumas / cuentas.where(cuentas > 0)).iloc[0]
+
+    def media(self, por, columnas):
+        """Promedio por las dimensiones `por`, como `df.groupby(por)[columnas].mean()`."""
+        por = _lista(por)
+        sumas, cuentas = self._sumas(por, columnas)
+        return sumas / cuentas.where(cuentas > 0)
+
+    def estadisticas(self, por, columnas):
+        """Promedio, mínimo y máximo, como `groupby(por)[columnas].agg(["mean", "min", "max"])`."""
+        por = _lista(por)
+        r = self._agregar(por, [(f, c) for c in columnas for f in ("SUM", "COUNT", "MIN", "MAX")])
+        partes = {}
+        for c in columnas:
+            cuentas = r[f"COUNT|{c}"]
+            partes[(c, "mean")] = r[f"SUM|{c}"].astype("float64") / cuentas.where(cuentas > 0)
+            partes[(c, "min")]  = r[f"MIN|{c}"].astype("float64")
+            partes[(c, "max")]  = r[f"MAX|{c}"].astype("float64")
+        return pd.DataFrame(partes)
+
+    # ── Series por fecha ─────────────────────────────────────────────────────
+    def serie_diaria(self, columnas, desde=None, hasta=None):
+        """Promedio diario de `columnas`, como `Filtro.serie_diaria`."""
+        where, p = self._where()
+        condiciones = [where[len(" WHERE "):]] if where else []
+        condiciones.append('"Fecha" IS NOT NULL')
+        if desde is not None:
+            condiciones.append('"Fecha" >= ?')
+            p.append(pd.Timestamp(desde).isoformat(sep=" "))
+        if hasta is not None:
+            condiciones.append('"Fecha" <= ?')
+            p.append(pd.Timestamp(hasta).isoformat(sep=" "))
+        agregados = ", ".join(f"SUM({_col(c)}) AS {_col('SUM|' + c)}, COUNT({_col(c)}) AS {_col('COUNT|' + c)}"
+                              for c in columnas)
+        r = self.motor.consultar(
+            f'SELECT "Fecha", {agregados} FROM filas WHERE {" AND ".join(condiciones)} '
+            f'GROUP BY "Fecha" ORDER BY "Fecha"', p,
+        )
+        grp = pd.DataFrame({"Fecha": pd.to_datetime(r["Fecha"])})
+        for c in columnas:
+            cuentas = r[f"COUNT|{c}"]
+            grp[c] = r[f"SUM|{c}"].astype("float64") / cuentas.where(cuentas > 0)
+        grp["Año"] = grp["Fecha"].dt.year
+        return grp
+
+    def rango_fechas(self):
+        where, p = self._where()
+        r = self.motor.consultar(f'SELECT MIN("Fecha") AS desde, MAX("Fecha") AS hasta FROM filas{where}', p)
+        desde, hasta = r["desde"].iloc[0], r["hasta"].iloc[0]
+        return (None, None) if desde is None else (pd.Timestamp(desde), pd.Timestamp(hasta))
+
+    # ── Consultas ────────────────────────────────────────────────────────────
+    def _sumas(self, por, columnas):
+        r = self._agregar(por, [(f, c) for c in columnas for f in ("SUM", "COUNT")])
+        sumas   = pd.DataFrame({c: r[f"SUM|{c}"].astype("float64") for c in columnas}, index=r.index)
+        cuentas = pd.DataFrame({c: r[f"COUNT|{c}"] for c in columnas}, index=r.index)
+        return sumas, cuentas
+
+    def _agregar(self, por, agregados):
+        """SELECT por, f(c)... GROUP BY por; columnas "f|c", índice `por` (como el cubo)."""
+        where, p = self._where(no_nulos=por)
+        dims = [f"{self.motor.dimensiones[d]} AS {_col(d)}" for d in por]
+        expr = [f"{f}({_col(c)}) AS {_col(f + '|' + c)}" for f, c in agregados]
+        sql = f"SELECT {', '.join(dims + expr)} FROM filas{where}"
+        if por:
+            # Las expresiones y no los alias: un alias igual a una columna de
+            # `filas` ("Producto/Presentación") agruparía por la columna original
+            grupos = ", ".join(self.motor.dimensiones[d] for d in por)
+            sql += f" GROUP BY {grupos} ORDER BY {grupos}"
+        r = self.motor.consultar(sql, p).copy()
+        if por:
+            r = r.set_index(por if len(por) > 1 else por[0])
+        return r
+
+
+def comparar(datos_memoria, cubo_sql, costos=None):
+    """Máxima diferencia relativa entre el cubo en memoria y `cubo_sql` en cada agregación.
+
+    Recorre las consultas del dashboard (promedio por producto/año, año,
+    mes/año, total y estadísticas de tipo de cambio) sobre todo el dataset.
+    Con nombres canónicos, los dos lados deben usar la misma tabla de productos.
+    """
+    costos = costos or datos_memoria.costos
+    tcs = datos_memoria.tipos_cambio
+    memoria = datos_memoria.cubo
+    consultas = {
+        "registros":       lambda c: pd.Series([c.registros(), c.n_productos()], dtype="float64"),
+        "media_total":     lambda c: c.media_total(costos),
+        "producto_año":    lambda c: c.media(["Producto/Presentación", "Año"], costos),
+        "año":             lambda c: c.media("Año", costos),
+        "mes_año":         lambda c: c.media(["Mes", "Año"], costos),
+        "estadisticas_tc": lambda c: c.estadisticas("Año", tcs),
+    }
+    diferencias = {}
+    for nombre, consulta in consultas.items():
+        a = _a_numpy(consulta(memoria))
+        b = _a_numpy(consulta(cubo_sql))
+        if a.shape != b.shape or not np.array_equal(np.isnan(a), np.isnan(b)):
+            diferencias[nombre] = np.inf
+            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel = np.abs(a - b) / np.maximum(np.abs(a), np.finfo("float64").tiny)
+        diferencias[nombre] = float(np.nanmax(rel)) if rel.size and not np.isnan(rel).all() else 0.0
+    return pd.Series(diferencias, name="diferencia_relativa_max")
+
+
+def _a_numpy(resultado):
+    return np.asarray(resultado, dtype="float64")
+
+
+def _lista(por):
+    return [por] if isinstance(por, str) else list(dict.fromkeys(por))
+
+
+def _tupla(valores):
+    return None if valores is None else tuple(valores)
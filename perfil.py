@@ -0,0 +1,136 @@
+"""
+perfil.py
+---------
+Tiempos por etapa de cada rerun del dashboard.
+
+`Cronometro` mide bloques con nombre (`with crono.etapa("filtro"):`); una
+etapa que se repite en el mismo rerun, como cada `st.plotly_chart`, acumula.
+`Historial` guarda los últimos reruns para dar percentiles móviles por etapa
+y `escribir_log` agrega cada rerun a un archivo JSON-lines, de modo que los
+tiempos de varias sesiones se pueden juntar después. `Perfilador` envuelve
+cProfile para capturar un rerun completo bajo demanda.
+
+No depende de Streamlit, así que también sirve en reporte.py o benchmarks.
+
+Variables de entorno:
+    DASHBOARD_PERF_LOG   archivo JSON-lines para los tiempos (def. sin log)
+"""
+
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+RUTA_LOG  = os.environ.get("DASHBOARD_PERF_LOG") or None
+HISTORIA  = 200
+PERCENTILES = (50, 90, 99)
+
+_LOCK_LOG = threading.Lock()
+
+
+class Cronometro:
+    """Segundos por etapa de un rerun, en el orden en que se midieron."""
+
+    def __init__(self):
+        self.tiempos = OrderedDict()
+        self._inicio = time.perf_counter()
+
+    @contextmanager
+    def etapa(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + time.perf_counter() - t0
+
+    def medir(self, nombre, funcion, *args, **kwargs):
+        """`funcion(*args, **kwargs)` medida como la etapa `nombre`."""
+        with self.etapa(nombre):
+            return funcion(*args, **kwargs)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self._inicio
+
+    def tabla(self):
+        """DataFrame etapa → segundos, más el total del rerun."""
+        tiempos = dict(self.tiempos, total=self.total)
+        return pd.DataFrame({"segundos": pd.Series(tiempos)}).rename_axis("etapa")
+
+    def registro(self, **extra):
+        """Dict listo para `escribir_log`: fecha, total, etapas y campos extra."""
+        return {
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **extra,
+            "total": round(self.total, 6),
+            "etapas": {k: round(v, 6) for k, v in self.tiempos.items()},
+        }
+
+
+class Historial:
+    """Tiempos de los últimos `maximo` reruns, para percentiles móviles."""
+
+    def __init__(self, maximo=HISTORIA):
+        self._reruns = deque(maxlen=maximo)
+        self._lock   = threading.Lock()
+
+    def __len__(self):
+        return len(self._reruns)
+
+    def agregar(self, cronometro):
+        with self._lock:
+            self._reruns.append(dict(cronometro.tiempos, total=cronometro.total))
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """DataFrame etapa × (n, p50, p90, p99) en segundos; etapas en orden de aparición."""
+        with self._lock:
+            reruns = list(self._reruns)
+        etapas = list(OrderedDict.fromkeys(k for r in reruns for k in r))
+        filas = {}
+        for etapa in etapas:
+            valores = np.array([r[etapa] for r in reruns if etapa in r])
+            filas[etapa] = {"n": len(valores),
+                            **{f"p{p}": np.percentile(valores, p) for p in percentiles}}
+        return pd.DataFrame.from_dict(filas, orient="index").rename_axis("etapa")
+
+
+def escribir_log(registro, ruta=None):
+    """Agrega `registro` como una línea JSON a `ruta` (def. DASHBOARD_PERF_LOG)."""
+    ruta = ruta or RUTA_LOG
+    if not ruta:
+        return
+    linea = json.dumps(registro, ensure_ascii=False) + "\n"
+    try:
+        with _LOCK_LOG, open(ruta, "a", encoding="utf-8") as f:
+            f.write(linea)
+    except OSError:
+        # Sin permisos o disco lleno: el log es opcional
+        pass
+
+
+class Perfilador:
+    """Captura cProfile de un bloque de código (p. ej. un rerun completo)."""
+
+    def __init__(self):
+        self._perfil = cProfile.Profile()
+
+    def iniciar(self):
+        self._perfil.enable()
+
+    def detener(self, lineas=40, orden="cumulative"):
+        """Detiene la captura; devuelve (resumen de texto, bytes .prof para snakeviz)."""
+        self._perfil.disable()
+        texto = io.StringIO()
+        pstats.Stats(self._perfil, stream=texto).strip_dirs().sort_stats(orden).print_stats(lineas)
+        # Mismo formato que Profile.dump_stats, sin pasar por un archivo
+        self._perfil.create_stats()
+        return texto.getvalue(), marshal.dumps(self._perfil.stats)
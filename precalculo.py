@@ -0,0 +1,52 @@
+"""
+precalculo.py
+-------------
+Cálculo en segundo plano de las vistas que no se están mostrando.
+
+Tras dibujar la vista activa, el dashboard programa aquí las figuras y
+estructuras de las otras vistas con los valores actuales de sus widgets;
+al cambiar de vista, lo normal es encontrarlas ya en el caché. Un solo hilo
+por proceso, para no competir con los reruns por la CPU.
+
+Cada sesión tiene su propia tanda: programar una nueva (p. ej. al cambiar un
+filtro) cancela las tareas de la anterior que aún no empezaron. Las tandas
+ya terminadas se descartan al programar otra, así las sesiones que se
+cerraron no se acumulan. Las tareas no deben llamar a Streamlit; sólo llenan
+cachés (FIGURAS, Dataset.memo).
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class Precalculo:
+    def __init__(self, max_hilos=1):
+        self._pool   = ThreadPoolExecutor(max_hilos, thread_name_prefix="precalculo")
+        self._tandas = {}
+        self._lock   = threading.Lock()
+
+    def programar(self, sesion, tareas):
+        """Reemplaza la tanda de `sesion` por `tareas` (lista de callables sin argumentos)."""
+        with self._lock:
+            for futuro in self._tandas.pop(sesion, []):
+                futuro.cancel()
+            self._tandas = {s: fs for s, fs in self._tandas.items() if not all(f.done() for f in fs)}
+            self._tandas[sesion] = [self._pool.submit(_correr, tarea) for tarea in tareas]
+
+    def pendientes(self, sesion):
+        with self._lock:
+            return sum(not f.done() for f in self._tandas.get(sesion, []))
+
+
+def _correr(tarea):
+    try:
+        tarea()
+    except Exception:
+        # Un precálculo fallido sólo significa que la vista se calculará al mostrarse
+        log.exception("Falló un precálculo")
+
+
+PRECALCULO = Precalculo()
@@ -0,0 +1,332 @@
+"""
+productos.py
+------------
+Nombres canónicos de Producto/Presentación.
+
+Un mismo producto llega escrito de varias formas ("GALLETAS SAVOIRDI 500" /
+"GALLETAS SAVOIARDI 500", "TOMATE ENTERO PELADO 2500" / "TOMATE ENTERO PELADO
+2.5 KG 2500") y cada variante parte los promedios por producto y la
+intersección de productos comunes entre años. Aquí cada nombre se asigna a un
+nombre canónico:
+
+- `firma`: mayúsculas sin acentos ni signos, y las cantidades aparte, con
+  las unidades pasadas a gramos/mililitros ("2.5 KG" = 2500). Dos nombres con
+  la misma firma son el mismo producto.
+- Si no, se comparan por similitud de texto (difflib) sólo contra nombres
+  con las mismas cantidades y el mismo prefijo en la primera o la última
+  palabra (índice de bloques), así no se compara cada par de nombres.
+
+El trabajo es sobre los nombres distintos, no sobre las filas: la
+asignación se guarda en una tabla SQLite, cada nombre se resuelve una sola
+vez y `TablaProductos.aplicar` sólo reasigna los códigos de la columna
+categórica. Un nombre ya asignado no cambia de canónico al llegar nombres
+nuevos; las correcciones a mano se hacen con `asignar`, y cada una sube la
+`version` de la tabla, que va en la clave de los datasets (ver `analisis`).
+
+Variables de entorno:
+    CONDENSADO_PRODUCTOS   tabla de nombres canónicos
+                           (def. <CONDENSADO_CACHE_DIR>/productos.sqlite; "0" desactiva)
+
+Uso:
+    python productos.py info
+    python productos.py asignar "GALLETAS SAVOIRDI 500" "GALLETAS SAVOIARDI 500"
+"""
+
+import argparse
+import difflib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from cache_condensado import CACHE_DIR
+
+_ruta = os.environ.get("CONDENSADO_PRODUCTOS", str(CACHE_DIR / "productos.sqlite"))
+RUTA_PRODUCTOS = None if _ruta in ("", "0") else _ruta
+
+COLUMNA = "Producto/Presentación"
+
+# Similitud mínima (difflib, 0–1) del texto sin cantidades para unir dos nombres
+UMBRAL = 0.94
+
+# Factor a gramos / mililitros
+UNIDADES = {
+    "KG": 1000, "KGS": 1000, "KILO": 1000, "KILOS": 1000,
+    "G": 1, "GR": 1, "GRS": 1, "GRAMOS": 1,
+    "L": 1000, "LT": 1000, "LTS": 1000, "LITRO": 1000, "LITROS": 1000,
+    "CL": 10, "ML": 1,
+}
+_CANTIDAD = re.compile(r"\b(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(UNIDADES, key=len, reverse=True)) + r")?\b")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS productos (
+    nombre   TEXT PRIMARY KEY,
+    canonico TEXT NOT NULL,
+    origen   TEXT NOT NULL
+);
+"""
+
+
+# ── Firma de un nombre ───────────────────────────────────────────────────────
+def normalizar(nombre):
+    """Mayúsculas, sin acentos ni signos, espacios simples ("2,5" → "2.5")."""
+    texto = unicodedata.normalize("NFKD", str(nombre))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).upper()
+    texto = re.sub(r"(\d),(\d)", r"\1.\2", texto)
+    texto = re.sub(r"[^0-9A-Z.]+", " ", texto)
+    texto = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", texto)
+    return " ".join(texto.split())
+
+
+def firma(nombre):
+    """(texto sin cantidades, cantidades en g/ml sin repetir y ordenadas)."""
+    texto = normalizar(nombre)
+    cantidades = set()
+
+    def extraer(m):
+        cantidades.add(float(m.group(1)) * UNIDADES.get(m.group(2), 1))
+        return " "
+
+    texto = " ".join(_CANTIDAD.sub(extraer, texto).split())
+    return texto, tuple(f"{c:g}" for c in sorted(cantidades))
+
+
+def _bloques(texto, cantidades):
+    palabras = texto.split() or [""]
+    return {(cantidades, "i", palabras[0][:3]), (cantidades, "f", palabras[-1][:3])}
+
+
+def _similitud(a, b):
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+# ── Agrupación ───────────────────────────────────────────────────────────────
+def agrupar(nuevos, canonicos=(), conteos=None, umbral=UMBRAL):
+    """Asigna cada nombre de `nuevos` a un canónico; devuelve {nombre: (canónico, origen)}.
+
+    Primero se busca entre los `canonicos` existentes (misma firma o el más
+    similar de su bloque). Los que no encuentran ninguno se agrupan entre sí
+    y el canónico de cada grupo es su variante con más filas (`conteos`).
+    """
+    conteos = conteos or {}
+    firmas  = {n: firma(n) for n in [*nuevos, *canonicos]}
+
+    por_firma, indice = {}, {}
+    for c in canonicos:
+        por_firma.setdefault(firmas[c], c)
+        for bloque in _bloques(*firmas[c]):
+            indice.setdefault(bloque, []).append(c)
+
+    asignados, pendientes = {}, []
+    for n in nuevos:
+        if firmas[n] in por_firma:
+            c = por_firma[firmas[n]]
+            asignados[n] = (c, "canonico" if c == n else "firma")
+            continue
+        texto = firmas[n][0]
+        candidatos = {c for b in _bloques(*firmas[n]) for c in indice.get(b, ())}
+        mejor = max(candidatos, key=lambda c: (_similitud(texto, firmas[c][0]), c), default=None)
+        if mejor is not None and _similitud(texto, firmas[mejor][0]) >= umbral:
+            asignados[n] = (mejor, "similar")
+        else:
+            pendientes.append(n)
+
+    # Grupos entre los nombres sin canónico (unión-búsqueda dentro de cada bloque)
+    padre = {n: n for n in pendientes}
+
+    def raiz(n):
+        while padre[n] != n:
+            padre[n] = padre[padre[n]]
+            n = padre[n]
+        return n
+
+    por_bloque = {}
+    for n in pendientes:
+        for bloque in _bloques(*firmas[n]):
+            por_bloque.setdefault(bloque, []).append(n)
+    for miembros in por_bloque.values():
+        for i, a in enumerate(miembros):
+            for b in miembros[i + 1:]:
+                if raiz(a) != raiz(b) and (
+                    firmas[a] == firmas[b] or _similitud(firmas[a][0], firmas[b][0]) >= umbral
+                ):
+                    padre[raiz(b)] = raiz(a)
+
+    grupos = {}
+    for n in pendientes:
+        grupos.setdefault(raiz(n), []).append(n)
+    for miembros in grupos.values():
+        canonico = max(sorted(miembros), key=lambda n: conteos.get(n, 0))
+        for n in miembros:
+            origen = ("canonico" if n == canonico
+                      else "firma" if firmas[n] == firmas[canonico] else "similar")
+            asignados[n] = (canonico, origen)
+    return asignados
+
+
+# ── Tabla persistente ────────────────────────────────────────────────────────
+class TablaProductos:
+    """Asignación nombre → canónico, guardada en SQLite (o sólo en memoria con ruta=None).
+
+    Como `almacen.Almacen`, cada operación abre su propia conexión; la
+    asignación se lee una vez y se completa con los nombres nuevos.
+    """
+
+    def __init__(self, ruta=RUTA_PRODUCTOS, umbral=UMBRAL):
+        self.ruta   = None if ruta is None else str(ruta)
+        self.umbral = umbral
+        self._mapa  = None
+        self._version = 0 if self.ruta is None else None
+        self._lock  = threading.Lock()
+        if self.ruta is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+            with closing(self._conectar()) as con, con:
+                con.executescript(_ESQUEMA)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def _cargar(self):
+        if self._mapa is None:
+            self._mapa = {}
+            if self.ruta is not None:
+                with closing(self._conectar()) as con:
+                    self._mapa = dict(con.execute("SELECT nombre, canonico FROM productos"))
+        return self._mapa
+
+    def version(self):
+        """Número de correcciones a mano; cambia sólo cuando un nombre ya asignado cambia de canónico.
+
+        Con SQLite se lee del archivo (`PRAGMA user_version`), así se ven las
+        correcciones de otro proceso (p. ej. `python productos.py asignar`);
+        si cambió, la asignación en memoria se vuelve a leer.
+        """
+        if self.ruta is None:
+            return self._version
+        with closing(self._conectar()) as con:
+            (version,) = con.execute("PRAGMA user_version").fetchone()
+        with self._lock:
+            if version != self._version:
+                self._mapa, self._version = None, version
+        return version
+
+    # ── Asignación ───────────────────────────────────────────────────────────
+    def mapear(self, nombres, conteos=None):
+        """{nombre: canónico} para `nombres`; los que no estaban se asignan y se guardan."""
+        with self._lock:
+            mapa = self._cargar()
+            nuevos = [n for n in dict.fromkeys(nombres) if n not in mapa]
+            if nuevos:
+                canonicos = sorted(set(mapa.values()))
+                asignados = agrupar(nuevos, canonicos, conteos, self.umbral)
+                mapa.update(self._guardar(asignados))
+            return {n: mapa[n] for n in nombres}
+
+    def _guardar(self, asignados):
+        if self.ruta is None:
+            return {n: c for n, (c, _) in asignados.items()}
+        # Si otro proceso ya asignó alguno, gana lo que está en la tabla
+        with closing(self._conectar()) as con, con:
+            con.executemany(
+                "INSERT OR IGNORE INTO productos (nombre, canonico, origen) VALUES (?, ?, ?)",
+                [(n, c, o) for n, (c, o) in asignados.items()],
+            )
+            nombres = list(asignados)
+            guardados = {}
+            for inicio in range(0, len(nombres), 500):
+                lote = nombres[inicio:inicio + 500]
+                guardados.update(con.execute(
+                    f"SELECT nombre, canonico FROM productos WHERE nombre IN ({', '.join('?' * len(lote))})",
+                    lote,
+                ))
+        return guardados
+
+    def asignar(self, nombre, canonico):
+        """Corrección a mano: `nombre` (y lo que apuntaba a él) pasa a `canonico`."""
+        with self._lock:
+            mapa = self._cargar()
+            canonico = mapa.get(canonico, canonico)
+            cambios = [n for n, c in mapa.items() if c == nombre] + [nombre, canonico]
+            for n in cambios:
+                mapa[n] = canonico
+            if self.ruta is None:
+                self._version += 1
+                return
+            with closing(self._conectar()) as con, con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO productos (nombre, canonico, origen) VALUES (?, ?, ?)",
+                    [(n, canonico, "canonico" if n == canonico else "manual") for n in dict.fromkeys(cambios)],
+                )
+                # Dentro de la misma transacción de escritura: dos asignar no leen la misma versión
+                (version,) = con.execute("PRAGMA user_version").fetchone()
+                con.execute(f"PRAGMA user_version = {version + 1}")
+            if self._version == version:
+                # Al día con el archivo: la asignación en memoria ya tiene el cambio
+                self._version = version + 1
+
+    def grupos(self):
+        """Canónicos con más de una variante: DataFrame canonico, nombre, origen."""
+        if self.ruta is None:
+            mapa = self._cargar()
+            tabla = pd.DataFrame({"canonico": list(mapa.values()), "nombre": list(mapa), "origen": None})
+        else:
+            with closing(self._conectar()) as con:
+                tabla = pd.read_sql_query("SELECT canonico, nombre, origen FROM productos", con)
+        variantes = tabla.groupby("canonico")["nombre"].transform("size")
+        return tabla[variantes > 1].sort_values(["canonico", "nombre"], ignore_index=True)
+
+    # ── Aplicación ───────────────────────────────────────────────────────────
+    def aplicar(self, df, columna=COLUMNA):
+        """`df` con `columna` (categórica) reasignada a los nombres canónicos.
+
+        Sólo se procesan las categorías; las filas cambian de código con un
+        `take` vectorizado. Devuelve el mismo `df` si no hay nada que unir.
+        """
+        if columna not in df.columns:
+            return df
+        serie = df[columna]
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype("category")
+        categorias = serie.cat.categories
+        codigos = serie.cat.codes.to_numpy()
+        conteos = np.bincount(codigos[codigos >= 0], minlength=len(categorias))
+        mapa = self.mapear(list(categorias), dict(zip(categorias, conteos.tolist())))
+
+        nuevas = pd.Index([mapa[c] for c in categorias])
+        if nuevas.equals(categorias):
+            return df
+        canonicas = pd.Index(sorted(set(nuevas)))
+        recodigo  = canonicas.get_indexer(nuevas)
+        df = df.copy(deep=False)
+        df[columna] = pd.Categorical.from_codes(np.where(codigos >= 0, recodigo[codigos], -1), canonicas)
+        return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("--tabla", default=RUTA_PRODUCTOS, help="archivo SQLite de la tabla")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("info", help="lista los productos con más de una variante")
+    asignar = sub.add_parser("asignar", help="asigna un nombre a otro canónico")
+    asignar.add_argument("nombre")
+    asignar.add_argument("canonico")
+    args = parser.parse_args(argv)
+
+    if args.tabla is None:
+        parser.error("no hay tabla: define CONDENSADO_PRODUCTOS o usa --tabla")
+    tabla = TablaProductos(args.tabla)
+    if args.comando == "asignar":
+        tabla.asignar(args.nombre, args.canonico)
+        print(f"{args.nombre} → {tabla.mapear([args.nombre])[args.nombre]}")
+    else:
+        grupos = tabla.grupos()
+        print(grupos.to_string(index=False) if len(grupos) else "No hay productos con variantes.")
+
+
+if __name__ == "__main__":
+    main()
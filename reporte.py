@@ -0,0 +1,365 @@
+"""
+reporte.py
+----------
+Reporte estático con todas las vistas del dashboard, sin navegador.
+
+Genera en el directorio de salida:
+    index.html           índice con enlaces a cada sección
+    costos.html          cada costo por producto / año / mes + todos los costos
+    matriz_años.html     variación % entre todos los pares de años y productos × años, por costo
+    comparacion_A_B.html un par de años (Tab 2): resumen, gráfico y cada costo por producto
+    tipo_cambio.html     tipo de cambio por mes, año y día + estadísticas por año
+    productos.html       todos los costos por año, un gráfico por producto
+    plotly.min.js        Plotly, una sola copia compartida (funciona sin conexión)
+    resumen.xlsx         las tablas resumen
+
+Los Condensados se combinan una vez en el proceso principal y se publican
+como dataset compartido (`compartido.py`); cada proceso del pool abre ese
+mismo archivo con memory map, sin copiarlo, y las figuras se construyen y
+serializan a HTML en paralelo.
+
+Los nombres de producto pasan a su forma canónica con la misma tabla que el
+dashboard (`productos.py`, CONDENSADO_PRODUCTOS), así el reporte agrupa los
+productos igual que él; `--productos` elige otra tabla.
+
+Uso:
+    python reporte.py Condensado_2024.xlsx Condensado_2025.xlsx -o reporte/
+    python reporte.py Condensado.xlsx --años 2024 2025 --procesos 8
+"""
+
+import argparse
+import html
+import itertools
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+import analisis
+from graficos import (
+    figura_comparacion, figura_costos, figura_matriz_deltas, figura_matriz_productos,
+    figura_productos, figura_tipo_cambio, figura_todos,
+)
+from productos import RUTA_PRODUCTOS, TablaProductos
+
+# Puntos por serie en la vista diaria de tipo de cambio (como "Resolución (px)")
+PUNTOS_DIA = 1200
+
+PLANTILLA = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+<script src="plotly.min.js"></script>
+<style>
+    body {{ font-family: 'DM Sans', sans-serif; color: #1e293b; margin: 24px 40px; }}
+    h1 {{ font-weight: 800; letter-spacing: -1px; color: #0f172a; }}
+    h2 {{ font-weight: 600; font-size: 1.1rem; border-left: 4px solid #3b82f6;
+          padding-left: 12px; margin: 32px 0 12px 0; }}
+    nav a {{ margin-right: 16px; }}
+    table {{ border-collapse: collapse; font-size: 0.85rem; }}
+    th, td {{ border-bottom: 1px solid #e2e8f0; padding: 4px 10px; text-align: right; }}
+    th:first-child, td:first-child {{ text-align: left; }}
+    .nota {{ color: #64748b; }}
+</style>
+</head>
+<body>
+<nav><a href="index.html">Índice</a></nav>
+<h1>{titulo}</h1>
+{contenido}
+</body>
+</html>
+"""
+
+
+# ── Vistas ───────────────────────────────────────────────────────────────────
+def vistas(datos, años):
+    """Lista de (página, vista); cada vista es una figura independiente."""
+    costos  = datos.costos
+    tcs     = datos.tipos_cambio
+    lista   = []
+    for costo in costos:
+        for agrupar_por in analisis.AGRUPACIONES:
+            lista.append(("costos", ("costos", costo, agrupar_por)))
+    lista.append(("costos", ("todos",)))
+
+    if len(años) >= 2:
+        for costo in costos:
+            lista.append(("matriz_años", ("matriz_años", costo)))
+            lista.append(("matriz_años", ("matriz_productos", costo)))
+
+    for año_a, año_b in itertools.combinations(años, 2):
+        pagina = f"comparacion_{año_a}_{año_b}"
+        lista.append((pagina, ("comparacion", año_a, año_b)))
+        for costo in costos:
+            lista.append((pagina, ("productos", año_a, año_b, costo)))
+
+    if tcs:
+        for grp_col in ["Mes", "Año", "Fecha"]:
+            lista.append(("tipo_cambio", ("tipo_cambio", grp_col)))
+
+    for producto in datos.productos():
+        lista.append(("productos", ("producto", producto)))
+    return lista
+
+
+def construir(filtro, vista, tipo_grafico="Barras"):
+    """Figura de `vista` (None si no hay nada que graficar)."""
+    datos = filtro.datos
+    tipo  = vista[0]
+    if tipo == "costos":
+        _, costo, agrupar_por = vista
+        return figura_costos(filtro.promedio_por(costo, agrupar_por), costo, agrupar_por, tipo_grafico)
+    if tipo == "todos":
+        return figura_todos(filtro.promedio_anual(datos.costos), datos.costos)
+    if tipo == "comparacion":
+        _, año_a, año_b = vista
+        comparacion = filtro.comparar_años(año_a, año_b, datos.costos)
+        return figura_comparacion(datos.costos, comparacion["media_a"], comparacion["media_b"],
+                                  comparacion["delta"], año_a, año_b)
+    if tipo == "matriz_años":
+        _, costo = vista
+        return figura_matriz_deltas(filtro.matriz_años.tabla(costo), costo)
+    if tipo == "matriz_productos":
+        _, costo = vista
+        return figura_matriz_productos(filtro.matriz_productos(costo), costo)
+    if tipo == "productos":
+        _, año_a, año_b, costo = vista
+        fig = figura_productos(*filtro.comparar_productos(año_a, año_b, costo), año_a, año_b)
+        if fig is not None:
+            fig.update_layout(title=dict(text=f"<b>{costo}</b> por producto"))
+        return fig
+    if tipo == "tipo_cambio":
+        _, grp_col = vista
+        if grp_col == "Fecha":
+            grp = filtro.serie_diaria(datos.tipos_cambio)
+            return figura_tipo_cambio(grp, "Fecha", datos.tipos_cambio, "Línea", max_puntos=PUNTOS_DIA)
+        grp = filtro.promedio_periodo(datos.tipos_cambio, grp_col)
+        return figura_tipo_cambio(grp, grp_col, datos.tipos_cambio, "Línea")
+    if tipo == "producto":
+        _, producto = vista
+        por_producto = filtro.medias_producto
+        del_producto = por_producto[por_producto.index.get_level_values(0) == producto]
+        if del_producto.empty:
+            return None
+        fig = figura_todos(del_producto.droplevel(0).reset_index(), datos.costos)
+        fig.update_layout(title=dict(text=f"<b>{html.escape(str(producto))}</b> — todos los costos por año"))
+        return fig
+    raise ValueError(f"Vista desconocida: {tipo}")
+
+
+# ── Pool de procesos ─────────────────────────────────────────────────────────
+_ADJUNTO      = None
+_FILTRO       = None
+_TIPO_GRAFICO = "Barras"
+
+
+def _tabla_productos(ruta):
+    return None if ruta is None else TablaProductos(ruta)
+
+
+def _iniciar(archivos, directorio, claves, productos, exportadores, años, tipo_grafico):
+    global _ADJUNTO, _FILTRO, _TIPO_GRAFICO
+    # El proceso principal ya publicó el dataset compartido: se abre el mismo
+    # archivo (memory map). Si no pudo escribirse, se combina desde el caché
+    # de snapshots, sin pool anidado.
+    _ADJUNTO = analisis.adjuntar(archivos, directorio, max_procesos=1, productos=_tabla_productos(productos),
+                                 claves=claves)
+    datos = analisis.Dataset.desde_adjunto(_ADJUNTO)
+    _FILTRO       = datos.filtrar(exportadores=exportadores, años=años)
+    _TIPO_GRAFICO = tipo_grafico
+
+
+def _renderizar(vista):
+    fig = construir(_FILTRO, vista, _TIPO_GRAFICO)
+    if fig is None:
+        return None
+    return pio.to_html(fig, full_html=False, include_plotlyjs=False)
+
+
+def renderizar(archivos, lista, directorio=None, exportadores=None, años=None,
+               tipo_grafico="Barras", max_procesos=None, claves=None, productos=None):
+    """HTML de cada (página, vista) de `lista`, en el mismo orden.
+
+    `productos` es la ruta de la tabla de nombres canónicos (None: sin unir).
+    """
+    lista = [vista for _, vista in lista]
+    args  = (archivos, directorio, claves, productos, exportadores, años, tipo_grafico)
+    procesos = min(len(lista), max_procesos or os.cpu_count() or 1)
+    if procesos <= 1:
+        _iniciar(*args)
+        try:
+            return [_renderizar(v) for v in lista]
+        finally:
+            _ADJUNTO.soltar()
+    # spawn, como en cache_condensado: mismo comportamiento en Linux y macOS
+    with ProcessPoolExecutor(procesos, mp_context=mp.get_context("spawn"),
+                             initializer=_iniciar, initargs=args) as pool:
+        return list(pool.map(_renderizar, lista, chunksize=max(1, len(lista) // (4 * procesos))))
+
+
+# ── Tablas resumen ───────────────────────────────────────────────────────────
+def tablas(filtro, años):
+    """{nombre de hoja: DataFrame} con las tablas del reporte."""
+    datos  = filtro.datos
+    costos = datos.costos
+    resumen = filtro.resumen()
+    hojas = {
+        "Resumen": pd.DataFrame({
+            "Indicador": ["Registros totales", "Productos únicos",
+                          "Precio compra EUR (prom)", "Costo importación (prom)"],
+            "Valor": [resumen["registros"], resumen["productos"],
+                      resumen["precio_eur"], resumen["costo_importacion"]],
+        }),
+        "Costos por año":      filtro.promedio_anual(costos),
+        "Costos por mes":      filtro.promedio_periodo(costos, "Mes"),
+        "Costos por producto": filtro.medias_producto.reset_index(),
+    }
+
+    pares = []
+    for año_a, año_b in itertools.combinations(años, 2):
+        pares.append(tabla_comparacion(filtro, año_a, año_b)
+                     .rename(columns={f"Prom {año_a}": "Prom base", f"Prom {año_b}": "Prom comparar"})
+                     .assign(**{"Año base": año_a, "Año comparar": año_b}))
+    if pares:
+        hojas["Comparación años"] = pd.concat(pares, ignore_index=True)[
+            ["Año base", "Año comparar", "Costo", "Prom base", "Prom comparar", "Δ %"]
+        ]
+
+    if datos.tipos_cambio:
+        hojas["Tipo de cambio"] = estadisticas_tc(filtro).reset_index()
+    return hojas
+
+
+def tabla_comparacion(filtro, año_a, año_b):
+    """Tabla resumen de la Tab 2 para un par de años."""
+    comparacion = filtro.comparar_años(año_a, año_b)
+    return pd.DataFrame({
+        "Costo":         comparacion.index,
+        f"Prom {año_a}": comparacion["media_a"].values,
+        f"Prom {año_b}": comparacion["media_b"].values,
+        "Δ %":           comparacion["delta"].values,
+    })
+
+
+def estadisticas_tc(filtro):
+    stats = filtro.estadisticas(filtro.datos.tipos_cambio).round(4)
+    stats.columns = [f"{col[0]} ({col[1]})" for col in stats.columns]
+    return stats
+
+
+def guardar_xlsx(hojas, ruta):
+    with pd.ExcelWriter(ruta, engine="openpyxl") as writer:
+        for nombre, tabla in hojas.items():
+            tabla.to_excel(writer, sheet_name=nombre[:31], index=False)
+
+
+# ── HTML ─────────────────────────────────────────────────────────────────────
+def _tabla_html(df, index=False):
+    return df.to_html(index=index, border=0, float_format=lambda v: f"{v:,.4f}", na_rep="—")
+
+
+def escribir_html(salida, lista, fragmentos, filtro, años, resumen):
+    """Arma las páginas y devuelve sus nombres en orden."""
+    paginas = {}
+    for (pagina, _), fragmento in zip(lista, fragmentos):
+        paginas.setdefault(pagina, []).append(fragmento)
+
+    titulos = {"costos": "Costos por producto, año y mes",
+               "matriz_años": "Variación entre todos los pares de años",
+               "tipo_cambio": "Tipo de cambio",
+               "productos": "Todos los costos por producto"}
+    for año_a, año_b in itertools.combinations(años, 2):
+        titulos[f"comparacion_{año_a}_{año_b}"] = f"Comparación {año_a} vs {año_b}"
+
+    for pagina, partes in paginas.items():
+        figuras = [p for p in partes if p is not None]
+        contenido = []
+        if pagina.startswith("comparacion_"):
+            año_a, año_b = (int(a) for a in pagina.split("_")[1:])
+            contenido += ["<h2>Resumen</h2>", _tabla_html(tabla_comparacion(filtro, año_a, año_b))]
+            contenido += ["<h2>Gráfico comparativo por costo</h2>", figuras[0],
+                          "<h2>Variación por producto</h2>"]
+            figuras = figuras[1:]
+            if not figuras:
+                contenido.append('<p class="nota">No hay productos comunes entre los dos años.</p>')
+        elif pagina == "tipo_cambio":
+            contenido += ["<h2>Estadísticas por año</h2>", _tabla_html(estadisticas_tc(filtro), index=True),
+                          "<h2>Evolución</h2>"]
+        contenido += figuras
+        (salida / f"{pagina}.html").write_text(
+            PLANTILLA.format(titulo=titulos[pagina], contenido="\n".join(contenido)), encoding="utf-8",
+        )
+
+    enlaces = "\n".join(
+        f'<li><a href="{p}.html">{html.escape(titulos[p])}</a></li>' for p in paginas
+    )
+    (salida / "index.html").write_text(PLANTILLA.format(
+        titulo="Análisis de Costos de Importación",
+        contenido=f"{_tabla_html(resumen)}\n<ul>\n{enlaces}\n</ul>\n"
+                  '<p class="nota">Tablas resumen en <a href="resumen.xlsx">resumen.xlsx</a>.</p>',
+    ), encoding="utf-8")
+    (salida / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+    return list(paginas)
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+def generar(archivos, salida, años=None, exportadores=None, tipo_grafico="Barras",
+            directorio=None, max_procesos=None, productos=RUTA_PRODUCTOS):
+    """Genera el reporte completo en `salida` (ver docstring del módulo).
+
+    `productos` es la ruta de la tabla de nombres canónicos (None: sin unir).
+    """
+    salida = Path(salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    archivos = [str(a) for a in archivos]
+
+    # Un solo dataset compartido (memory map) para este proceso y los del pool
+    adjunto = analisis.adjuntar(archivos, directorio, max_procesos, productos=_tabla_productos(productos))
+    try:
+        datos  = analisis.Dataset.desde_adjunto(adjunto)
+        años   = sorted(años) if años else datos.años()
+        filtro = datos.filtrar(exportadores=exportadores, años=años)
+        if filtro.vacio:
+            raise SystemExit("No hay datos con los filtros seleccionados.")
+
+        lista = vistas(datos, años)
+        fragmentos = renderizar(archivos, lista, directorio, exportadores, años, tipo_grafico,
+                                max_procesos, adjunto.clave, productos)
+        hojas   = tablas(filtro, años)
+        paginas = escribir_html(salida, lista, fragmentos, filtro, años, hojas["Resumen"])
+        guardar_xlsx(hojas, salida / "resumen.xlsx")
+    finally:
+        adjunto.soltar()
+    return paginas, sum(f is not None for f in fragmentos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("archivos", nargs="+", help="Condensados (.xlsx)")
+    parser.add_argument("-o", "--salida", default="reporte", help="directorio de salida (def. reporte/)")
+    parser.add_argument("--años", nargs="+", type=int, help="años a incluir (def. todos)")
+    parser.add_argument("--exportadores", nargs="+", help="exportadores a incluir (def. todos)")
+    parser.add_argument("--tipo-grafico", default="Barras", choices=["Barras", "Línea", "Barras + Línea"])
+    parser.add_argument("--procesos", type=int, help="procesos del pool (def. núm. de CPUs)")
+    parser.add_argument("--productos", default=RUTA_PRODUCTOS,
+                        help="tabla SQLite de nombres canónicos (def. CONDENSADO_PRODUCTOS; \"0\" no une)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    paginas, n_figuras = generar(
+        args.archivos, args.salida, args.años, args.exportadores,
+        args.tipo_grafico, max_procesos=args.procesos,
+        productos=None if args.productos in (None, "", "0") else args.productos,
+    )
+    print(f"{n_figuras} figuras en {len(paginas)} páginas → {args.salida}/ "
+          f"({time.perf_counter() - t0:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
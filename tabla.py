@@ -0,0 +1,48 @@
+"""
+tabla.py
+--------
+Tabla detallada paginada: ordena y formatea sólo la página visible.
+
+El orden por columna se precalcula una vez por dataset (permutación completa
+de filas, perezosa por columna y sentido). Ordenar un subconjunto de filas es
+entonces recorrer esa permutación quedándose con las seleccionadas, O(n) sin
+comparaciones, en lugar de un sort por rerun.
+"""
+
+import math
+
+import numpy as np
+
+TAMAÑOS_PAGINA = [50, 100, 250, 500, 1000]
+
+
+class TablaPaginada:
+    def __init__(self, df):
+        self.df = df
+        self._permutaciones = {}
+
+    def ordenar(self, filas, columna=None, ascendente=True):
+        """Posiciones de `filas` en el orden pedido (vacíos al final)."""
+        if columna is None:
+            return filas
+        orden = self._permutacion(columna, ascendente)
+        seleccion = np.zeros(len(self.df), dtype=bool)
+        seleccion[filas] = True
+        return orden[seleccion[orden]]
+
+    def pagina(self, filas, numero, tamaño):
+        """DataFrame de la página `numero` (desde 1) de `filas`."""
+        inicio = (numero - 1) * tamaño
+        return self.df.take(filas[inicio:inicio + tamaño])
+
+    @staticmethod
+    def n_paginas(total, tamaño):
+        return max(1, math.ceil(total / tamaño))
+
+    def _permutacion(self, columna, ascendente):
+        clave = (columna, ascendente)
+        if clave not in self._permutaciones:
+            serie = self.df[columna].reset_index(drop=True)
+            orden = serie.sort_values(ascending=ascendente, kind="stable", na_position="last")
+            self._permutaciones[clave] = orden.index.to_numpy()
+        return self._permutaciones[clave]
@@ -0,0 +1,40 @@
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+import pytest
+
+from almacen import Almacen
+from ingesta import leer_excel
+
+CONDENSADO = Path(__file__).resolve().parent.parent / "Condensado_outputxxx.xlsx"
+
+
+@pytest.fixture(scope="module")
+def df():
+    return leer_excel(CONDENSADO)
+
+
+def test_ingresos_concurrentes_no_duplican_renglones(tmp_path, df):
+    # Varios hilos agregan el mismo Condensado bajo claves distintas a la vez:
+    # sólo el primero en escribir inserta renglones
+    ruta = tmp_path / "historial.sqlite"
+    almacenes = [Almacen(ruta) for _ in range(6)]
+    barrera = threading.Barrier(len(almacenes))
+    nuevas = []
+
+    def agregar(i, almacen):
+        barrera.wait()
+        nuevas.append(almacen.agregar(f"archivo-{i}", df))
+
+    hilos = [threading.Thread(target=agregar, args=(i, a)) for i, a in enumerate(almacenes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    with closing(sqlite3.connect(ruta)) as con:
+        (filas,) = con.execute("SELECT COUNT(*) FROM filas").fetchone()
+    assert sorted(nuevas) == [0] * (len(almacenes) - 1) + [len(df)]
+    assert filas == len(df)
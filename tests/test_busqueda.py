@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from indices import IndiceTexto
+from ingesta import compactar, leer_excel
+
+CONDENSADO = Path(__file__).resolve().parent.parent / "Condensado_outputxxx.xlsx"
+
+
+@pytest.fixture(scope="module")
+def df():
+    return compactar(leer_excel(CONDENSADO))
+
+
+@pytest.fixture(scope="module")
+def indice(df):
+    return IndiceTexto(df)
+
+
+def contiene(df, consulta):
+    """Filas con `consulta` en el texto de alguna celda, como lo hace pandas."""
+    textos = df.astype(str)
+    mascara = np.zeros(len(df), dtype=bool)
+    for columna in textos.columns:
+        mascara |= textos[columna].str.contains(consulta, case=False, regex=False).to_numpy()
+    return set(np.flatnonzero(mascara))
+
+
+@pytest.mark.parametrize("consulta", ["3459", "2024", "0.5", "nan", "champi", "ño", "galletas", "12"])
+def test_busqueda_incluye_coincidencias_de_pandas(df, indice, consulta):
+    esperado = contiene(df, consulta)
+    assert esperado
+    assert esperado <= set(indice.buscar(consulta))
+
+
+def test_fragmento_numerico_dentro_de_un_valor(indice):
+    assert len(indice.buscar("3459")) == 5
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import analisis
+import cache_condensado
+from compartido import Registro
+from productos import TablaProductos
+
+CONDENSADO = Path(__file__).resolve().parent.parent / "Condensado_outputxxx.xlsx"
+
+
+@pytest.fixture(scope="module")
+def archivos(tmp_path_factory):
+    # El Condensado partido en dos archivos, como dos meses subidos por separado
+    crudo = pd.read_excel(CONDENSADO)
+    directorio = tmp_path_factory.mktemp("condensados")
+    rutas = [str(directorio / "a.xlsx"), str(directorio / "b.xlsx")]
+    crudo.iloc[:200].to_excel(rutas[0], index=False)
+    crudo.iloc[200:].to_excel(rutas[1], index=False)
+    return rutas
+
+
+@pytest.mark.parametrize("con_productos", [False, True])
+def test_snapshot_nuevo_parte_del_anterior(tmp_path, archivos, monkeypatch, con_productos):
+    registro  = Registro(tmp_path / "compartido")
+    productos = TablaProductos(None) if con_productos else None
+    cargar    = cache_condensado.cargar_claves
+    leidas    = []
+
+    def cargar_claves(claves, *args, **kwargs):
+        leidas.append(list(claves))
+        return cargar(claves, *args, **kwargs)
+
+    monkeypatch.setattr(cache_condensado, "cargar_claves", cargar_claves)
+    primero = analisis.adjuntar(archivos[:1], tmp_path / "cache", productos=productos, registro=registro)
+    ambos   = analisis.adjuntar(archivos, tmp_path / "cache", productos=productos, registro=registro)
+
+    # El segundo snapshot sólo leyó el archivo nuevo
+    assert [len(claves) for claves in leidas] == [1, 1]
+    esperado = analisis.cargar(archivos, tmp_path / "cache", productos=productos).df
+    pd.testing.assert_frame_equal(ambos.df, esperado, check_categorical=False)
+    primero.soltar()
+    ambos.soltar()
@@ -0,0 +1,18 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from ingesta import compactar, concatenar_compactos, leer_excel
+
+CONDENSADO = Path(__file__).resolve().parent.parent / "Condensado_outputxxx.xlsx"
+
+
+@pytest.mark.parametrize("float32", [False, True])
+def test_concatenar_compactos_igual_a_recompactar(float32):
+    df = leer_excel(CONDENSADO)
+    a, b = df.iloc[:200].reset_index(drop=True), df.iloc[200:].reset_index(drop=True)
+
+    unido = concatenar_compactos(compactar(a, float32), compactar(b, float32))
+
+    pd.testing.assert_frame_equal(unido, compactar(pd.concat([a, b], ignore_index=True), float32))
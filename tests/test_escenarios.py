@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from escenarios import ANA_DIS, FLETE, IGI, IMPORTACION, PASTA_MIA, PIEZA, Escenarios
+
+
+@pytest.fixture
+def fila():
+    # IGI al 0.8 % sobre costo pieza + flete: 0.008 × (10 + 2) = 0.096
+    return pd.DataFrame({
+        PIEZA:       [10.0],
+        FLETE:       [2.0],
+        IGI:         [0.096],
+        IMPORTACION: [1.106],
+        ANA_DIS:     [13.106],
+        PASTA_MIA:   [14.4166],
+    })
+
+
+def test_fila_recalculada_a_mano(fila):
+    # Tipo de cambio +10 %: costo pieza 11, IGI 0.008 × (11 + 2) = 0.104
+    esperado = {
+        PIEZA:       11.0,
+        IGI:         0.104,
+        IMPORTACION: 1.106 + 0.008,
+        ANA_DIS:     13.106 + 1.0 + 0.008,
+        PASTA_MIA:   14.4166 / 13.106 * (13.106 + 1.008),
+    }
+    escenarios = Escenarios(fila)
+    for columna, valor in esperado.items():
+        assert escenarios.por_fila(columna, [1.1])[0, 0] == pytest.approx(valor)
+
+    rejilla = escenarios.rejilla((10.0,))
+    assert rejilla.loc[10.0].to_dict() == pytest.approx(esperado)
+
+
+def test_sin_flete_el_igi_sigue_al_costo_pieza(fila):
+    escenarios = Escenarios(fila.drop(columns=FLETE))
+    assert escenarios.por_fila(IGI, [1.1])[0, 0] == pytest.approx(0.096 * 1.1)
+
+
+def test_sin_cambio_da_los_promedios():
+    df = pd.DataFrame({
+        PIEZA: [10.0, 20.0, np.nan],
+        FLETE: [2.0, np.nan, 1.0],
+        IGI:   [0.096, 0.16, 0.2],
+    })
+    rejilla = Escenarios(df).rejilla((0.0,))
+    assert rejilla.loc[0.0].to_dict() == pytest.approx(df.mean().drop(FLETE).to_dict())
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import pytest
+
+import analisis
+from almacen import Almacen
+from ingesta import compactar, leer_excel
+from motor_sql import comparar
+from productos import TablaProductos
+
+CONDENSADO = Path(__file__).resolve().parent.parent / "Condensado_outputxxx.xlsx"
+
+
+@pytest.fixture(scope="module")
+def almacen(tmp_path_factory):
+    almacen = Almacen(tmp_path_factory.mktemp("almacen") / "historial.sqlite")
+    almacen.agregar("condensado", compactar(leer_excel(CONDENSADO)))
+    return almacen
+
+
+def test_sqlite_igual_a_memoria_con_nombres_canonicos(almacen):
+    productos = TablaProductos(None)
+    memoria = analisis.Dataset.desde_almacen(almacen, motor="memoria", productos=productos)
+    sqlite  = analisis.Dataset.desde_almacen(almacen, motor="sqlite", productos=productos)
+
+    assert sqlite.cubo.n_productos() == memoria.cubo.n_productos()
+    assert (comparar(memoria, sqlite.cubo) <= 1e-9).all()
+
+
+def test_sqlite_une_las_variantes_de_producto(almacen):
+    canonico = analisis.Dataset.desde_almacen(almacen, motor="sqlite", productos=TablaProductos(None))
+    crudo    = analisis.Dataset.desde_almacen(almacen, motor="sqlite")
+
+    assert canonico.cubo.n_productos() < crudo.cubo.n_productos()
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import analisis
+from productos import TablaProductos
+
+CONDENSADO = Path(__file__).resolve().parent.parent / "Condensado_outputxxx.xlsx"
+
+
+def test_asignar_cambia_la_clave_y_los_nombres(tmp_path):
+    # Otra instancia sobre el mismo archivo hace de `python productos.py asignar`
+    productos = TablaProductos(tmp_path / "productos.sqlite")
+    antes = analisis.cargar([str(CONDENSADO)], directorio=tmp_path / "cache", productos=productos)
+    nombre, canonico = antes.productos()[:2]
+
+    TablaProductos(tmp_path / "productos.sqlite").asignar(nombre, canonico)
+
+    clave = analisis.clave_dataset(antes.clave[:-1], productos)
+    assert clave != antes.clave
+    despues = analisis.cargar([str(CONDENSADO)], directorio=tmp_path / "cache", productos=productos)
+    assert despues.clave == clave
+    assert nombre not in despues.productos()
+    assert len(despues.productos()) == len(antes.productos()) - 1
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ventanas
+from ventanas import DOLAR, FACTORAJE, TC, CacheRodantes, diferenciales
+
+
+@pytest.fixture
+def serie():
+    rng = np.random.default_rng(0)
+    n = 300
+    return diferenciales(pd.DataFrame({
+        "Fecha":   pd.bdate_range("2024-01-01", periods=n),
+        TC:        20 * np.exp(np.cumsum(rng.normal(0, 0.005, n))),
+        DOLAR:     18 * np.exp(np.cumsum(rng.normal(0, 0.004, n))),
+        FACTORAJE: 1.1 + rng.normal(0, 0.001, n),
+    }))
+
+
+def test_datos_nuevos_extienden_el_estado_de_los_anteriores(serie, monkeypatch):
+    completo = CacheRodantes().obtener("otros", "seleccion", 20, serie)
+    cache = CacheRodantes()
+    antes = cache.obtener("datos_a", "seleccion", 20, serie.iloc[:250])
+
+    filas = []
+    rodar = ventanas.rodar
+    monkeypatch.setattr(ventanas, "rodar", lambda x, *a: filas.append(len(x)) or rodar(x, *a))
+    despues = cache.obtener("datos_b", "seleccion", 20, serie)
+
+    # Sólo las 50 fechas nuevas más la cola de la ventana
+    assert filas == [50 + 21]
+    pd.testing.assert_frame_equal(despues, completo, rtol=1e-9)
+    # El estado de los datos anteriores no cambió y sigue en el caché
+    pd.testing.assert_frame_equal(cache.obtener("datos_a", "seleccion", 20, serie.iloc[:250]), antes)
+    assert filas == [50 + 21]
@@ -0,0 +1,186 @@
+"""
+ventanas.py
+-----------
+Promedios y volatilidad móviles del tipo de cambio, con estado incremental.
+
+Sobre la serie diaria (un promedio por fecha con registro) de TIPO DE CAMBIO,
+DÓLAR (DOF) y FACTORAJE (DOF), más sus diferenciales:
+
+    TC − DÓLAR (DOF)      pesos entre el tipo de cambio EUR y el dólar DOF
+    TC vs DOF (%)         TIPO DE CAMBIO / (FACTORAJE × DÓLAR) − 1, en %
+
+se calcula para una ventana de w fechas la media móvil y la volatilidad
+(desviación estándar móvil de los cambios: logarítmicos en % para los tipos
+de cambio, diferencias simples para los diferenciales). Todas las columnas
+van juntas en una matriz fechas × columnas y cada ventana es una resta de
+sumas acumuladas, sin ciclos por variable.
+
+`RODANTES` guarda, por datos, selección de filtros y tamaño de ventana, las
+últimas w + 1 fechas y lo ya calculado. Cuando los datos cambian (se agregó
+un Condensado con meses nuevos), se parte del estado de la misma selección
+y ventana cuya serie sea el principio de la nueva y sólo se calculan las
+fechas nuevas; si cambió alguna fecha ya vista, se recalcula todo.
+"""
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+TC, DOLAR, FACTORAJE = "TIPO DE CAMBIO", "DÓLAR (DOF)", "FACTORAJE (DOF)"
+
+# Diferenciales: nombre → (columnas que necesita, cálculo sobre la serie)
+DIFERENCIALES = {
+    "TC − DÓLAR (DOF)": ((TC, DOLAR),            lambda s: s[TC] - s[DOLAR]),
+    "TC vs DOF (%)":    ((TC, DOLAR, FACTORAJE), lambda s: (s[TC] / (s[FACTORAJE] * s[DOLAR]) - 1) * 100),
+}
+
+# Ventanas ofrecidas en el dashboard (fechas con registro)
+VENTANAS = [5, 10, 20, 60, 120, 250]
+
+# Una ventana con menos de esta fracción de valores queda vacía
+MIN_FRACCION = 0.5
+
+METRICAS = ["valor", "media", "volatilidad"]
+
+
+def diferenciales(serie):
+    """`serie` (Fecha + tipos de cambio) con los diferenciales calculables agregados."""
+    serie = serie.copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for nombre, (necesarias, calcular) in DIFERENCIALES.items():
+            if all(c in serie.columns for c in necesarias):
+                serie[nombre] = calcular(serie).replace([np.inf, -np.inf], np.nan)
+    return serie
+
+
+# ── Cálculo móvil ────────────────────────────────────────────────────────────
+def _sumas_moviles(x, ventana):
+    """Cuenta, suma y suma de cuadrados de los últimos `ventana` renglones de x (sin NaN)."""
+    validos = ~np.isnan(x)
+    ceros   = np.where(validos, x, 0.0)
+    fin   = np.arange(1, len(x) + 1)
+    inicio = np.maximum(fin - ventana, 0)
+
+    def mover(a):
+        acumulado = np.vstack([np.zeros((1, a.shape[1])), np.cumsum(a, axis=0)])
+        return acumulado[fin] - acumulado[inicio]
+
+    return mover(validos.astype("float64")), mover(ceros), mover(ceros ** 2)
+
+
+def rodar(x, ventana, logaritmicas):
+    """Media y volatilidad móviles de cada columna de x (fechas × columnas).
+
+    `logaritmicas` (una bandera por columna) elige cambios logarítmicos en %
+    o diferencias simples para la volatilidad.
+    """
+    minimo = max(2, int(np.ceil(ventana * MIN_FRACCION)))
+    n, s1, _ = _sumas_moviles(x, ventana)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media = np.where(n >= minimo, s1 / n, np.nan)
+        cambios = np.where(logaritmicas, np.log(x[1:] / x[:-1]) * 100, x[1:] - x[:-1])
+        cambios = np.vstack([np.full((1, x.shape[1]), np.nan), np.where(np.isfinite(cambios), cambios, np.nan)])
+        n, s1, s2 = _sumas_moviles(cambios, ventana)
+        varianza = np.maximum(s2 - s1 ** 2 / n, 0) / (n - 1)
+        volatilidad = np.where(n >= minimo, np.sqrt(varianza), np.nan)
+    return media, volatilidad
+
+
+class Rodante:
+    """Resultado móvil de una ventana; `extendido` devuelve otro con fechas nuevas.
+
+    No cambia una vez creado, así un mismo estado se lee desde varios hilos
+    y sirve de base a la serie extendida de otros datos.
+    """
+
+    def __init__(self, ventana, columnas, logaritmicas):
+        self.ventana      = ventana
+        self.columnas     = list(columnas)
+        self.logaritmicas = np.asarray(logaritmicas, dtype=bool)
+        self.n = 0
+        self._cola   = np.empty((0, len(self.columnas)))
+        self._fechas = np.empty(0, dtype="datetime64[ns]")
+        self._bloques = [np.empty((0, len(self.columnas)))] * len(METRICAS)
+        # Hashes de lo ya visto, para saber si una serie nueva sólo agrega fechas
+        self._hash_fechas  = hashlib.blake2b()
+        self._hash_valores = hashlib.blake2b()
+
+    def continua(self, fechas, valores):
+        """True si las primeras `n` fechas y valores son los ya calculados."""
+        if len(fechas) < self.n:
+            return False
+        h_fechas, h_valores = hashlib.blake2b(), hashlib.blake2b()
+        h_fechas.update(fechas[:self.n].tobytes())
+        h_valores.update(valores[:self.n].tobytes())
+        return (h_fechas.digest() == self._hash_fechas.digest()
+                and h_valores.digest() == self._hash_valores.digest())
+
+    def extendido(self, fechas, valores):
+        """Rodante con las fechas nuevas, calculadas con las últimas `ventana` + 1 ya vistas."""
+        x = np.vstack([self._cola, valores])
+        media, volatilidad = rodar(x, self.ventana, self.logaritmicas)
+        k = len(valores)
+        nuevo = copy.copy(self)
+        nuevo._fechas  = np.concatenate([self._fechas, fechas])
+        nuevo._bloques = [np.vstack([b, n]) for b, n in zip(self._bloques, (valores, media[-k:], volatilidad[-k:]))]
+        nuevo._cola = x[-(self.ventana + 1):]
+        nuevo._hash_fechas, nuevo._hash_valores = self._hash_fechas.copy(), self._hash_valores.copy()
+        nuevo._hash_fechas.update(fechas.tobytes())
+        nuevo._hash_valores.update(valores.tobytes())
+        nuevo.n = self.n + k
+        return nuevo
+
+    def resultado(self):
+        """DataFrame indexado por Fecha con columnas (métrica, columna)."""
+        return pd.DataFrame(
+            np.hstack(self._bloques),
+            index=pd.DatetimeIndex(self._fechas, name="Fecha"),
+            columns=pd.MultiIndex.from_product([METRICAS, self.columnas], names=["métrica", "columna"]),
+        )
+
+
+class CacheRodantes:
+    """Estados `Rodante` por (datos, selección, ventana); LRU compartido entre sesiones.
+
+    El cálculo corre fuera del lock; el lock sólo cubre leer y guardar estados.
+    """
+
+    def __init__(self, max_estados=32):
+        self.max_estados = max_estados
+        self._estados = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def obtener(self, datos, clave, ventana, serie):
+        """Media y volatilidad móviles de `serie` (Fecha + columnas, ordenada por Fecha).
+
+        `datos` identifica el dataset y `clave` la selección de filtros.
+        """
+        columnas = [c for c in serie.columns if c != "Fecha"]
+        fechas   = np.ascontiguousarray(serie["Fecha"].to_numpy(dtype="datetime64[ns]"))
+        valores  = np.ascontiguousarray(serie[columnas].to_numpy(dtype="float64", na_value=np.nan))
+        with self._lock:
+            estado = self._estados.get((datos, clave, ventana))
+            if estado is not None:
+                self._estados.move_to_end((datos, clave, ventana))
+            # Con otros datos (p. ej. antes de agregar un Condensado), la misma selección y ventana
+            previos = [e for (_, c, v), e in reversed(self._estados.items()) if c == clave and v == ventana]
+        if estado is not None and estado.columnas == columnas and estado.n == len(fechas):
+            return estado.resultado()
+
+        base = next((e for e in previos if e.columnas == columnas and e.continua(fechas, valores)), None)
+        if base is None:
+            base = Rodante(ventana, columnas, [c not in DIFERENCIALES for c in columnas])
+        estado = base.extendido(fechas[base.n:], valores[base.n:]) if len(fechas) > base.n else base
+        with self._lock:
+            self._estados[(datos, clave, ventana)] = estado
+            self._estados.move_to_end((datos, clave, ventana))
+            while len(self._estados) > self.max_estados:
+                self._estados.popitem(last=False)
+        return estado.resultado()
+
+
+RODANTES = CacheRodantes()
@@ -0,0 +1,106 @@
+"""
+vistas.py
+---------
+Figuras de cada vista del dashboard, memoizadas en `graficos.FIGURAS`.
+
+Cada función recibe el `analisis.Filtro` y los valores de los widgets de su
+vista, y arma la clave del caché con `filtro.clave`. Las usan tanto la vista
+que se está mostrando como el precálculo en segundo plano de las demás
+(`precalculo.py`): las dos rutas comparten así las mismas entradas del caché.
+"""
+
+from graficos import (
+    FIGURAS, figura_comparacion, figura_costos, figura_escenarios, figura_matriz_deltas,
+    figura_matriz_productos, figura_monte_carlo, figura_productos, figura_tipo_cambio,
+    figura_todos, figura_ventanas,
+)
+from ventanas import DIFERENCIALES
+
+
+# ── Tab 1 — Costos ───────────────────────────────────────────────────────────
+def costos(filtro, costo, agrupar_por, tipo_grafico):
+    return FIGURAS.obtener(
+        ("costos", filtro.clave, costo, agrupar_por, tipo_grafico),
+        lambda: figura_costos(filtro.promedio_por(costo, agrupar_por), costo, agrupar_por, tipo_grafico),
+    )
+
+
+def todos(filtro):
+    costos_disp = filtro.datos.costos
+    return FIGURAS.obtener(
+        ("todos", filtro.clave),
+        lambda: figura_todos(filtro.promedio_anual(costos_disp), costos_disp),
+    )
+
+
+# ── Tab 2 — Comparación entre años ───────────────────────────────────────────
+def matriz_años(filtro, costo):
+    return FIGURAS.obtener(
+        ("matriz_años", filtro.clave, costo),
+        lambda: figura_matriz_deltas(filtro.matriz_años.tabla(costo), costo),
+    )
+
+
+def comparacion(filtro, año_a, año_b):
+    def construir():
+        costos_disp = filtro.datos.costos
+        par = filtro.comparar_años(año_a, año_b, costos_disp)
+        return figura_comparacion(costos_disp, par["media_a"], par["media_b"], par["delta"], año_a, año_b)
+
+    return FIGURAS.obtener(("comparacion", filtro.clave, año_a, año_b), construir)
+
+
+def productos(filtro, año_a, año_b, costo):
+    """None si no hay productos comunes entre los dos años."""
+    return FIGURAS.obtener(
+        ("productos", filtro.clave, año_a, año_b, costo),
+        lambda: figura_productos(*filtro.comparar_productos(año_a, año_b, costo), año_a, año_b),
+    )
+
+
+def matriz_productos(filtro, costo):
+    return FIGURAS.obtener(
+        ("matriz_productos", filtro.clave, costo),
+        lambda: figura_matriz_productos(filtro.matriz_productos(costo), costo),
+    )
+
+
+# ── Tab 3 — Tipo de cambio ───────────────────────────────────────────────────
+def tipo_cambio(filtro, tc_sel, grp_col, tipo_tc):
+    return FIGURAS.obtener(
+        ("tipo_cambio", filtro.clave, tuple(tc_sel), grp_col, tipo_tc),
+        lambda: figura_tipo_cambio(filtro.promedio_periodo(list(tc_sel), grp_col), grp_col, list(tc_sel), tipo_tc),
+    )
+
+
+def tipo_cambio_dia(filtro, tc_sel, tipo_tc, rango, ancho_px):
+    return FIGURAS.obtener(
+        ("tipo_cambio_dia", filtro.clave, tuple(tc_sel), tipo_tc, rango, ancho_px),
+        lambda: figura_tipo_cambio(
+            filtro.serie_diaria(list(tc_sel), *rango), "Fecha", list(tc_sel), tipo_tc, max_puntos=ancho_px,
+        ),
+    )
+
+
+def ventanas(filtro, tc_sel, ventana, ancho_px=1200):
+    def construir():
+        rodante = filtro.ventanas(ventana)
+        difs = [c for c in DIFERENCIALES if c in rodante["valor"].columns]
+        return figura_ventanas(rodante, list(tc_sel), difs, ventana, max_puntos=ancho_px)
+
+    return FIGURAS.obtener(("ventanas", filtro.clave, tuple(tc_sel), ventana, ancho_px), construir)
+
+
+def escenarios(filtro, cambio, variable):
+    return FIGURAS.obtener(
+        ("escenarios", filtro.clave, float(cambio), variable),
+        lambda: figura_escenarios(filtro.escenarios(), float(cambio), variable),
+    )
+
+
+def monte_carlo(filtro, variable, horizonte, n, columna):
+    """Lanza ValueError si no hay historia suficiente para simular."""
+    return FIGURAS.obtener(
+        ("monte_carlo", filtro.clave, variable, horizonte, n, columna),
+        lambda: figura_monte_carlo(filtro.monte_carlo(variable, horizonte, n), columna),
+    )